@@ -0,0 +1,35 @@
+"""Débit de la correction en lot selon le nombre de processus
+
+    python -m benchmarks.batch_scaling --workers 1 2 4 8
+"""
+import argparse
+import time
+
+from grammatical.batch import correct_records
+from benchmarks.stubs import StubLanguageTool, french_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--size", type=int, default=20_000, help="caractères par document")
+    args = parser.parse_args()
+
+    # Documents tous différents pour ne pas profiter du cache de paragraphes
+    base = french_corpus(args.size)
+    records = [(i, f"Document {i}.\n\n{base}".replace("\n\n", f" {i}\n\n")) for i in range(args.documents)]
+
+    print(f"{'processus':>10} {'docs/s':>10} {'accélération':>13}")
+    reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        for _ in correct_records(records, workers=workers, tool_factory=StubLanguageTool):
+            pass
+        rate = len(records) / (time.perf_counter() - start)
+        reference = reference or rate
+        print(f"{workers:>10} {rate:>10.1f} {rate / reference:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
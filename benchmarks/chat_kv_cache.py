@@ -0,0 +1,68 @@
+"""Temps jusqu'au premier token, tour après tour, avec et sans réutilisation du cache
+
+Utilise un petit GPT-2 initialisé au hasard: aucun téléchargement nécessaire.
+
+    python -m benchmarks.chat_kv_cache --turns 20
+"""
+import argparse
+import time
+
+import torch
+
+from grammatical.chat import ChatSession
+from benchmarks.tiny_models import tiny_model
+
+
+class FirstTokenTimer:
+    """Streamer minimal: note l'instant où le premier token généré sort"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self._calls = 0
+
+    def put(self, value):
+        # Le premier appel reçoit le prompt, le suivant le premier token généré
+        self._calls += 1
+        if self._calls == 2:
+            self.first_token = time.perf_counter() - self.started
+
+    def end(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--message-tokens", type=int, default=30)
+    parser.add_argument("--max-new-tokens", type=int, default=20)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--width", type=int, default=256)
+    args = parser.parse_args()
+
+    model = tiny_model(args.layers, args.width)
+    torch.manual_seed(0)
+    generation = {"do_sample": False, "eos_token_id": None, "pad_token_id": 0,
+                  "min_new_tokens": args.max_new_tokens}
+    messages = [torch.randint(0, 50000, (1, args.message_tokens)) for _ in range(args.turns)]
+
+    session = ChatSession(max_new_tokens=args.max_new_tokens)
+    history = None
+    print(f"{'tour':>5} {'historique':>11} {'sans cache (ms)':>16} {'avec cache (ms)':>16}")
+    with torch.inference_mode():
+        for turn, message in enumerate(messages, 1):
+            # Ancien comportement de milie.py: tout l'historique repasse dans le modèle
+            input_ids = message if history is None else torch.cat([history, message], dim=-1)
+            input_ids = input_ids[:, -session.budget:]
+            timer = FirstTokenTimer()
+            history = model.generate(input_ids, attention_mask=torch.ones_like(input_ids), streamer=timer,
+                                     max_new_tokens=args.max_new_tokens, **generation)
+
+            timer_cached = FirstTokenTimer()
+            session.generate_ids(model, message, streamer=timer_cached, **generation)
+            print(f"{turn:>5} {input_ids.shape[-1]:>11} {timer.first_token * 1000:>16.1f} "
+                  f"{timer_cached.first_token * 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
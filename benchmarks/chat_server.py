@@ -0,0 +1,56 @@
+"""Débit agrégé du service de chat: sessions concurrentes servies par lots ou une par une
+
+Utilise un petit GPT-2 initialisé au hasard et le tokenizer minimal: aucun
+téléchargement. --max-batch 1 reproduit un modèle qui ne sert qu'une
+conversation à la fois, comme chaque fenêtre ChatbotApp.
+
+    python -m benchmarks.chat_server --sessions 16 --turns 4
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.tiny_models import tiny_model, tiny_tokenizer
+from grammatical.server import ChatScheduler
+
+
+def run(model, tokenizer, sessions, turns, max_batch, max_new_tokens):
+    scheduler = ChatScheduler(model, tokenizer, max_sessions=sessions, max_batch=max_batch, max_queue=sessions,
+                              max_new_tokens=max_new_tokens, do_sample=False, min_new_tokens=max_new_tokens)
+    session_ids = [scheduler.open_session() for _ in range(sessions)]
+
+    def converse(session_id, index):
+        for turn in range(turns):
+            scheduler.submit(session_id, f"bonjour mot{index} mot{turn} comment ça va ?")
+
+    threads = [threading.Thread(target=converse, args=(session_id, i)) for i, session_id in enumerate(session_ids)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    stats = scheduler.stats()
+    scheduler.close()
+    return stats["generated_tokens"] / seconds, stats["batches"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--width", type=int, default=256)
+    args = parser.parse_args()
+
+    model = tiny_model(args.layers, args.width)
+    tokenizer = tiny_tokenizer()
+    print(f"{'lot max':>8} {'tokens/s':>10} {'appels generate':>16}")
+    for max_batch in (1, args.sessions):
+        tokens_per_second, batches = run(model, tokenizer, args.sessions, args.turns, max_batch, args.max_new_tokens)
+        print(f"{max_batch:>8} {tokens_per_second:>10.1f} {batches:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Rejoue des dialogues écrits d'avance à travers ChatEngine, comme ende.py et milie.py
+
+    python -m benchmarks.dialogue_replay
+    python -m benchmarks.dialogue_replay --model microsoft/DialoGPT-medium --output generation.json
+
+Sans --model, un GPT-2 aléatoire (benchmarks.tiny_models) est enregistré
+dans un dossier temporaire: aucun téléchargement, utilisable en CI. Chaque
+réponse fait alors exactement max_new_tokens tokens, pour une charge
+identique d'un lancement à l'autre.
+
+Toutes les combinaisons sont mesurées: application (ende sans historique,
+milie avec ChatSession), échantillonnage, max_new_tokens, longueur
+d'historique (milie) et nombre de threads. Chaque combinaison tourne dans
+un processus neuf: le pic de mémoire rapporté est bien le sien.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from grammatical.inference import DEFAULT_PROFILE, DEFAULT_THREADS
+
+# Paramètres d'échantillonnage des applications, plus le glouton comme référence déterministe
+SAMPLING = {
+    "greedy": {"do_sample": False},
+    "ende": {"do_sample": True, "temperature": 0.7, "top_p": 0.9},
+    "milie": {"do_sample": True, "top_k": 50, "top_p": 0.95, "temperature": 0.7},
+}
+
+DIALOGUES = [
+    [
+        "bonjour !",
+        "comment ça va ?",
+        "je suis bien et toi ?",
+        "merci , oui",
+        "tu as une aide pour moi ?",
+        "non , merci",
+        "et la suite ?",
+        "salut !",
+    ],
+    [
+        "Hello, how are you today?",
+        "What do you like to do on weekends?",
+        "That sounds fun. Do you read books?",
+        "Which one is your favourite?",
+        "Why do you like it so much?",
+        "Can you recommend another one?",
+        "Thanks, I will look for it.",
+        "Goodbye!",
+    ],
+]
+
+
+class FirstTokenTimer:
+    """Streamer: instant du premier token généré, mesuré depuis l'envoi du message, et tokens reçus"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.tokens = 0
+        self._calls = 0
+
+    def put(self, value):
+        # Le premier appel reçoit le prompt, les suivants les tokens générés
+        self._calls += 1
+        if self._calls == 1:
+            return
+        if self._calls == 2:
+            self.first_token = time.perf_counter() - self.started
+        self.tokens += value.numel()
+
+    def end(self):
+        pass
+
+
+def slope(values):
+    """Pente des moindres carrés de values en fonction du numéro de tour"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    return covariance / sum((x - mean_x) ** 2 for x in range(n))
+
+
+def replay(tokenizer, model, app, sampling, max_new_tokens, max_length, dialogues, fixed_length, seed):
+    """Rejoue les dialogues par le même ChatEngine que l'application; renvoie les mesures"""
+    import torch
+
+    from grammatical.chat import ChatSession
+    from grammatical.engines import ChatEngine
+    from grammatical.memory import current_rss_mb, peak_rss_mb
+
+    generation = dict(SAMPLING[sampling])
+    if fixed_length:
+        generation["min_new_tokens"] = max_new_tokens
+
+    first_tokens, latencies, tokens, seconds = [], [], 0, 0.0
+    torch.manual_seed(seed)
+    for dialogue in dialogues:
+        if app == "milie":
+            engine = ChatEngine(model.name_or_path, draft_model="",
+                                session=ChatSession(max_length, max_new_tokens), **generation)
+        else:
+            engine = ChatEngine(model.name_or_path, draft_model="", max_new_tokens=max_new_tokens, **generation)
+        # Modèle déjà chargé, partagé par toutes les combinaisons du processus
+        engine.tokenizer, engine.model = tokenizer, model
+        engine.generation_kwargs.setdefault("pad_token_id", tokenizer.pad_token_id)
+        engine.generation_kwargs.setdefault("eos_token_id", tokenizer.eos_token_id)
+
+        for turn, text in enumerate(dialogue):
+            timer = FirstTokenTimer()
+            engine.reply(text, streamer=timer).result()
+            elapsed = time.perf_counter() - timer.started
+            if turn == len(latencies):
+                first_tokens.append([])
+                latencies.append([])
+            first_tokens[turn].append(timer.first_token or elapsed)
+            latencies[turn].append(elapsed)
+            tokens += timer.tokens
+            seconds += elapsed
+
+    per_turn = [sum(values) / len(values) for values in latencies]
+    ttft = [value for values in first_tokens for value in values]
+    return {
+        "app": app,
+        "sampling": sampling,
+        "max_new_tokens": max_new_tokens,
+        "max_length": max_length,
+        "threads": torch.get_num_threads(),
+        "time_to_first_token_ms": 1000 * sorted(ttft)[len(ttft) // 2],
+        "tokens_per_second": tokens / seconds,
+        "turn_latency_ms": [round(1000 * value, 2) for value in per_turn],
+        "latency_growth_ms_per_turn": 1000 * slope(per_turn),
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def combinations(args):
+    for app, sampling, max_new_tokens in itertools.product(args.apps, args.sampling, args.max_new_tokens):
+        # ende ne garde pas d'historique: la longueur d'historique ne le concerne pas
+        for max_length in (args.max_length if app == "milie" else [None]):
+            if max_length is not None and max_length <= max_new_tokens:
+                continue
+            yield app, sampling, max_new_tokens, max_length
+
+
+def run_worker(args):
+    """Combinaisons reçues en arguments (une seule quand lancé par run_matrix), modèle chargé une fois"""
+    from grammatical.inference import load_chat_model
+
+    tokenizer, model, profile = load_chat_model(args.model, "torch", args.profile, args.threads)
+    dialogues = load_dialogues(args.dialogues)
+    results = []
+    for app, sampling, max_new_tokens, max_length in combinations(args):
+        result = replay(tokenizer, model, app, sampling, max_new_tokens, max_length, dialogues,
+                        args.fixed_length, args.seed)
+        result["profile"] = profile
+        results.append(result)
+    print(json.dumps(results))
+
+
+def load_dialogues(path):
+    if path is None:
+        return DIALOGUES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_matrix(args, model):
+    results = []
+    for threads in args.thread_counts:
+        for app, sampling, max_new_tokens, max_length in combinations(args):
+            results.extend(run_combination(args, model, threads, app, sampling, max_new_tokens, max_length))
+    return results
+
+
+def run_combination(args, model, threads, app, sampling, max_new_tokens, max_length):
+    """Une combinaison dans un processus neuf: le pic de mémoire ne dépend pas des précédentes"""
+    command = [sys.executable, "-m", "benchmarks.dialogue_replay", "--worker",
+               "--model", model, "--profile", args.profile, "--threads", str(threads),
+               "--seed", str(args.seed), "--apps", app, "--sampling", sampling,
+               "--max-new-tokens", str(max_new_tokens)]
+    if max_length is not None:
+        command += ["--max-length", str(max_length)]
+    if args.dialogues:
+        command += ["--dialogues", args.dialogues]
+    if args.fixed_length:
+        command.append("--fixed-length")
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_table(results):
+    print(f"{'app':<6} {'échant.':<8} {'max_new':>7} {'histo.':>6} {'threads':>7} {'1er token (ms)':>14} "
+          f"{'tokens/s':>9} {'+ms/tour':>9} {'pic Mo':>8}")
+    for r in results:
+        print(f"{r['app']:<6} {r['sampling']:<8} {r['max_new_tokens']:>7} {r['max_length'] or '-':>6} "
+              f"{r['threads']:>7} {r['time_to_first_token_ms']:>14.1f} {r['tokens_per_second']:>9.1f} "
+              f"{r['latency_growth_ms_per_turn']:>9.2f} {r['peak_rss_mb'] or 0:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="dossier ou nom de modèle, ex: microsoft/DialoGPT-medium (défaut: GPT-2 aléatoire)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE)
+    parser.add_argument("--apps", nargs="+", choices=("ende", "milie"), default=["ende", "milie"])
+    parser.add_argument("--sampling", nargs="+", choices=tuple(SAMPLING), default=list(SAMPLING))
+    parser.add_argument("--max-new-tokens", type=int, nargs="+", default=[20, 60])
+    parser.add_argument("--max-length", type=int, nargs="+", default=[256, 1024],
+                        help="longueur maximale de l'historique (milie)")
+    parser.add_argument("--thread-counts", type=int, nargs="+", default=sorted({1, DEFAULT_THREADS or os.cpu_count()}))
+    parser.add_argument("--dialogues", help="JSON: liste de dialogues, chacun une liste de messages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="résultats JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fixed-length", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        model = args.model
+        if model is None:
+            # Modèle enregistré dans un processus à part: le pic de mémoire des mesures n'en dépend pas
+            subprocess.run([sys.executable, "-c", "import sys; from benchmarks.tiny_models import save_tiny_dialogpt; "
+                            "save_tiny_dialogpt(sys.argv[1])", directory], check=True)
+            model = directory
+            args.fixed_length = True
+        results = run_matrix(args, model)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model or "gpt2-aléatoire", "profile": args.profile, "seed": args.seed,
+                       "results": results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Temps de re-vérification après une petite modification, selon la taille du document
+
+    python -m benchmarks.incremental
+"""
+import argparse
+import time
+
+from grammatical.incremental import IncrementalChecker, MatchCache
+from benchmarks.stubs import StubLanguageTool, french_corpus
+
+EDIT = " Nous sommes allés a la gare."
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    tool = StubLanguageTool()
+    print(f"{'taille':>10} {'complet (s)':>12} {'après édition (s)':>18} {'envoyé':>10}")
+    for size in args.sizes:
+        # Paragraphes numérotés: tous différents, comme dans un vrai document
+        text = "\n\n".join(f"{i}. {p}" for i, p in enumerate(french_corpus(size).split("\n\n")))
+        checker = IncrementalChecker(tool, "fr", MatchCache(maxsize=1_000_000))
+        full = timed(checker.check, text)
+
+        middle = text.index("\n\n", len(text) // 2)
+        edited = text[:middle] + EDIT + text[middle:]
+        sent = []
+        original_check = tool.check
+        tool.check = lambda batch: sent.append(len(batch)) or original_check(batch)
+        recheck = timed(checker.check, edited)
+        tool.check = original_check
+        print(f"{size:>10} {full:>12.4f} {recheck:>18.4f} {sum(sent):>10}")
+
+
+if __name__ == "__main__":
+    main()
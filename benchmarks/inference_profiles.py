@@ -0,0 +1,54 @@
+"""Débit, mémoire et dérive des profils d'inférence CPU (fp32, int8, bf16) et d'ONNX Runtime
+
+Chaque profil tourne dans un processus neuf pour que le pic mémoire lui soit
+propre. Sans --model, un GPT-2 aléatoire est enregistré dans un dossier temporaire.
+
+    python -m benchmarks.inference_profiles --threads 4
+    python -m benchmarks.inference_profiles --model microsoft/DialoGPT-medium
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from grammatical.inference import BACKENDS, PROFILES
+
+
+def run_profile(model, profile, threads, env, backend="torch"):
+    command = [sys.executable, "-m", "grammatical", "chat-check", "--model", model, "--profile", profile,
+               "--backend", backend, "--drift"]
+    if threads:
+        command += ["--threads", str(threads)]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="dossier ou nom de modèle (défaut: GPT-2 aléatoire 12 couches × 768)")
+    parser.add_argument("--threads", type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get("PYTHONPATH", "")]))
+        model = args.model
+        if model is None:
+            model = directory
+            subprocess.run([sys.executable, "-c", "import sys; from benchmarks.tiny_models import save_tiny_dialogpt; "
+                            "save_tiny_dialogpt(sys.argv[1], layers=12, width=768, heads=12)", directory],
+                           env=env, check=True, capture_output=True)
+
+        print(f"{'moteur':>7} {'profil':>7} {'effectif':>9} {'tokens/s':>9} {'pic (Mo)':>9} {'identiques':>11} {'préfixe':>8}")
+        runs = [("torch", profile) for profile in PROFILES] + [(backend, "fp32") for backend in BACKENDS[1:]]
+        for backend, profile in runs:
+            report = run_profile(model, profile, args.threads, env, backend)
+            drift = report.get("drift", {"identical_responses": 1.0, "mean_common_prefix": 1.0})
+            print(f"{backend:>7} {profile:>7} {report['profile']:>9} {report['tokens_per_second']:>9.1f} "
+                  f"{report['peak_rss_mb']:>9} {drift['identical_responses']:>11.0%} "
+                  f"{drift['mean_common_prefix']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Démarrage à froid des chatbots: coût des imports et pic mémoire du chargement du modèle
+
+Chaque mesure tourne dans un processus neuf. Sans --model, un GPT-2 aléatoire
+de la taille de DialoGPT-medium est enregistré dans un dossier temporaire.
+
+    python -m benchmarks.model_load
+    python -m benchmarks.model_load --model microsoft/DialoGPT-medium
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MEASURE = r"""
+import json, sys, time
+start = time.perf_counter()
+import grammatical.chat, grammatical.models
+imports = time.perf_counter() - start
+heavy = "torch" in sys.modules or "transformers" in sys.modules
+from grammatical.memory import peak_rss_mb
+before = peak_rss_mb()
+start = time.perf_counter()
+tokenizer, model = grammatical.models.load_dialogpt(sys.argv[1])
+print(json.dumps({"imports_s": imports, "torch_imported_early": heavy, "load_s": time.perf_counter() - start,
+                  "rss_before_mb": before, "peak_rss_mb": peak_rss_mb()}))
+"""
+
+
+def weights_mb(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+               if name.endswith((".safetensors", ".bin"))) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="dossier ou nom de modèle (défaut: GPT-2 aléatoire 24 couches × 1024)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get("PYTHONPATH", "")]))
+        model = args.model
+        if model is None:
+            # Dans un autre processus: le pic mémoire (ru_maxrss) passe au processus fils
+            model = directory
+            subprocess.run([sys.executable, "-c", "import sys; from benchmarks.tiny_models import save_tiny_dialogpt; "
+                            "save_tiny_dialogpt(sys.argv[1], layers=24, width=1024, heads=16)", directory],
+                           env=env, check=True, capture_output=True)
+            print(f"poids sur disque: {weights_mb(model):.0f} Mo")
+
+        output = subprocess.run([sys.executable, "-c", MEASURE, model], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+    print(f"imports grammatical:      {result['imports_s'] * 1000:7.1f} ms "
+          f"(torch importé d'avance: {result['torch_imported_early']})")
+    print(f"chargement du modèle:     {result['load_s']:7.2f} s")
+    print(f"mémoire avant / pic:      {result['rss_before_mb']:7.0f} / {result['peak_rss_mb']:.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
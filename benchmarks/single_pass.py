@@ -0,0 +1,59 @@
+"""Compare tool.correct + tool.check à la correction en une seule passe
+
+    python -m benchmarks.single_pass            # LanguageTool simulé
+    python -m benchmarks.single_pass --real     # vrai serveur LanguageTool
+"""
+import argparse
+import time
+
+from grammatical.correction import correct, explain
+from benchmarks.stubs import StubLanguageTool, french_corpus
+
+
+def two_pass(tool, text):
+    """Ancien comportement de CorrecteurApp.corriger_texte"""
+    corrected_text = tool.correct(text)
+    explications = [explain(match) for match in tool.check(text)]
+    return corrected_text, explications
+
+
+def single_pass(tool, text):
+    result = correct(tool, text)
+    return result.corrected_text, result.explications
+
+
+def best_of(fn, tool, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn(tool, text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--real", action="store_true", help="utiliser language_tool_python")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.real:
+        import language_tool_python
+        tool = language_tool_python.LanguageTool('fr')
+    else:
+        tool = StubLanguageTool()
+
+    print(f"{'taille':>10} {'2 passes (s)':>14} {'1 passe (s)':>14} {'gain':>8}")
+    for size in args.sizes:
+        text = french_corpus(size)
+        before, (old_text, old_expl) = best_of(two_pass, tool, text, args.repeat)
+        after, (new_text, new_expl) = best_of(single_pass, tool, text, args.repeat)
+        assert new_expl == old_expl
+        if new_text != old_text:
+            print(f"  attention: textes corrigés différents pour {size} caractères")
+        print(f"{size:>10} {before:>14.4f} {after:>14.4f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Décodage assisté: acceptation et gain par tour, comparés au décodage normal
+
+Les modèles sont téléchargés depuis le Hub au premier lancement.
+
+    python -m benchmarks.speculative
+    python -m benchmarks.speculative --greedy --assistant-tokens 8
+"""
+import argparse
+import time
+
+from grammatical.chat import ChatSession
+from grammatical.inference import DRIFT_PROMPTS, inference_mode
+from grammatical.models import load_dialogpt
+from grammatical.speculative import DRAFT_SMALL, AssistedDecoding
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--draft", default=DRAFT_SMALL)
+    parser.add_argument("--assistant-tokens", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=60)
+    parser.add_argument("--greedy", action="store_true", help="décodage glouton au lieu de l'échantillonnage des apps")
+    args = parser.parse_args()
+
+    tokenizer, model = load_dialogpt(args.model)
+    _, draft = load_dialogpt(args.draft)
+    generation = {"pad_token_id": tokenizer.pad_token_id, "eos_token_id": tokenizer.eos_token_id}
+    if not args.greedy:
+        generation.update(do_sample=True, top_k=50, top_p=0.95, temperature=0.7)
+
+    # Décodage normal d'abord: il sert de référence au gain mesuré ensuite
+    session = ChatSession(max_new_tokens=args.max_new_tokens)
+    tokens = 0
+    start = time.perf_counter()
+    with inference_mode():
+        for prompt in DRIFT_PROMPTS:
+            session.generate(model, tokenizer, prompt, **generation)
+            tokens += session.last_response_length
+    plain = tokens / (time.perf_counter() - start)
+    print(f"Décodage normal: {plain:.1f} tokens/s")
+
+    # min_acceptance à 0: on mesure chaque tour sans basculer vers le décodage normal
+    assisted = AssistedDecoding(model, draft, args.assistant_tokens, min_acceptance=0.0,
+                                baseline_tokens_per_second=plain, log=print)
+    session = ChatSession(max_new_tokens=args.max_new_tokens)
+    with inference_mode():
+        for prompt in DRIFT_PROMPTS:
+            session.generate(model, tokenizer, prompt, **generation, **assisted.begin())
+            assisted.end(session.last_response_length)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Doublures hors ligne de LanguageTool pour les benchmarks"""
+import random
+import re
+import time
+
+from grammatical.correction import apply_matches
+
+
+class StubMatch:
+    """Reproduit les attributs de language_tool_python.Match utilisés par Grammatical"""
+
+    def __init__(self, offset, length, rule_id, message, replacements):
+        self.offset = offset
+        self.errorLength = length
+        self.ruleId = rule_id
+        self.message = message
+        self.replacements = replacements
+
+
+class StubLanguageTool:
+    """Simule le coût d'analyse de LanguageTool, proportionnel à la taille du texte"""
+
+    FAUTES = {
+        "les chat": ("FR_AGREEMENT", "Accord du nom avec le déterminant.", ["les chats"]),
+        "a la": ("CONFUSIONS_A_ACCENT", "Confusion entre « a » et « à ».", ["à la"]),
+        "sa va": ("CONFUSIONS_SA_CA", "Confusion entre « sa » et « ça ».", ["ça va"]),
+        "language": ("FR_SPELLING_RULE", "Faute de frappe possible.", ["langage", "langue"]),
+    }
+
+    def __init__(self, language="fr", remote_server=None, seconds_per_kb=0.002):
+        self.seconds_per_kb = seconds_per_kb
+        self.calls = 0
+        self._pattern = re.compile("|".join(re.escape(faute) for faute in self.FAUTES))
+
+    def check(self, text):
+        self.calls += 1
+        time.sleep(len(text) / 1024 * self.seconds_per_kb)
+        matches = []
+        for found in self._pattern.finditer(text):
+            rule_id, message, replacements = self.FAUTES[found.group()]
+            matches.append(StubMatch(found.start(), len(found.group()), rule_id, message, list(replacements)))
+        return matches
+
+    def correct(self, text):
+        # Comme LanguageTool.correct: une analyse complète puis application des suggestions
+        return apply_matches(text, self.check(text))
+
+
+class StubPool:
+    """Remplace grammatical.languagetool.pool: un StubLanguageTool par langue, rien à démarrer"""
+
+    def __init__(self, seconds_per_kb=0.002):
+        self.seconds_per_kb = seconds_per_kb
+        self._tools = {}
+
+    def tool(self, language):
+        return self._tools.setdefault(language, StubLanguageTool(language, seconds_per_kb=self.seconds_per_kb))
+
+    def warm_up(self, language):
+        return None
+
+
+PHRASES = [
+    "Les enfants jouent dans le jardin pendant que les chat dorment au soleil.",
+    "Nous sommes allés a la plage hier après-midi avec nos amis.",
+    "Bonjour, sa va bien depuis la dernière fois ?",
+    "Le language de programmation Python est très apprécié des débutants.",
+    "Cette phrase ne contient aucune erreur particulière.",
+]
+
+
+def french_corpus(size):
+    """Texte français synthétique d'environ size caractères, en paragraphes"""
+    paragraphs = []
+    total = 0
+    i = 0
+    while total < size:
+        paragraph = " ".join(PHRASES[(i + k) % len(PHRASES)] for k in range(4))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+        i += 1
+    return "\n\n".join(paragraphs)
+
+
+
+def varied_corpus(size, seed=0):
+    """Comme french_corpus, mais chaque paragraphe est unique (aucun cache ne sert d'un document à l'autre)
+
+    Le même seed redonne exactement le même texte.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        first = len(paragraphs) * 4
+        paragraph = " ".join(f"Note {seed}-{first + k} : {phrase}" for k, phrase in enumerate(rng.sample(PHRASES, 4)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,230 @@
+"""Débit de la correction (CorrecteurApp) et de la traduction (TranslationApp), reproductible d'un commit à l'autre
+
+    python -m benchmarks.throughput --output avant.json
+    python -m benchmarks.throughput --compare avant.json --threshold 0.10
+
+Hors ligne par défaut: LanguageTool simulé (benchmarks.stubs) et moteur de
+traduction EchoBackend à latence fixe. --languagetool passe par le pool réel
+(serveur local ou JVM démarrée pour l'occasion).
+
+Chaque cas (mode, taille) tourne --repeats fois, chaque fois dans un processus
+neuf: le démarrage à froid et le pic de mémoire ne dépendent pas des cas
+précédents. Les documents sont générés avec un seed fixe et tous différents,
+pour que les caches ne faussent pas la mesure.
+
+p50 et docs/s sont les médianes des répétitions; p95 et p99 portent sur
+toutes les latences mesurées et ne sont donnés qu'à partir de 20 et 100
+échantillons (en deçà, ce ne serait que le maximum). « bruit » est l'écart
+relatif (max - min) / médiane des p50 des répétitions.
+
+Plancher de bruit, mesuré en comparant un commit à lui-même (mode simulé,
+5 répétitions de 5 documents, 1 000 à 1 000 000 de caractères): les p50 des
+répétitions s'écartent de 1 à 18 % (le plus sur les petits documents, où
+l'ordonnancement du système pèse le plus), les médianes de deux lancements
+de 5 % au plus. --compare ne signale donc une régression que sur les
+médianes, au-delà du plus grand de --threshold et du bruit mesuré de chaque
+côté; un seuil sous 5 % n'a pas de sens.
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from statistics import median
+
+from benchmarks.stubs import varied_corpus
+
+MODES = ("correction", "translation")
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def percentile(values, q):
+    """Percentile au rang le plus proche"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def tail_percentile(values, q):
+    """Percentile q, ou None s'il faut plus d'échantillons pour qu'il ne soit pas simplement le maximum"""
+    if len(values) < math.ceil(1 / (1 - q)):
+        return None
+    return percentile(values, q)
+
+
+def build(mode, args):
+    """Moteur monté comme dans l'application correspondante, et fonction traitant un document"""
+    from grammatical.engines import CorrectionEngine, TranslationEngine
+
+    if mode == "correction":
+        if args.languagetool:
+            from grammatical.languagetool import LanguageToolPool
+            tool_pool = LanguageToolPool()
+        else:
+            from benchmarks.stubs import StubPool
+            tool_pool = StubPool(args.seconds_per_kb)
+        engine = CorrectionEngine(tool_pool=tool_pool)
+        warm_up = engine.warm_up()
+        if warm_up is not None:
+            warm_up.result()
+        return lambda text: engine.check(text).result()
+
+    from grammatical.translation import SentenceTranslator, TranslationCache
+    from grammatical.translators import BatchTranslator, EchoBackend
+
+    translator = SentenceTranslator(BatchTranslator(EchoBackend(seconds_per_call=args.translator_latency)),
+                                    TranslationCache(":memory:"))
+    engine = TranslationEngine(translator, src="fr", dest="en")
+    return lambda text: engine.translate(text).result()
+
+
+def run_case(mode, size, args):
+    from grammatical.memory import peak_rss_mb
+
+    texts = [varied_corpus(size, seed) for seed in range(args.documents + 1)]
+
+    # Démarrage à froid: imports, moteur, serveur éventuel et premier document
+    start = time.perf_counter()
+    process = build(mode, args)
+    process(texts[0])
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for text in texts[1:]:
+        start = time.perf_counter()
+        process(text)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "size": size,
+        "documents": len(latencies),
+        "cold_start_seconds": cold_start,
+        "p50_seconds": percentile(latencies, 0.50),
+        "documents_per_second": len(latencies) / sum(latencies),
+        "latencies_seconds": latencies,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def summarize(runs):
+    """Un cas à partir de ses répétitions: médianes, percentiles de queue sur toutes les latences, bruit"""
+    latencies = [value for run in runs for value in run["latencies_seconds"]]
+    p50s = [run["p50_seconds"] for run in runs]
+    return {
+        "mode": runs[0]["mode"],
+        "size": runs[0]["size"],
+        "repeats": len(runs),
+        "documents": len(latencies),
+        "cold_start_seconds": median([run["cold_start_seconds"] for run in runs]),
+        "p50_seconds": median(p50s),
+        "p95_seconds": tail_percentile(latencies, 0.95),
+        "p99_seconds": tail_percentile(latencies, 0.99),
+        "documents_per_second": median([run["documents_per_second"] for run in runs]),
+        "noise": (max(p50s) - min(p50s)) / median(p50s) if median(p50s) else 0.0,
+        "peak_rss_mb": max((run["peak_rss_mb"] or 0 for run in runs), default=0) or None,
+    }
+
+
+def run_in_subprocess(mode, size, args):
+    command = [sys.executable, "-m", "benchmarks.throughput", "--case", mode, str(size),
+               "--documents", str(args.documents),
+               "--seconds-per-kb", str(args.seconds_per_kb),
+               "--translator-latency", str(args.translator_latency)]
+    if args.languagetool:
+        command.append("--languagetool")
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, threshold):
+    """Cas plus lents que la référence (médianes des répétitions, p50 ou débit)
+
+    La tolérance est le plus grand de threshold et du bruit mesuré de chaque
+    côté: un écart que les répétitions d'un même commit produisent déjà
+    n'est pas une régression.
+    """
+    previous = {(case["mode"], case["size"]): case for case in baseline["results"]}
+    found = []
+    for case in results:
+        before = previous.get((case["mode"], case["size"]))
+        if before is None:
+            continue
+        tolerance = max(threshold, case.get("noise", 0.0), before.get("noise", 0.0))
+        if case["p50_seconds"] > before["p50_seconds"] * (1 + tolerance):
+            found.append((case, "p50", before["p50_seconds"], case["p50_seconds"], tolerance))
+        if case["documents_per_second"] < before["documents_per_second"] / (1 + tolerance):
+            found.append((case, "docs/s", before["documents_per_second"], case["documents_per_second"], tolerance))
+    return found
+
+
+def seconds(value):
+    return "-" if value is None else f"{value:.4f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="tailles en caractères")
+    parser.add_argument("--documents", type=int, default=5, help="documents mesurés par répétition, après le premier")
+    parser.add_argument("--repeats", type=int, default=5, help="répétitions de chaque cas, chacune dans un processus neuf")
+    parser.add_argument("--languagetool", action="store_true", help="vrai LanguageTool au lieu du simulé")
+    parser.add_argument("--seconds-per-kb", type=float, default=0.002, help="coût du LanguageTool simulé")
+    parser.add_argument("--translator-latency", type=float, default=0.005, help="secondes par lot traduit")
+    parser.add_argument("--output", help="résultats JSON")
+    parser.add_argument("--compare", metavar="REFERENCE", help="résultats JSON d'un autre commit")
+    parser.add_argument("--threshold", type=float, default=0.10, help="ralentissement toléré (0.10 = 10 %%)")
+    parser.add_argument("--case", nargs=2, metavar=("MODE", "TAILLE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        mode, size = args.case
+        print(json.dumps(run_case(mode, int(size), args)))
+        return
+
+    print(f"{'mode':<12} {'taille':>10} {'froid (s)':>10} {'p50 (s)':>9} {'p95 (s)':>9} {'p99 (s)':>9} "
+          f"{'docs/s':>9} {'bruit':>6} {'pic Mo':>8}")
+    results = []
+    for mode in args.modes:
+        for size in args.sizes:
+            case = summarize([run_in_subprocess(mode, size, args) for _ in range(args.repeats)])
+            results.append(case)
+            print(f"{mode:<12} {size:>10} {case['cold_start_seconds']:>10.3f} {case['p50_seconds']:>9.4f} "
+                  f"{seconds(case['p95_seconds']):>9} {seconds(case['p99_seconds']):>9} "
+                  f"{case['documents_per_second']:>9.2f} {case['noise']:>6.1%} {case['peak_rss_mb'] or 0:>8.1f}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {"documents": args.documents, "repeats": args.repeats, "languagetool": args.languagetool,
+                     "seconds_per_kb": args.seconds_per_kb, "translator_latency": args.translator_latency},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.threshold)
+        for case, what, before, after, tolerance in found:
+            print(f"régression {case['mode']} {case['size']}: {what} {before:.4f} -> {after:.4f} "
+                  f"(tolérance {tolerance:.0%})")
+        if found:
+            sys.exit(1)
+        print(f"Aucune régression au-delà de {args.threshold:.0%} par rapport à {baseline.get('commit')}")
+
+
+if __name__ == "__main__":
+    main()
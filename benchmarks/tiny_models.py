@@ -0,0 +1,41 @@
+"""Petits modèles GPT-2 aléatoires et tokenizer minimal, enregistrés sur disque, pour travailler hors ligne"""
+import os
+
+# Vocabulaire complet de GPT-2: les ids du vrai tokenizer restent valables, seules les couches sont réduites
+VOCAB_SIZE = 50257
+
+
+def tiny_config(layers=4, width=256, heads=4):
+    from transformers import GPT2Config
+    return GPT2Config(n_layer=layers, n_head=heads, n_embd=width, vocab_size=VOCAB_SIZE,
+                      n_positions=1024, bos_token_id=0, eos_token_id=0)
+
+
+def tiny_model(layers=4, width=256, heads=4, seed=0):
+    import torch
+    from transformers import GPT2LMHeadModel
+
+    torch.manual_seed(seed)
+    return GPT2LMHeadModel(tiny_config(layers, width, heads)).eval()
+
+
+def tiny_tokenizer():
+    """Tokenizer par mots, l'id 0 servant de fin de message comme <|endoftext|>"""
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+    from transformers import PreTrainedTokenizerFast
+
+    words = ["<|endoftext|>", "[UNK]"] + [f"mot{i}" for i in range(2000)] + \
+        "bonjour salut merci aide oui non comment ça va bien et toi je suis un une le la les de ? ! .".split()
+    tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(words)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer.decoder = decoders.WordPiece(prefix="##")
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<|endoftext|>",
+                                   unk_token="[UNK]", pad_token="<|endoftext|>")
+
+
+def save_tiny_dialogpt(directory, layers=4, width=256, heads=4):
+    """Enregistre modèle (safetensors) et tokenizer, chargeables par load_dialogpt(directory)"""
+    os.makedirs(directory, exist_ok=True)
+    tiny_model(layers, width, heads).save_pretrained(directory, safe_serialization=True)
+    tiny_tokenizer().save_pretrained(directory)
+    return directory
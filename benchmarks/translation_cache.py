@@ -0,0 +1,46 @@
+"""Durée d'une retraduction d'un document presque inchangé, avec le cache de traductions
+
+    python -m benchmarks.translation_cache
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from grammatical.translation import SentenceTranslator, TranslationCache
+from grammatical.translators import EchoBackend
+from benchmarks.stubs import french_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    text = "\n\n".join(f"Paragraphe {i}. {p}" for i, p in enumerate(french_corpus(args.size).split("\n\n")))
+    edited = text + "\n\nUne phrase ajoutée à la fin."
+
+    with tempfile.TemporaryDirectory() as directory:
+        translator = EchoBackend(seconds_per_call=0.2)
+        start = time.perf_counter()
+        translator.translate_batch([text], "fr", "en")
+        print(f"texte entier, sans cache:   {time.perf_counter() - start:8.3f} s")
+
+        cache = TranslationCache(os.path.join(directory, "cache.sqlite3"))
+        sentences = SentenceTranslator(translator, cache)
+        for label, document in (("premier passage", text), ("après une édition", edited)):
+            start = time.perf_counter()
+            sentences.translate(document)
+            print(f"{label + ':':<27} {time.perf_counter() - start:8.3f} s  {cache.stats()}")
+        cache.close()
+
+        # Nouveau processus: seul le cache disque est disponible
+        cache = TranslationCache(os.path.join(directory, "cache.sqlite3"))
+        start = time.perf_counter()
+        SentenceTranslator(translator, cache).translate(edited)
+        print(f"{'cache disque seul:':<27} {time.perf_counter() - start:8.3f} s  {cache.stats()}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
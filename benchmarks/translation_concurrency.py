@@ -0,0 +1,47 @@
+"""Traduction d'un grand document: un seul appel, lots en série, lots concurrents
+
+    python -m benchmarks.translation_concurrency
+
+Le moteur simulé coûte --latency par appel plus --seconds-per-kb par millier
+de caractères: un seul appel paie la latence une fois mais envoie tout le
+texte d'un bloc, comme l'ancienne traduction du document entier.
+"""
+import argparse
+import time
+
+from grammatical.chunking import split_sentences
+from grammatical.translators import BatchTranslator, EchoBackend
+from benchmarks.stubs import french_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.2, help="secondes par appel simulé")
+    parser.add_argument("--seconds-per-kb", type=float, default=0.01, help="secondes par millier de caractères")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    text = french_corpus(args.size)
+    sentences = [text[start:end].strip() for start, end in split_sentences(text)]
+    backend = EchoBackend(seconds_per_call=args.latency, seconds_per_kb=args.seconds_per_kb)
+
+    # Référence: tout le document en un seul appel
+    start = time.perf_counter()
+    translated = backend.translate_batch(sentences, "fr", "en")
+    elapsed = time.perf_counter() - start
+    assert translated == sentences
+    print(f"un seul appel:          {elapsed:7.3f} s")
+
+    for concurrency in args.concurrency:
+        translator = BatchTranslator(backend, max_concurrency=concurrency)
+        start = time.perf_counter()
+        translated = translator.translate_batch(sentences, "fr", "en")
+        elapsed = time.perf_counter() - start
+        translator.close()
+        assert translated == sentences
+        print(f"{concurrency:>3} lots en parallèle: {elapsed:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
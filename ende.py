@@ -1,10 +1,40 @@
+import time
+
 import customtkinter as ctk
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
-from threading import Thread
+
+from grammatical.chat import TextChunkStreamer
+from grammatical.engines import ChatEngine
+from grammatical.inference import DEFAULT_BACKEND, DEFAULT_PROFILE, DEFAULT_THREADS
+from grammatical.metrics import configure_from_env, metrics
+from grammatical.response_cache import DEFAULT_SIZE, ResponseCache
+from grammatical.scheduler import deliver
+from grammatical.speculative import DEFAULT_DRAFT
+
+# Pris juste après les imports, avant toute construction: torch et transformers ne sont
+# chargés qu'en arrière-plan, le premier affichage mesuré ici ne dépend donc pas d'eux
+STARTED = time.perf_counter()
 
 class DialoGPTChatbot:
-    def __init__(self):
+    def __init__(self, profile=DEFAULT_PROFILE, threads=DEFAULT_THREADS, backend=DEFAULT_BACKEND,
+                 draft_model=DEFAULT_DRAFT):
+        # Profil d'inférence CPU: fp32, int8 ou bf16 (GRAMMATICAL_PROFILE, GRAMMATICAL_THREADS)
+        # Moteur de génération: torch ou onnx (GRAMMATICAL_BACKEND)
+        # Modèle brouillon du décodage assisté, ex: microsoft/DialoGPT-small (GRAMMATICAL_DRAFT_MODEL)
+        # Chargement et génération hors de l'interface, dans l'ordonnanceur commun
+        # GRAMMATICAL_RESPONSE_CACHE=<entrées>: les messages déjà vus (salutations, aide...)
+        # reçoivent la même réponse qu'avant, bien qu'échantillonnée, sans nouvelle génération
+        self.engine = ChatEngine(
+            "microsoft/DialoGPT-medium", backend, profile, threads, draft_model,
+            response_cache=ResponseCache(DEFAULT_SIZE) if DEFAULT_SIZE else None,
+            cacheable=True,
+            # Paramètres de génération (pad_token_id et eos_token_id repris du tokenizer)
+            max_new_tokens=300,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True
+        )
+        self.job = None
+        
         # Configuration de l'interface
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("green")
@@ -13,29 +43,14 @@ class DialoGPTChatbot:
         self.root.title("Chatbot Mistral")
         self.root.geometry("900x700")
         
-        # Chargement du modèle DialoGPT
-        self.load_model()
         self.setup_ui()
+        self.root.after(0, self.report_first_paint)
         
-    def load_model(self):
-        """Charge le modèle DialoGPT optimisé"""
-        model_name = "microsoft/DialoGPT-medium"
-        
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name)
-        
-        # Configuration pour éviter les erreurs
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-        # Paramètres de génération
-        self.generation_config = {
-            "max_new_tokens": 300,
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "do_sample": True,
-            "pad_token_id": self.tokenizer.eos_token_id
-        }
+        # Chargement du modèle DialoGPT en arrière-plan: la fenêtre s'affiche tout de suite
+        self.loader = self.engine.start_loading(
+            on_progress=lambda message: self.root.after(0, self.show_status, message),
+            on_done=lambda loader: self.root.after(0, self.model_loaded, loader)
+        )
         
     def setup_ui(self):
         """Interface moderne avec CustomTkinter"""
@@ -53,6 +68,14 @@ class DialoGPTChatbot:
             font=("Arial", 20, "bold")
         ).pack(side="left")
         
+        self.status_label = ctk.CTkLabel(
+            header,
+            text="Chargement du modèle...",
+            font=("Arial", 12),
+            text_color="#9E9E9E"
+        )
+        self.status_label.pack(side="right")
+        
         # Zone de conversation
         self.conversation = ctk.CTkTextbox(
             main_frame,
@@ -76,21 +99,57 @@ class DialoGPTChatbot:
         self.user_input.pack(side="left", fill="x", expand=True, padx=(0, 10))
         self.user_input.bind("<Return>", lambda e: self.send_message())
         
-        send_btn = ctk.CTkButton(
+        self.send_btn = ctk.CTkButton(
             input_frame,
             text="Envoyer",
             command=self.send_message,
             font=("Arial", 14, "bold"),
             height=50,
-            width=100
+            width=100,
+            state="disabled"
+        )
+        self.send_btn.pack(side="right")
+        
+        self.stop_btn = ctk.CTkButton(
+            input_frame,
+            text="Arrêter",
+            command=self.stop_generation,
+            font=("Arial", 14, "bold"),
+            height=50,
+            width=100,
+            state="disabled"
         )
-        send_btn.pack(side="right")
+        self.stop_btn.pack(side="right", padx=(0, 10))
         
         # Style des messages
         self.conversation.tag_config("user", foreground="#4CAF50")
         self.conversation.tag_config("assistant", foreground="#2196F3")
         self.conversation.tag_config("system", foreground="#9E9E9E")
         
+        self.add_message("system", "Chargement du modèle, vous pouvez déjà écrire votre message...")
+    
+    def report_first_paint(self):
+        """Durée entre le lancement et le premier affichage de la fenêtre"""
+        self.first_paint_seconds = time.perf_counter() - STARTED
+        metrics.observe("ui.first_paint", self.first_paint_seconds)
+    
+    def show_status(self, message):
+        self.status_label.configure(text=message)
+    
+    def model_loaded(self, loader):
+        """Débloque l'envoi de messages une fois le modèle chargé"""
+        if loader.error is not None:
+            self.show_status("Échec du chargement")
+            self.add_message("system", f"Erreur au chargement du modèle: {loader.error}")
+            return
+        
+        report = (
+            f"Modèle {self.engine.backend} {self.engine.profile} chargé en {loader.seconds:.1f} s, "
+            f"{self.engine.self_check['tokens_per_second']:.1f} tokens/s, mémoire max {loader.peak_rss_mb or 0:.0f} Mo"
+        )
+        metrics.observe("chat.model_load", loader.seconds)
+        self.show_status(report)
+        self.send_btn.configure(state="normal")
         self.add_message("system", "Prêt à discuter! Posez-moi vos questions.")
     
     def add_message(self, role, content):
@@ -109,55 +168,72 @@ class DialoGPTChatbot:
         if user_text.lower() in ("quit", "exit"):
             self.root.destroy()
             return
+        
+        # Le message reste dans le champ tant que le modèle n'est pas prêt
+        if not self.loader.ready:
+            self.show_status(f"Patientez... {self.loader.message}")
+            return
             
         self.user_input.delete(0, "end")
         self.user_input.configure(state="disabled")
         
         self.add_message("user", user_text)
+        message_start = self.conversation.index("end-1c")
         self.add_message("assistant", "Je réfléchis...")
+        # Début du texte de la réponse, remplacé au fur et à mesure de la génération
+        self.response_start = self.conversation.index(f"{message_start}+{len('Assistant: ')}c")
+        
+        self.streaming = False
+        self.streamer = TextChunkStreamer(self.engine.tokenizer)
+        self.stop_btn.configure(state="normal")
         
-        # Génération dans un thread séparé
-        Thread(target=self.generate_response, args=(user_text,), daemon=True).start()
+        # Génération dans l'ordonnanceur; la réponse revient par root.after
+        self.job = deliver(self.engine.reply(user_text, self.streamer), self.root.after, self.response_done)
+        self.root.after(50, self.flush_stream, self.streamer)
     
-    def generate_response(self, prompt):
-        """Génère la réponse avec DialoGPT"""
-        try:
-            # Formatage du prompt pour DialoGPT
-            inputs = self.tokenizer(
-                prompt + self.tokenizer.eos_token,
-                return_tensors="pt",
-                truncation=True,
-                max_length=1024
-            )
-            
-            # Génération de la réponse
-            outputs = self.model.generate(
-                inputs.input_ids,
-                **self.generation_config
-            )
-            
-            # Décodage de la réponse
-            response = self.tokenizer.decode(
-                outputs[:, inputs.input_ids.shape[-1]:][0],
-                skip_special_tokens=True
-            )
-            
-            # Affichage de la réponse
-            self.root.after(0, lambda: self.finish_response(response))
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.finish_response(f"Erreur: {str(e)}"))
+    def stop_generation(self):
+        """Interrompt la génération en cours; la réponse partielle est conservée"""
+        self.job.token.cancel()
+        self.stop_btn.configure(state="disabled")
+    
+    def flush_stream(self, streamer):
+        """Affiche par lots le texte généré depuis le dernier passage"""
+        if streamer is not self.streamer:
+            return
+        text = streamer.drain()
+        if text:
+            self.conversation.configure(state="normal")
+            if not self.streaming:
+                self.conversation.delete(self.response_start, "end-1c")
+                self.streaming = True
+            self.conversation.insert("end-1c", text, "assistant")
+            self.conversation.configure(state="disabled")
+            self.conversation.see("end")
+        self.root.after(50, self.flush_stream, streamer)
+    
+    def response_done(self, job):
+        error = job.exception()
+        self.finish_response(f"Erreur: {str(error)}" if error is not None else job.result())
+        report = self.engine.turn_report()
+        if report is not None:
+            self.show_status(report)
     
     def finish_response(self, response):
         """Affiche la réponse finale"""
+        self.streamer = None
+        self.streaming = False
+        self.stop_btn.configure(state="disabled")
+        
         self.conversation.configure(state="normal")
-        self.conversation.delete("end-2l linestart", "end")
-        self.conversation.insert("end", response + "\n\n", "assistant")
+        self.conversation.delete(self.response_start, "end-1c")
+        self.conversation.insert("end-1c", response + "\n\n", "assistant")
         self.conversation.configure(state="disabled")
+        self.conversation.see("end")
         
         self.user_input.configure(state="normal")
         self.user_input.focus()
 
 if __name__ == "__main__":
+    configure_from_env()
     app = DialoGPTChatbot()
     app.root.mainloop()
@@ -0,0 +1 @@
+"""Moteurs de Grammatical utilisables sans interface graphique"""
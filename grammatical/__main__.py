@@ -0,0 +1,3 @@
+from grammatical.cli import main
+
+main()
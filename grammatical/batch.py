@@ -0,0 +1,139 @@
+"""Correction en lot de fichiers ou d'enregistrements JSONL par plusieurs processus"""
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from grammatical.correction import classify, correct, first_suggestion, skip_rules, unambiguous_suggestion
+from grammatical.incremental import IncrementalChecker
+
+EXTENSIONS = (".txt", ".md")
+STRATEGIES = {"first": first_suggestion, "unambiguous": unambiguous_suggestion}
+
+
+def iter_records(sources, text_field="text", stdin_format="jsonl"):
+    """Produit (identifiant, texte) au fil de la lecture, sans tout charger"""
+    for source in sources:
+        if source == "-":
+            if stdin_format == "text":
+                yield "-", sys.stdin.read()
+            else:
+                yield from _jsonl_records(sys.stdin, "-", text_field)
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(EXTENSIONS + (".jsonl",)):
+                        yield from iter_records([os.path.join(root, name)], text_field)
+        elif source.endswith(".jsonl"):
+            with open(source, encoding="utf-8") as f:
+                yield from _jsonl_records(f, source, text_field)
+        else:
+            with open(source, encoding="utf-8") as f:
+                yield source, f.read()
+
+
+class InvalidRecord:
+    """Tient lieu de texte pour une ligne illisible: elle ressort en erreur, le lot continue"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _jsonl_records(lines, name, text_field):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        record_id = f"{name}:{number}"
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield record_id, InvalidRecord(f"ligne {number}: JSON invalide ({error.msg}, colonne {error.colno})")
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get(text_field), str):
+            yield record_id, InvalidRecord(f"ligne {number}: objet avec un champ texte {text_field!r} attendu")
+            continue
+        yield record.get("id", record_id), record[text_field]
+
+
+def describe(match):
+    """Erreur sérialisable, avec la même classification que CorrecteurApp"""
+    return {
+        "offset": match.offset,
+        "length": match.errorLength,
+        "rule_id": match.ruleId,
+        "category": classify(match.ruleId),
+        "message": match.message,
+        "replacements": list(match.replacements),
+    }
+
+
+_checker = None
+_choose = first_suggestion
+
+
+def _init_worker(tool_factory, language, remote_server, strategy, skipped_rules):
+    global _checker, _choose
+    if tool_factory is None:
+        import language_tool_python
+        tool_factory = language_tool_python.LanguageTool
+
+    # Chaque processus a son propre LanguageTool (et sa JVM, sauf serveur distant)
+    tool = tool_factory(language, remote_server=remote_server)
+    _checker = IncrementalChecker(tool, language)
+    _choose = STRATEGIES[strategy]
+    if skipped_rules:
+        _choose = skip_rules(*skipped_rules, choose=_choose)
+
+
+def _correct_record(record_id, text):
+    try:
+        result = correct(_checker, text, _choose)
+    except Exception as e:
+        return {"id": record_id, "error": str(e)}
+    return {
+        "id": record_id,
+        "corrected": result.corrected_text,
+        "matches": [describe(match) for match in result.matches],
+    }
+
+
+def correct_records(records, workers=None, max_in_flight=None, language="fr",
+                    remote_server=None, strategy="first", skipped_rules=(), tool_factory=None):
+    """Corrige les enregistrements en parallèle; résultats dans l'ordre d'entrée
+
+    Au plus max_in_flight documents sont en attente à la fois: la lecture des
+    sources avance au rythme des processus de correction. tool_factory remplace
+    language_tool_python.LanguageTool (par ex. pour les benchmarks hors ligne).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 4 * workers
+    pending = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(tool_factory, language, remote_server, strategy, tuple(skipped_rules))) as executor:
+        for record_id, text in records:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            if isinstance(text, InvalidRecord):
+                # Ligne illisible: enregistrement d'erreur à sa place, sans passer par un processus
+                invalid = Future()
+                invalid.set_result({"id": record_id, "error": text.error})
+                pending.append(invalid)
+            else:
+                pending.append(executor.submit(_correct_record, record_id, text))
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(args):
+    records = iter_records(args.sources, args.text_field, args.stdin_format)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in correct_records(records, args.workers, args.max_in_flight, args.language,
+                                      args.remote_server, args.strategy, args.skip_rule):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,251 @@
+"""Génération DialoGPT: conversation multi-tours, affichage au fil de l'eau et arrêt à la demande"""
+import queue
+import time
+
+from grammatical.metrics import metrics
+
+
+class TextChunkStreamer:
+    """Streamer pour model.generate: décode les tokens au fur et à mesure dans une file
+
+    L'interface vide la file par lots (root.after), au lieu d'être appelée à
+    chaque token depuis le thread de génération.
+    """
+
+    def __init__(self, tokenizer, skip_prompt=True):
+        self.tokenizer = tokenizer
+        self.skip_prompt = skip_prompt
+        self.chunks = queue.SimpleQueue()
+        self._token_ids = []
+        self._printed = ""
+
+    def put(self, value):
+        # Le premier appel de generate transmet le prompt
+        if self.skip_prompt:
+            self.skip_prompt = False
+            return
+        self._token_ids.extend(value.flatten().tolist())
+        text = self.tokenizer.decode(self._token_ids, skip_special_tokens=True)
+        # Caractère multi-octets incomplet: on attend le token suivant
+        if not text.endswith("\ufffd"):
+            self._emit(text)
+
+    def end(self):
+        self._emit(self.tokenizer.decode(self._token_ids, skip_special_tokens=True))
+
+    def _emit(self, text):
+        if len(text) > len(self._printed):
+            self.chunks.put(text[len(self._printed):])
+            self._printed = text
+
+    def drain(self):
+        """Texte reçu depuis le dernier appel"""
+        parts = []
+        while True:
+            try:
+                parts.append(self.chunks.get_nowait())
+            except queue.Empty:
+                return "".join(parts)
+
+
+class TimingStreamer:
+    """Enveloppe un streamer (ou aucun) pour mesurer le prefill et le temps par token généré
+
+    generate transmet d'abord le prompt puis les tokens au fil des étapes: le
+    premier écart est le prefill, les suivants sont répartis entre les tokens reçus.
+    """
+
+    def __init__(self, streamer=None):
+        self.streamer = streamer
+        self._last = None
+        self._prefilled = False
+
+    def put(self, value):
+        now = time.perf_counter()
+        if self._last is None:
+            self._last = now
+        else:
+            tokens = value.numel()
+            if not self._prefilled:
+                metrics.observe("chat.prefill", now - self._last)
+                self._prefilled = True
+            else:
+                for _ in range(tokens):
+                    metrics.observe("chat.decode_token", (now - self._last) / tokens)
+            metrics.count("chat.tokens_generated", tokens)
+            self._last = now
+        if self.streamer is not None:
+            self.streamer.put(value)
+
+    def end(self):
+        if self.streamer is not None:
+            self.streamer.end()
+
+
+def timed(streamer):
+    """Streamer à passer à generate: celui d'origine si les mesures sont désactivées"""
+    return TimingStreamer(streamer) if metrics.enabled else streamer
+
+
+def stop_on(event):
+    """Critère d'arrêt pour model.generate: la génération s'interrompt dès que event est levé"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class StopOnEvent(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([StopOnEvent()])
+
+
+def legacy_cache(cache):
+    """Cache clés/valeurs en tuple ((clé, valeur), ...) par couche, quelle que soit la version de transformers"""
+    if cache is None or isinstance(cache, tuple):
+        return cache
+    to_legacy = getattr(cache, "to_legacy_cache", None)
+    if to_legacy is not None:
+        return to_legacy()
+    # transformers 5: plus de to_legacy_cache, une liste de couches
+    return tuple((layer.keys, layer.values) for layer in cache.layers)
+
+
+def accepts_cache_objects(model):
+    """Vrai si model.generate attend un objet Cache plutôt que des tuples par couche
+
+    Décidé par le modèle et non par la présence de DynamicCache: GPT-2 sous
+    transformers 4.4x importe DynamicCache mais le refuse dans generate.
+    """
+    supports = getattr(model, "_supports_cache_class", None)
+    if supports is not None:
+        return bool(supports)
+    try:
+        from transformers import DynamicCache  # noqa: F401
+    except ImportError:
+        return False
+    # transformers 5 n'a plus l'attribut: tous les modèles prennent un Cache
+    return True
+
+
+def model_cache(model, legacy):
+    """Tuple par couche dans la forme que model.generate accepte"""
+    if legacy is None or not accepts_cache_objects(model):
+        return legacy
+    from transformers import DynamicCache
+
+    # update() existe depuis la première version de DynamicCache, from_legacy_cache a disparu en 5
+    cache = DynamicCache()
+    for layer, (key, value) in enumerate(legacy):
+        cache.update(key, value, layer)
+    return cache
+
+
+class ChatSession:
+    """Historique d'une conversation et cache clés/valeurs du modèle qui lui correspond
+
+    À chaque tour, seuls les tokens du nouveau message passent dans le modèle
+    avant la génération. Quand l'historique dépasse max_length - max_new_tokens,
+    les tours les plus anciens sont retirés en entier (jusqu'à trim_ratio du
+    budget, pour ne pas recommencer au tour suivant) et le cache est recalculé.
+    """
+
+    def __init__(self, max_length=1024, max_new_tokens=500, trim_ratio=0.75):
+        self.max_length = max_length
+        self.max_new_tokens = max_new_tokens
+        self.trim_ratio = trim_ratio
+        self.history_ids = None
+        self.past_key_values = None
+        # Position du début de chaque tour (message utilisateur) dans history_ids
+        self.turn_starts = []
+        # Nombre de tokens de la dernière réponse
+        self.last_response_length = 0
+
+    @property
+    def budget(self):
+        """Nombre de tokens d'historique laissant la place à la réponse"""
+        return self.max_length - self.max_new_tokens
+
+    def reset(self):
+        self.history_ids = None
+        self.past_key_values = None
+        self.turn_starts = []
+
+    def generate(self, model, tokenizer, user_text, **generation_kwargs):
+        """Ajoute le message de l'utilisateur à la conversation et renvoie la réponse décodée"""
+        with metrics.timer("chat.tokenize"):
+            new_ids = tokenizer(
+                user_text + tokenizer.eos_token,
+                return_tensors="pt",
+                truncation=True,
+                max_length=self.budget
+            ).input_ids
+        response_ids = self.generate_ids(model, new_ids, **generation_kwargs)
+        with metrics.timer("chat.decode"):
+            return tokenizer.decode(response_ids, skip_special_tokens=True)
+
+    def generate_ids(self, model, new_ids, **generation_kwargs):
+        """Comme generate, à partir des tokens du message; renvoie les tokens de la réponse"""
+        import torch
+
+        input_ids, turn_starts, past_key_values = self.prepare(new_ids)
+        generation_kwargs["streamer"] = timed(generation_kwargs.get("streamer"))
+        try:
+            with torch.inference_mode(), metrics.timer("chat.generate"):
+                outputs = model.generate(
+                    input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    max_new_tokens=self.max_new_tokens,
+                    return_dict_in_generate=True,
+                    **generation_kwargs
+                )
+        except BaseException:
+            # Le cache a pu être complété en partie: il sera reconstruit au prochain tour
+            self.past_key_values = None
+            raise
+
+        return self.commit(outputs.sequences, outputs.past_key_values, turn_starts,
+                           input_ids.shape[-1], generation_kwargs.get("eos_token_id"))
+
+    def prepare(self, new_ids):
+        """Historique complet avec le nouveau message, début des tours et cache encore valable"""
+        import torch
+
+        if self.history_ids is None:
+            input_ids, turn_starts = new_ids, [0]
+        else:
+            input_ids = torch.cat([self.history_ids, new_ids], dim=-1)
+            turn_starts = self.turn_starts + [self.history_ids.shape[-1]]
+
+        past_key_values = self.past_key_values
+        if input_ids.shape[-1] > self.budget:
+            input_ids, turn_starts = self._drop_oldest_turns(input_ids, turn_starts)
+            past_key_values = None
+        return input_ids, turn_starts, past_key_values
+
+    def commit(self, sequences, past_key_values, turn_starts, prompt_length, eos_token_id=None):
+        """Enregistre le tour généré (séquence complète d'une ligne) et renvoie les tokens de la réponse"""
+        import torch
+
+        self.history_ids = sequences
+        self.past_key_values = past_key_values
+        self.turn_starts = turn_starts
+        response_ids = sequences[0, prompt_length:]
+        self.last_response_length = len(response_ids)
+
+        # Réponse interrompue (arrêt ou max_new_tokens): on clôt le tour comme DialoGPT l'attend
+        if isinstance(eos_token_id, int) and (not len(response_ids) or response_ids[-1] != eos_token_id):
+            eos = torch.tensor([[eos_token_id]], dtype=self.history_ids.dtype)
+            self.history_ids = torch.cat([self.history_ids, eos], dim=-1)
+        return response_ids
+
+    def _drop_oldest_turns(self, input_ids, turn_starts):
+        """Retire des tours entiers en tête d'historique, le message en cours étant toujours gardé"""
+        target = int(self.budget * self.trim_ratio)
+        length = input_ids.shape[-1]
+        keep_from = turn_starts[-1]
+        for start in turn_starts:
+            if length - start <= target:
+                keep_from = start
+                break
+        return input_ids[:, keep_from:], [start - keep_from for start in turn_starts if start >= keep_from]
@@ -0,0 +1,95 @@
+"""Découpage des grands textes en morceaux de phrases entières, vérifiés en parallèle"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from grammatical.correction import shifted
+
+# Taille au-delà de laquelle un texte est envoyé au serveur en plusieurs morceaux
+CHUNK_CHARS = 20_000
+
+
+class CheckCancelled(Exception):
+    """La vérification a été abandonnée avant d'avoir analysé tout le texte"""
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])(?:\s*[»\"')\]])*\s+|\n+")
+
+
+def split_sentences(text):
+    """Positions (début, fin) des phrases; elles couvrent tout le texte"""
+    bounds = [0]
+    for found in _SENTENCE_END.finditer(text):
+        if found.end() > bounds[-1]:
+            bounds.append(found.end())
+    if bounds[-1] < len(text):
+        bounds.append(len(text))
+    return list(zip(bounds, bounds[1:]))
+
+
+def chunk_spans(text, max_chars=CHUNK_CHARS, overlap=1):
+    """Morceaux (contexte, début, fin) de phrases entières d'au plus max_chars
+
+    text[contexte:début] reprend les `overlap` dernières phrases du morceau
+    précédent, pour que les erreurs à cheval sur la frontière soient vues.
+    """
+    sentences = split_sentences(text)
+    chunks = []
+    first = 0
+    for i, (start, end) in enumerate(sentences):
+        if i > first and end - sentences[first][0] > max_chars:
+            chunks.append((first, i))
+            first = i
+    if sentences:
+        chunks.append((first, len(sentences)))
+
+    return [(sentences[max(0, first - overlap)][0], sentences[first][0], sentences[last - 1][1])
+            for first, last in chunks]
+
+
+def check_chunked(tool, text, max_chars=CHUNK_CHARS, overlap=1, max_workers=4,
+                  on_chunk=None, cancelled=None):
+    """tool.check sur des morceaux vérifiés en parallèle, erreurs fusionnées et dédoublonnées
+
+    Une erreur entièrement dans le contexte repris du morceau précédent est
+    écartée (ce morceau-là la rapporte); celle qui commence dans le contexte
+    et déborde sur le morceau est gardée: le précédent, coupé à sa fin, ne
+    peut pas la voir.
+
+    on_chunk(erreurs) reçoit les erreurs trouvées jusque-là à chaque morceau
+    terminé; si cancelled() devient vrai, les morceaux pas encore envoyés sont
+    abandonnés et CheckCancelled est levée.
+    """
+    if len(text) <= max_chars:
+        if cancelled is not None and cancelled():
+            raise CheckCancelled()
+        matches = tool.check(text)
+        if on_chunk is not None:
+            on_chunk(matches)
+        return matches
+
+    seen = set()
+    merged = []
+    lock = threading.Lock()
+
+    def check_one(context, start, end):
+        if cancelled is not None and cancelled():
+            raise CheckCancelled()
+        found = [shifted(match, context) for match in tool.check(text[context:end])
+                 if match.offset + context + match.errorLength > start]
+        with lock:
+            for match in found:
+                key = (match.offset, match.errorLength, match.ruleId)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(match)
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(check_one, *span) for span in chunk_spans(text, max_chars, overlap)]
+        for future in as_completed(futures):
+            future.result()
+            if on_chunk is not None:
+                with lock:
+                    partial = sorted(merged, key=lambda m: m.offset)
+                on_chunk(partial)
+    return sorted(merged, key=lambda m: m.offset)
@@ -0,0 +1,81 @@
+"""Point d'entrée en ligne de commande: python -m grammatical <commande>"""
+import argparse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m grammatical", description="Grammatical sans interface graphique")
+    parser.add_argument("--metrics", metavar="PUITS",
+                        help="mesures par étape: jsonl:chemin ou prometheus:[hôte:]port (défaut: GRAMMATICAL_METRICS)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    correct = commands.add_parser("correct", help="corriger des fichiers .txt/.md ou des enregistrements JSONL")
+    correct.add_argument("sources", nargs="*", default=["-"],
+                         help="fichiers, dossiers ou '-' pour l'entrée standard (défaut)")
+    correct.add_argument("-o", "--output", help="fichier JSONL de sortie (défaut: sortie standard)")
+    correct.add_argument("-j", "--workers", type=int, help="nombre de processus (défaut: nombre de cœurs)")
+    correct.add_argument("--max-in-flight", type=int, help="documents en attente au plus (défaut: 4 par processus)")
+    correct.add_argument("-l", "--language", default="fr")
+    correct.add_argument("--remote-server", help="serveur LanguageTool déjà lancé, ex: http://localhost:8081")
+    correct.add_argument("--strategy", choices=["first", "unambiguous"], default="first",
+                         help="choix de la suggestion appliquée")
+    correct.add_argument("--skip-rule", action="append", default=[],
+                         help="règle à ne pas corriger (répétable, préfixe avec '*')")
+    correct.add_argument("--text-field", default="text", help="champ texte des enregistrements JSONL")
+    correct.add_argument("--stdin-format", choices=["jsonl", "text"], default="jsonl")
+
+    pipeline = commands.add_parser("pipeline", help="corriger puis traduire des textes, phrase par phrase")
+    pipeline.add_argument("sources", nargs="*", default=["-"], help="fichiers texte ou '-' pour l'entrée standard")
+    pipeline.add_argument("--src", default="fr", help="langue du texte, corrigée par LanguageTool")
+    pipeline.add_argument("--dest", default="en", help="langue de traduction")
+    pipeline.add_argument("--remote-server", help="serveur LanguageTool déjà lancé, ex: http://localhost:8081")
+    pipeline.add_argument("--translator", choices=["google", "echo"], help="moteur de traduction")
+    pipeline.add_argument("--no-cache", action="store_true", help="ne pas utiliser le cache de traductions")
+    pipeline.add_argument("--queue-size", type=int, default=8, help="phrases en attente au plus entre les étapes")
+    pipeline.add_argument("--jsonl", action="store_true", help="une ligne JSON par phrase au lieu du texte traduit")
+
+    check = commands.add_parser("chat-check", help="débit, mémoire et dérive d'un profil d'inférence des chatbots")
+    check.add_argument("--model", default="microsoft/DialoGPT-medium")
+    check.add_argument("--profile", choices=["fp32", "int8", "bf16"], default="fp32")
+    check.add_argument("--backend", choices=["torch", "onnx"], default="torch",
+                       help="moteur de génération; onnx avec --drift vérifie la parité avec torch")
+    check.add_argument("--threads", type=int, help="threads de calcul (intra-op)")
+    check.add_argument("--drift", action="store_true", help="comparer les réponses gloutonnes à celles de torch en fp32")
+
+    serve = commands.add_parser("serve", help="service de chat local multi-sessions (HTTP)")
+    serve.add_argument("--model", default="microsoft/DialoGPT-medium")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--profile", choices=["fp32", "int8", "bf16"], default="fp32")
+    serve.add_argument("--threads", type=int, help="threads torch (intra-op)")
+    serve.add_argument("--max-sessions", type=int, default=64, help="sessions ouvertes au plus")
+    serve.add_argument("--max-batch", type=int, default=16, help="messages générés ensemble au plus")
+    serve.add_argument("--max-queue", type=int, default=64, help="messages en attente au plus")
+    serve.add_argument("--batch-window", type=float, default=10, help="attente (ms) pour compléter un lot")
+    serve.add_argument("--idle-timeout", type=float, default=600, help="secondes avant fermeture d'une session inactive")
+    serve.add_argument("--cache-timeout", type=float, default=30,
+                       help="secondes d'inactivité avant de libérer le cache clés/valeurs d'une session")
+    serve.add_argument("--max-cached", type=int, help="sessions gardant leur cache clés/valeurs (défaut: --max-batch)")
+    serve.add_argument("--max-new-tokens", type=int, default=200)
+    serve.add_argument("--conversations", help="dossier où enregistrer les conversations pour les reprendre")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from grammatical.metrics import configure_from_env, metrics
+    if args.metrics:
+        metrics.configure(args.metrics)
+    else:
+        configure_from_env()
+    if args.command == "correct":
+        from grammatical import batch
+        batch.run(args)
+    elif args.command == "pipeline":
+        from grammatical import pipeline
+        pipeline.run(args)
+    elif args.command == "chat-check":
+        from grammatical import inference
+        inference.run(args)
+    elif args.command == "serve":
+        from grammatical import server
+        server.run(args)
@@ -0,0 +1,89 @@
+"""Conversations enregistrées sur disque en tokens int32, reprises sans re-tokeniser la transcription"""
+import os
+import re
+
+DEFAULT_DIRECTORY = os.environ.get(
+    "GRAMMATICAL_CONVERSATIONS",
+    os.path.join(os.path.expanduser("~"), ".cache", "grammatical", "conversations"),
+)
+_SESSION_ID = re.compile(r"[\w-]+")
+
+
+class ConversationStore:
+    """Deux fichiers par conversation, complétés à chaque tour:
+
+    <id>.tokens  tokens int32 de tous les tours, bout à bout
+    <id>.turns   position int32 du début de chaque tour dans <id>.tokens
+
+    À la reprise, les tokens sont lus par mmap et seuls les derniers tours
+    entiers tenant dans le budget sont copiés en mémoire.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, session_id):
+        if not _SESSION_ID.fullmatch(session_id):
+            raise ValueError(f"Identifiant de conversation invalide: {session_id!r}")
+        base = os.path.join(self.directory, session_id)
+        return base + ".tokens", base + ".turns"
+
+    def exists(self, session_id):
+        return os.path.exists(self._paths(session_id)[1])
+
+    def append_turn(self, session_id, token_ids):
+        """Ajoute un tour (message de l'utilisateur puis réponse) à la conversation"""
+        import numpy as np
+
+        tokens_path, turns_path = self._paths(session_id)
+        tokens = np.asarray(token_ids, dtype="<i4")
+        start = os.path.getsize(tokens_path) // 4 if os.path.exists(tokens_path) else 0
+        with open(tokens_path, "ab") as f:
+            f.write(tokens.tobytes())
+        # L'index est écrit après les tokens: un tour interrompu n'est jamais référencé
+        with open(turns_path, "ab") as f:
+            f.write(np.array([start], dtype="<i4").tobytes())
+
+    def turns(self, session_id):
+        """Tokens (mmap, lecture seule) et début de chaque tour; tableaux vides si inconnue"""
+        import numpy as np
+
+        tokens_path, turns_path = self._paths(session_id)
+        if not os.path.exists(turns_path) or not os.path.exists(tokens_path) or not os.path.getsize(tokens_path):
+            return np.zeros(0, dtype="<i4"), np.zeros(0, dtype="<i4")
+        tokens = np.memmap(tokens_path, dtype="<i4", mode="r")
+        starts = np.fromfile(turns_path, dtype="<i4")
+        return tokens, starts[starts < len(tokens)]
+
+    def load(self, session_id, budget):
+        """Derniers tours entiers tenant dans budget tokens: (tokens int64, débuts de tours relatifs)"""
+        import numpy as np
+
+        tokens, starts = self.turns(session_id)
+        keep = [start for start in starts if len(tokens) - start <= budget]
+        if not keep:
+            return np.zeros(0, dtype=np.int64), []
+        first = keep[0]
+        return np.array(tokens[first:], dtype=np.int64), [int(start - first) for start in keep]
+
+    def record(self, session_id, session):
+        """Enregistre le dernier tour d'une ChatSession"""
+        start = session.turn_starts[-1]
+        self.append_turn(session_id, session.history_ids[0, start:].tolist())
+
+    def restore(self, session_id, session):
+        """Reprend la conversation dans session; le cache du modèle sera recalculé au prochain tour"""
+        import torch
+
+        ids, turn_starts = self.load(session_id, int(session.budget * session.trim_ratio))
+        session.reset()
+        if turn_starts:
+            session.history_ids = torch.from_numpy(ids).unsqueeze(0)
+            session.turn_starts = turn_starts
+        return len(turn_starts)
+
+    def delete(self, session_id):
+        for path in self._paths(session_id):
+            if os.path.exists(path):
+                os.remove(path)
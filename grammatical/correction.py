@@ -0,0 +1,107 @@
+"""Correction en une seule passe à partir des erreurs renvoyées par LanguageTool"""
+import copy
+
+from grammatical.metrics import metrics
+
+
+def first_suggestion(match):
+    """Retient la première suggestion, comme tool.correct"""
+    return match.replacements[0] if match.replacements else None
+
+
+def unambiguous_suggestion(match):
+    """Ne corrige que lorsque LanguageTool ne propose qu'une seule suggestion"""
+    return match.replacements[0] if len(match.replacements) == 1 else None
+
+
+def skip_rules(*rule_ids, choose=first_suggestion):
+    """Ignore les règles données (préfixes acceptés avec '*', ex: 'CONFUSIONS_*')"""
+    exact = {rule for rule in rule_ids if not rule.endswith("*")}
+    prefixes = tuple(rule[:-1] for rule in rule_ids if rule.endswith("*"))
+
+    def choose_skipping(match):
+        if match.ruleId in exact or (prefixes and match.ruleId.startswith(prefixes)):
+            return None
+        return choose(match)
+
+    return choose_skipping
+
+
+def shifted(match, delta):
+    """Copie d'une erreur dont la position est décalée de delta caractères"""
+    moved = copy.copy(match)
+    moved.offset = match.offset + delta
+    return moved
+
+
+def apply_matches(text, matches, choose=first_suggestion):
+    """Applique une suggestion par erreur, sans chevauchement, de droite à gauche"""
+    edits = []
+    end = -1
+    for match in sorted(matches, key=lambda m: (m.offset, m.errorLength)):
+        if match.offset < end:
+            continue
+        replacement = choose(match)
+        if replacement is None:
+            continue
+        edits.append((match.offset, match.offset + match.errorLength, replacement))
+        end = match.offset + match.errorLength
+
+    # Morceaux assemblés en une fois: linéaire même avec des milliers d'erreurs
+    pieces = []
+    stop = len(text)
+    for start, end, replacement in reversed(edits):
+        pieces.append(text[end:stop])
+        pieces.append(replacement)
+        stop = start
+    pieces.append(text[:stop])
+    return "".join(reversed(pieces))
+
+
+def classify(rule_id):
+    """Catégorie affichée pour une règle: 'accord', 'confusion' ou None"""
+    if rule_id == "FR_AGREEMENT":
+        return "accord"
+    if rule_id.startswith("CONFUSIONS_"):
+        return "confusion"
+    return None
+
+
+def explain(match):
+    """Bloc d'explication affiché pour une erreur"""
+    category = classify(match.ruleId)
+    if category == "accord":
+        error_msg = f"Erreur d'accord: {match.message}"
+    elif category == "confusion":
+        error_msg = f"Confusion possible: {match.message}"
+    else:
+        error_msg = match.message
+
+    return (
+        f"● {error_msg}\n"
+        f"   → Correction suggérée: {match.replacements[0] if match.replacements else 'Aucune suggestion'}\n"
+        f"   (Type: {match.ruleId})\n\n"
+    )
+
+
+class CorrectionResult:
+    """Texte corrigé et explications issus d'un même appel à check"""
+
+    def __init__(self, text, corrected_text, matches):
+        self.text = text
+        self.corrected_text = corrected_text
+        self.matches = matches
+
+    @property
+    def explications(self):
+        return [explain(match) for match in self.matches]
+
+
+def correct(tool, text, choose=first_suggestion, **check_options):
+    """Analyse le texte une seule fois et en déduit la correction et les explications"""
+    with metrics.timer("correction.check"):
+        matches = tool.check(text, **check_options)
+    metrics.count("correction.matches", len(matches))
+    with metrics.timer("correction.apply"):
+        corrected_text = apply_matches(text, matches, choose)
+    return CorrectionResult(text, corrected_text, matches)
@@ -0,0 +1,259 @@
+"""Moteurs sans interface (correction, traduction, chat) exécutés par l'ordonnanceur commun
+
+Chaque méthode de travail renvoie un Job (Future); les rappels de progression
+(on_partial, on_item, streamer) sont appelés depuis un thread de l'ordonnanceur.
+Les applications Tk les repassent dans leur boucle par root.after.
+"""
+from concurrent import futures
+
+from grammatical import inference
+from grammatical.chat import stop_on, timed
+from grammatical.correction import correct, first_suggestion
+from grammatical.incremental import IncrementalChecker
+from grammatical.languagetool import pool
+from grammatical.metrics import metrics
+from grammatical.models import DIALOGPT, BackgroundLoader
+from grammatical.response_cache import cache_key, deterministic, normalize_prompt
+from grammatical.scheduler import INTERACTIVE, CancelToken, scheduler
+from grammatical.speculative import DEFAULT_DRAFT, AssistedDecoding, load_draft
+
+
+class CorrectionEngine:
+    """Correction LanguageTool; seuls les paragraphes modifiés depuis la dernière fois sont revérifiés"""
+
+    def __init__(self, language="fr", choose=first_suggestion, tool_pool=pool, jobs=scheduler):
+        self.language = language
+        self.choose = choose
+        self.pool = tool_pool
+        self.jobs = jobs
+        self.checker = IncrementalChecker(tool_pool.tool(language), language)
+
+    def warm_up(self):
+        """Démarre le serveur LanguageTool sans attendre la première correction"""
+        return self.pool.warm_up(self.language)
+
+    def check(self, text, on_partial=None, priority=INTERACTIVE, token=None):
+        """Job dont le résultat est un CorrectionResult; CheckCancelled si le jeton est levé en route"""
+        token = token or CancelToken()
+        return self.jobs.submit(correct, self.checker, text, self.choose, on_partial=on_partial,
+                                cancelled=token, priority=priority, token=token)
+
+
+class TranslationEngine:
+    """Traduction phrase par phrase (avec cache), seule ou précédée de la correction"""
+
+    def __init__(self, sentence_translator, pipeline=None, src="fr", dest="en", jobs=scheduler):
+        self.sentence_translator = sentence_translator
+        self.pipeline = pipeline
+        self.src = src
+        self.dest = dest
+        self.jobs = jobs
+
+    def translate(self, text, priority=INTERACTIVE, token=None):
+        """Job dont le résultat est le texte traduit"""
+        return self.jobs.submit(self.sentence_translator.translate, text, self.src, self.dest,
+                                priority=priority, token=token)
+
+    def correct_and_translate(self, text, on_item, priority=INTERACTIVE, token=None):
+        """Job qui passe chaque PipelineItem à on_item dès qu'il est prêt; résultat: statistiques des étapes"""
+        token = token or CancelToken()
+        return self.jobs.submit(self._correct_and_translate, text, on_item, token, priority=priority, token=token)
+
+    def _correct_and_translate(self, text, on_item, token):
+        for item in self.pipeline.stream(text, cancelled=token):
+            on_item(item)
+        return f"{self.pipeline.correction} · {self.pipeline.translation}"
+
+
+class ChatEngine:
+    """DialoGPT prêt à répondre: chargement, auto-test, décodage assisté et conversation éventuelle
+
+    Avec session (ChatSession), la conversation continue d'un tour à l'autre et
+    peut être enregistrée dans store; sans session, chaque message est traité
+    seul. Avec response_cache (ResponseCache), un message déjà vu dans le même
+    contexte reçoit la même réponse sans génération, si la génération est
+    déterministe ou si cacheable l'autorise malgré l'échantillonnage.
+    """
+
+    def __init__(self, model_name=DIALOGPT, backend=None, profile=None, threads=None, draft_model=None,
+                 session=None, store=None, conversation_id=None, jobs=scheduler, response_cache=None,
+                 cacheable=False, **generation_kwargs):
+        self.model_name = model_name
+        self.backend = backend or inference.DEFAULT_BACKEND
+        self.profile = profile or inference.DEFAULT_PROFILE
+        self.threads = threads or inference.DEFAULT_THREADS
+        self.draft_model = draft_model if draft_model is not None else DEFAULT_DRAFT
+        self.session = session
+        self.store = store
+        self.conversation_id = conversation_id
+        self.jobs = jobs
+        self.response_cache = response_cache
+        self.cacheable = cacheable
+        self.generation_kwargs = generation_kwargs
+        self.tokenizer = None
+        self.model = None
+        self.assisted = None
+        self.self_check = None
+        self.resumed_turns = 0
+        self.loader = None
+
+    def start_loading(self, on_progress=None, on_done=None):
+        """Chargement en tâche de fond; on_progress et on_done sont appelés depuis l'ordonnanceur"""
+        self.loader = BackgroundLoader(self.load, on_progress, on_done, jobs=self.jobs).start()
+        return self.loader
+
+    @property
+    def ready(self):
+        return self.loader is not None and self.loader.ready
+
+    def load(self, progress=None):
+        self.tokenizer, self.model, self.profile = inference.load_chat_model(
+            self.model_name, self.backend, self.profile, self.threads, progress
+        )
+        self.generation_kwargs.setdefault("pad_token_id", self.tokenizer.pad_token_id)
+        self.generation_kwargs.setdefault("eos_token_id", self.tokenizer.eos_token_id)
+
+        if progress is not None:
+            progress(f"Auto-test du profil {self.profile}...")
+        self.self_check = inference.self_check(self.model, self.tokenizer, self.profile)
+
+        # Le décodage assisté s'appuie sur model.generate de transformers: moteur torch seulement
+        if self.draft_model and self.backend == "torch":
+            draft = load_draft(self.draft_model, self.tokenizer, self.profile, self.threads, progress)
+            self.assisted = AssistedDecoding(
+                self.model, draft, baseline_tokens_per_second=self.self_check["tokens_per_second"]
+            )
+
+        # Derniers tours de la conversation précédente, déjà en tokens
+        if self.store is not None and self.session is not None:
+            self.resumed_turns = self.store.restore(self.conversation_id, self.session)
+
+    def reply(self, text, streamer=None, priority=INTERACTIVE, token=None):
+        """Job dont le résultat est la réponse décodée; lever le jeton arrête la génération"""
+        token = token or CancelToken()
+        return self.jobs.submit(self._reply, text, streamer, token, priority=priority, token=token)
+
+    def _reply(self, text, streamer, token):
+        caching = self.response_cache is not None and (self.cacheable or deterministic(self.generation_kwargs))
+        with metrics.timer("chat.tokenize"):
+            new_ids = self.tokenizer(
+                (normalize_prompt(text) if caching else text) + self.tokenizer.eos_token,
+                return_tensors="pt",
+                truncation=True,
+                max_length=self.session.budget if self.session is not None else 1024
+            ).input_ids
+        response_ids = self._cached(new_ids, streamer, token) if caching else self._generate(new_ids, streamer, token)
+        with metrics.timer("chat.decode"):
+            return self.tokenizer.decode(response_ids, skip_special_tokens=True)
+
+    def _generate(self, new_ids, streamer, token):
+        assisted = self.assisted.begin() if self.assisted is not None else {}
+        if self.session is not None:
+            # Seul le nouveau message passe dans le modèle, l'historique est déjà dans son cache
+            response_ids = self.session.generate_ids(
+                self.model, new_ids,
+                streamer=streamer,
+                stopping_criteria=stop_on(token),
+                **self.generation_kwargs,
+                **assisted
+            )
+            if self.store is not None:
+                self.store.record(self.conversation_id, self.session)
+        else:
+            with inference.inference_mode(), metrics.timer("chat.generate"):
+                outputs = self.model.generate(
+                    new_ids,
+                    streamer=timed(streamer),
+                    stopping_criteria=stop_on(token),
+                    **self.generation_kwargs,
+                    **assisted
+                )
+            response_ids = outputs[0, new_ids.shape[-1]:]
+
+        if self.assisted is not None:
+            self.assisted.end(len(response_ids))
+        return response_ids
+
+    def _cached(self, new_ids, streamer, token):
+        """Réponse du cache, ou de la génération en cours pour le même message, ou générée puis mise en cache"""
+        history = ()
+        config = self.generation_kwargs
+        if self.session is not None:
+            config = dict(config, max_new_tokens=self.session.max_new_tokens)
+            if self.session.history_ids is not None:
+                history = self.session.history_ids[0].tolist()
+        key = cache_key((self.model_name, self.backend, self.profile), new_ids[0].tolist(), config, history)
+
+        response_ids, waiting = self.response_cache.lookup(key)
+        if waiting is not None:
+            # Attente par intervalles courts: Stop doit agir sans attendre la génération partagée
+            while not waiting.done():
+                if token.is_set():
+                    return []
+                futures.wait([waiting], timeout=0.05)
+            response_ids = waiting.result()
+            if response_ids is None:
+                # La génération partagée a échoué ou a été arrêtée: on génère nous-mêmes
+                return self._generate(new_ids, streamer, token)
+        if response_ids is not None:
+            self._replay(new_ids, response_ids, streamer)
+            return response_ids
+
+        try:
+            response_ids = self._generate(new_ids, streamer, token)
+        except BaseException:
+            self.response_cache.publish(key, None)
+            raise
+        # Réponse interrompue: ni mise en cache ni partagée
+        self.response_cache.publish(key, None if token.is_set() else response_ids.tolist())
+        return response_ids
+
+    def _replay(self, new_ids, response_ids, streamer):
+        """Tour servi par le cache: ajouté à la conversation et transmis au streamer comme une génération"""
+        import torch
+
+        response = torch.tensor([response_ids], dtype=new_ids.dtype)
+        if self.session is not None:
+            # Pas de cache clés/valeurs pour ce tour: il sera recalculé au suivant
+            input_ids, turn_starts, _ = self.session.prepare(new_ids)
+            self.session.commit(torch.cat([input_ids, response], dim=-1), None, turn_starts,
+                                input_ids.shape[-1], self.generation_kwargs.get("eos_token_id"))
+            if self.store is not None:
+                self.store.record(self.conversation_id, self.session)
+        if streamer is not None:
+            streamer.put(new_ids)
+            streamer.put(response[0])
+            streamer.end()
+
+    def turn_report(self):
+        """Bilan du dernier tour à afficher (décodage assisté, cache de réponses), ou None"""
+        parts = []
+        if self.assisted is not None and self.assisted.reports:
+            parts.append(self.assisted.describe(self.assisted.reports[-1]))
+        if self.response_cache is not None:
+            parts.append(str(self.response_cache))
+        return " · ".join(parts) or None
+
+    def reset(self):
+        """Nouvelle conversation: l'historique en mémoire et enregistré est effacé"""
+        if self.session is not None:
+            self.session.reset()
+        if self.store is not None:
+            self.store.delete(self.conversation_id)
+
+    def history(self):
+        """Tours (message, réponse) de la conversation en cours, décodés"""
+        if self.session is None or self.session.history_ids is None:
+            return []
+        ids = self.session.history_ids[0].tolist()
+        starts = self.session.turn_starts + [len(ids)]
+        eos = self.tokenizer.eos_token_id
+        turns = []
+        for start, end in zip(starts, starts[1:]):
+            turn = ids[start:end]
+            # Un tour: message de l'utilisateur jusqu'au premier eos, puis la réponse
+            split = turn.index(eos) + 1 if eos in turn else len(turn)
+            turns.append((self.tokenizer.decode(turn[:split], skip_special_tokens=True),
+                          self.tokenizer.decode(turn[split:], skip_special_tokens=True)))
+        return turns
+
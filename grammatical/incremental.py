@@ -0,0 +1,131 @@
+"""Re-vérification incrémentale: seuls les paragraphes modifiés partent au serveur"""
+import bisect
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from grammatical.chunking import CHUNK_CHARS, check_chunked
+from grammatical.correction import shifted
+
+# Séparateur utilisé pour regrouper les paragraphes à vérifier en une seule requête
+SEPARATOR = "\n\n"
+_PARAGRAPH = re.compile(r"[^\n]+")
+
+
+def split_paragraphs(text):
+    """Paragraphes non vides du texte, avec leur position: [(offset, paragraphe)]"""
+    return [(found.start(), found.group()) for found in _PARAGRAPH.finditer(text)
+            if not found.group().isspace()]
+
+
+class MatchCache:
+    """Cache LRU borné des erreurs par (langue, empreinte du paragraphe)"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(language, segment):
+        return language, hashlib.blake2b(segment.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            matches = self._data.get(key)
+            if matches is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return matches
+
+    def put(self, key, matches):
+        with self._lock:
+            self._data[key] = tuple(matches)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+match_cache = MatchCache()
+
+
+class IncrementalChecker:
+    """S'utilise comme tool.check; ne ré-analyse que les paragraphes inconnus du cache
+
+    Les paragraphes à vérifier partent ensemble, découpés en morceaux de
+    max_chars vérifiés en parallèle (voir grammatical.chunking).
+    """
+
+    def __init__(self, tool, language, cache=match_cache, max_chars=CHUNK_CHARS, max_workers=4,
+                 partial_interval=0.2):
+        self.tool = tool
+        self.language = language
+        self.cache = cache
+        self.max_chars = max_chars
+        self.max_workers = max_workers
+        # Intervalle minimal entre deux résultats partiels, pour ne pas noyer l'interface
+        self.partial_interval = partial_interval
+
+    def check(self, text, on_partial=None, cancelled=None):
+        """Erreurs du texte; on_partial(erreurs) reçoit les résultats au fil des morceaux"""
+        segments = split_paragraphs(text)
+        keys = [self.cache.key(self.language, segment) for _, segment in segments]
+        found = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, matches in enumerate(found) if matches is None]
+        if missing:
+            batch = [segments[i][1] for i in missing]
+
+            last_report = [0.0]
+
+            def report(matches):
+                now = time.monotonic()
+                if now - last_report[0] < self.partial_interval:
+                    return
+                last_report[0] = now
+                partial = list(found)
+                for i, segment_matches in zip(missing, self._split_by_segment(batch, matches)):
+                    partial[i] = segment_matches
+                on_partial(self._in_document(segments, partial))
+
+            matches = check_chunked(self.tool, SEPARATOR.join(batch), self.max_chars,
+                                    max_workers=self.max_workers, cancelled=cancelled,
+                                    on_chunk=report if on_partial is not None else None)
+            for i, segment_matches in zip(missing, self._split_by_segment(batch, matches)):
+                self.cache.put(keys[i], segment_matches)
+                found[i] = segment_matches
+
+        return self._in_document(segments, found)
+
+    @staticmethod
+    def _in_document(segments, found):
+        return [shifted(match, offset)
+                for (offset, _), matches in zip(segments, found) if matches is not None
+                for match in matches]
+
+    @staticmethod
+    def _split_by_segment(segments, matches):
+        """Répartit les erreurs du lot par paragraphe, en positions relatives au paragraphe"""
+        starts = []
+        position = 0
+        for segment in segments:
+            starts.append(position)
+            position += len(segment) + len(SEPARATOR)
+
+        per_segment = [[] for _ in segments]
+        for match in matches:
+            i = bisect.bisect_right(starts, match.offset) - 1
+            # Une erreur à cheval sur le séparateur n'existe pas dans le document
+            if match.offset + match.errorLength <= starts[i] + len(segments[i]):
+                per_segment[i].append(shifted(match, -starts[i]))
+        return per_segment
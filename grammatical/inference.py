@@ -0,0 +1,174 @@
+"""Profils d'inférence CPU pour les chatbots: fp32, int8 dynamique, bf16, et moteur torch ou ONNX Runtime"""
+import copy
+import json
+import os
+import time
+import warnings
+
+from grammatical.memory import current_rss_mb, peak_rss_mb
+from grammatical.models import load_dialogpt
+
+PROFILES = ("fp32", "int8", "bf16")
+DEFAULT_PROFILE = os.environ.get("GRAMMATICAL_PROFILE", "fp32")
+BACKENDS = ("torch", "onnx")
+DEFAULT_BACKEND = os.environ.get("GRAMMATICAL_BACKEND", "torch")
+DEFAULT_THREADS = int(os.environ.get("GRAMMATICAL_THREADS", 0)) or None
+
+SELF_CHECK_PROMPT = "Hello, how are you today?"
+DRIFT_PROMPTS = [
+    "Hello, how are you today?",
+    "What is your favourite book?",
+    "Can you help me with my homework?",
+    "Bonjour, comment ça va ?",
+    "Tell me a joke.",
+]
+
+
+def cpu_supports_bf16():
+    """Le processeur a-t-il des instructions bf16 (AVX512-BF16, AMX)?"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def inference_mode():
+    """Contexte torch.inference_mode, sans importer torch au chargement du module"""
+    import torch
+    return torch.inference_mode()
+
+
+def _conv1d_to_linear(model):
+    """Remplace les Conv1D de GPT-2 par des nn.Linear équivalents, seuls quantifiables"""
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+
+
+def apply_profile(model, profile=DEFAULT_PROFILE, threads=DEFAULT_THREADS):
+    """Prépare le modèle pour le profil demandé; renvoie (modèle, profil effectif)
+
+    threads fixe le nombre de threads des opérations torch (intra-op).
+    Sans support bf16 du processeur, on reste en fp32.
+    """
+    import torch
+
+    if profile not in PROFILES:
+        raise ValueError(f"Profil inconnu: {profile} (attendu: {', '.join(PROFILES)})")
+    if threads:
+        torch.set_num_threads(threads)
+    model.eval()
+
+    if profile == "int8":
+        _conv1d_to_linear(model)
+        with warnings.catch_warnings():
+            # torch.ao.quantization est déprécié au profit de torchao, mais reste sans dépendance
+            warnings.simplefilter("ignore")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif profile == "bf16":
+        if not cpu_supports_bf16():
+            warnings.warn("Pas d'instructions bf16 sur ce processeur: profil fp32 utilisé")
+            return model, "fp32"
+        model = model.to(torch.bfloat16)
+    return model, profile
+
+
+def load_chat_model(model_name, backend=DEFAULT_BACKEND, profile=DEFAULT_PROFILE, threads=DEFAULT_THREADS,
+                    progress=None):
+    """Tokenizer, modèle prêt pour generate() et profil effectif, selon le moteur choisi
+
+    Le moteur onnx exporte le graphe au premier lancement puis ne charge plus
+    les poids torch; il tourne en fp32.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+    if backend == "onnx":
+        if profile != "fp32":
+            warnings.warn(f"Profil {profile} sans effet avec ONNX Runtime: profil fp32 utilisé")
+        from grammatical.onnx_backend import load_onnx_dialogpt
+        tokenizer, model = load_onnx_dialogpt(model_name, threads, progress)
+        return tokenizer, model, "fp32"
+
+    tokenizer, model = load_dialogpt(model_name, progress)
+    model, profile = apply_profile(model, profile, threads)
+    return tokenizer, model, profile
+
+
+def greedy_ids(model, tokenizer, prompt, max_new_tokens=32):
+    """Réponse déterministe (glouton) à un message, en ids de tokens"""
+    input_ids = tokenizer(prompt + tokenizer.eos_token, return_tensors="pt").input_ids
+    with inference_mode():
+        outputs = model.generate(input_ids, attention_mask=input_ids.new_ones(input_ids.shape),
+                                 max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens,
+                                 do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    return outputs[0, input_ids.shape[-1]:].tolist()
+
+
+def self_check(model, tokenizer, profile, max_new_tokens=32):
+    """Mesure rapide au démarrage: débit de génération et mémoire pour le profil choisi"""
+    import torch
+
+    start = time.perf_counter()
+    generated = greedy_ids(model, tokenizer, SELF_CHECK_PROMPT, max_new_tokens)
+    seconds = time.perf_counter() - start
+    return {
+        "profile": profile,
+        "threads": torch.get_num_threads(),
+        "tokens_per_second": round(len(generated) / seconds, 2),
+        "rss_mb": round(current_rss_mb() or 0),
+        "peak_rss_mb": round(peak_rss_mb() or 0),
+    }
+
+
+def quality_drift(reference, candidate, tokenizer, prompts=DRIFT_PROMPTS, max_new_tokens=32):
+    """Compare les réponses gloutonnes d'un profil ou d'un moteur à celles du modèle torch fp32
+
+    Renvoie la part de réponses identiques et la part moyenne de tokens
+    identiques avant la première divergence.
+    """
+    identical = 0
+    prefix_ratios = []
+    for prompt in prompts:
+        expected = greedy_ids(reference, tokenizer, prompt, max_new_tokens)
+        actual = greedy_ids(candidate, tokenizer, prompt, max_new_tokens)
+        identical += expected == actual
+        common = 0
+        for a, b in zip(expected, actual):
+            if a != b:
+                break
+            common += 1
+        prefix_ratios.append(common / max(len(expected), 1))
+    return {
+        "prompts": len(prompts),
+        "identical_responses": identical / len(prompts),
+        "mean_common_prefix": round(sum(prefix_ratios) / len(prefix_ratios), 3),
+    }
+
+
+def run(args):
+    if args.backend == "onnx":
+        from grammatical.onnx_backend import load_onnx_dialogpt
+
+        # Parité avec le chemin torch: le modèle torch sert de référence
+        reference = load_dialogpt(args.model)[1] if args.drift else None
+        tokenizer, model = load_onnx_dialogpt(args.model, args.threads)
+        profile = "fp32"
+    else:
+        tokenizer, model = load_dialogpt(args.model)
+        reference = copy.deepcopy(model) if args.drift and args.profile != "fp32" else None
+        model, profile = apply_profile(model, args.profile, args.threads)
+    report = self_check(model, tokenizer, profile)
+    report["backend"] = args.backend
+    if reference is not None:
+        report["drift"] = quality_drift(reference, model, tokenizer)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
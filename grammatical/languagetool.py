@@ -0,0 +1,297 @@
+"""Serveurs LanguageTool partagés par langue, démarrés à la demande"""
+import atexit
+import contextlib
+import os
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+
+from grammatical.metrics import metrics
+from grammatical.scheduler import BACKGROUND, scheduler
+
+# Serveur local sur lequel se greffer s'il tourne déjà (port par défaut de language_tool_python);
+# une JVM démarrée par le pool écoute sur cet hôte, au premier port libre à partir de LOCAL_PORT
+LOCAL_HOST = os.environ.get("GRAMMATICAL_LT_HOST", "localhost")
+LOCAL_PORT = int(os.environ.get("GRAMMATICAL_LT_PORT", 8081))
+LOCAL_SERVER = f"http://{LOCAL_HOST}:{LOCAL_PORT}"
+IDLE_TIMEOUT = float(os.environ.get("GRAMMATICAL_LT_IDLE_TIMEOUT", 600))
+START_TIMEOUT = 180.0
+
+
+def server_answers(url, timeout=0.3):
+    """Indique si un serveur LanguageTool répond à cette adresse"""
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/v2/languages", timeout=timeout):
+            return True
+    except (OSError, ValueError):
+        return False
+
+
+def free_port(host, first, attempts=100):
+    """Premier port de host, à partir de first, sur lequel rien n'écoute"""
+    for port in range(first, first + attempts):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            try:
+                probe.bind((host, port))
+            except OSError:
+                continue
+            return port
+    raise OSError(f"aucun port libre sur {host} entre {first} et {first + attempts - 1}")
+
+
+class LocalServer:
+    """JVM LanguageTool lancée par le pool sur un hôte et un port qu'il a choisis: son adresse est connue d'avance"""
+
+    def __init__(self, host=LOCAL_HOST, port=LOCAL_PORT, timeout=START_TIMEOUT):
+        from language_tool_python.download_lt import download_lt
+        from language_tool_python.utils import ServerError, get_server_cmd
+
+        download_lt()
+        port = free_port(host, port)
+        self.url = f"http://{host}:{port}"
+        self.process = subprocess.Popen(get_server_cmd(port), stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+        while not server_answers(self.url):
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.close()
+                raise ServerError(f"LanguageTool n'a pas démarré sur {self.url}")
+            time.sleep(0.2)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class _Entry:
+    def __init__(self, tool, url, server=None):
+        self.tool = tool
+        self.url = url
+        self.server = server
+        # Vérifications en cours sur ce serveur: il n'est pas arrêté tant qu'il y en a
+        self.in_use = 0
+        # Sorti du pool (inactif ou serveur disparu): arrêté à la fin du dernier appel
+        self.retired = False
+        self.last_used = time.monotonic()
+
+    @property
+    def owned(self):
+        return self.server is not None
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+class LanguageToolPool:
+    """Un LanguageTool par langue pour tout le processus, arrêté après inactivité
+
+    remote_server (ou GRAMMATICAL_LT_SERVER) désigne un serveur déjà lancé.
+    Sinon on se greffe sur http://host:port s'il répond, et en dernier recours
+    on démarre une JVM sur host (GRAMMATICAL_LT_HOST), au premier port libre à
+    partir de port (GRAMMATICAL_LT_PORT), réutilisée ensuite par les autres langues.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, remote_server=None, host=LOCAL_HOST, port=LOCAL_PORT):
+        self.idle_timeout = idle_timeout
+        self.remote_server = remote_server or os.environ.get("GRAMMATICAL_LT_SERVER")
+        self.host = host
+        self.port = port
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def tool(self, language):
+        """Proxy léger: le serveur n'est démarré qu'au premier appel"""
+        return PooledTool(self, language)
+
+    def warm_up(self, language):
+        """Démarre le serveur de la langue en arrière-plan, dans l'ordonnanceur commun"""
+        return scheduler.submit(self.acquire, language, priority=BACKGROUND)
+
+    def acquire(self, language):
+        """LanguageTool de la langue, démarré si besoin
+
+        Le serveur peut être arrêté après idle_timeout: pour un appel qui
+        dure, passer par lease(), qui le protège jusqu'à la fin du bloc.
+        """
+        with self.lease(language) as tool:
+            return tool
+
+    @contextlib.contextmanager
+    def lease(self, language):
+        """with pool.lease("fr") as tool: ... ; reap n'arrête pas le serveur avant la fin du bloc"""
+        entry = self._checkout(language)
+        try:
+            yield entry.tool
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                server = self._retire(entry) if entry.retired else None
+            if server is not None:
+                server.close()
+
+    def _checkout(self, language):
+        with self._lock:
+            lock = self._locks.setdefault(language, threading.Lock())
+        with lock:
+            # Compté sous self._lock, comme reap: une entrée comptée n'est plus arrêtée
+            with self._lock:
+                entry = self._entries.get(language)
+                if entry is not None:
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+            with metrics.timer("languagetool.start"):
+                entry = self._start(language)
+            entry.in_use = 1
+            with self._lock:
+                self._entries[language] = entry
+            self._start_reaper()
+            return entry
+
+    def discard(self, language, tool):
+        """Oublie le serveur de la langue si tool en vient et qu'il ne répond plus; indique s'il a été oublié
+
+        Une erreur d'un serveur qui répond (règle, requête refusée) ne le
+        remet pas en cause: rien n'est oublié.
+        """
+        with self._lock:
+            entry = self._entries.get(language)
+        if entry is None or entry.tool is not tool or server_answers(entry.url):
+            return False
+        with self._lock:
+            if self._entries.get(language) is entry:
+                del self._entries[language]
+                entry.retired = True
+                server = self._retire(entry)
+            else:
+                server = None
+        if server is not None:
+            server.close()
+        return True
+
+    def _retire(self, entry):
+        """Sous self._lock, pour une entrée sortie de _entries: serveur à arrêter maintenant, ou None
+
+        Rien tant que des appels sont en cours (le dernier s'en charge). Une
+        JVM dont se servent encore d'autres langues leur est confiée au lieu
+        d'être arrêtée.
+        """
+        if entry.server is None or entry.in_use:
+            return None
+        server, entry.server = entry.server, None
+        heir = next((other for other in self._entries.values() if other.url == entry.url), None)
+        if heir is not None:
+            heir.server = server
+            return None
+        return server
+
+    def _start(self, language):
+        import language_tool_python
+
+        url = self.remote_server or self._running_url()
+        server = None
+        if not url:
+            # JVM lancée à une adresse choisie ici, à laquelle les autres langues se greffent
+            server = LocalServer(self.host, self.port)
+            url = server.url
+        try:
+            tool = language_tool_python.LanguageTool(language, remote_server=url)
+        except Exception:
+            if server is not None:
+                server.close()
+            raise
+        return _Entry(tool, url, server)
+
+    def _running_url(self):
+        with self._lock:
+            owned = [entry.url for entry in self._entries.values() if entry.owned]
+        # Une JVM confiée à une autre langue après une panne peut ne plus répondre
+        for url in owned:
+            if server_answers(url):
+                return url
+        local = f"http://{self.host}:{self.port}"
+        return local if server_answers(local) else None
+
+    def _start_reaper(self):
+        if not self.idle_timeout or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_forever, daemon=True)
+        self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(min(self.idle_timeout / 2, 30))
+            self.reap()
+
+    def reap(self):
+        """Arrête les serveurs inutilisés depuis plus de idle_timeout secondes"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [lang for lang, entry in self._entries.items()
+                    if not entry.in_use and now - entry.last_used > self.idle_timeout]
+            entries = [self._entries.pop(lang) for lang in idle]
+            servers = []
+            for entry in entries:
+                entry.retired = True
+                servers.append(self._retire(entry))
+        for server in servers:
+            if server is not None:
+                server.close()
+
+    def close(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+
+class PooledTool:
+    """S'utilise comme un LanguageTool; délègue au serveur partagé du pool"""
+
+    def __init__(self, pool, language):
+        self.pool = pool
+        self.language = language
+
+    def check(self, text, **options):
+        from language_tool_python.utils import LanguageToolError
+
+        tool = None
+        try:
+            with self.pool.lease(self.language) as tool:
+                return tool.check(text, **options)
+        except LanguageToolError:
+            # Le serveur sur lequel on était greffé a pu être arrêté: on en relance un
+            if not self.pool.discard(self.language, tool):
+                raise
+            with self.pool.lease(self.language) as tool:
+                return tool.check(text, **options)
+
+    def correct(self, text, **options):
+        from grammatical.correction import correct
+        return correct(self, text, **options).corrected_text
+
+    def __getattr__(self, name):
+        value = getattr(self.pool.acquire(self.language), name)
+        if not callable(value):
+            return value
+
+        # Méthode gardée par l'appelant: chaque appel reprend le serveur courant et le protège
+        def call(*args, **kwargs):
+            with self.pool.lease(self.language) as tool:
+                return getattr(tool, name)(*args, **kwargs)
+        return call
+
+
+pool = LanguageToolPool()
+atexit.register(pool.close)
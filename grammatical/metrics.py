@@ -0,0 +1,265 @@
+"""Mesures de latence par étape, compteurs et pics mémoire, exportés vers un puits au choix
+
+Désactivées par défaut: timer() renvoie alors un contexte vide partagé et
+count()/high_water() reviennent aussitôt. Les points d'entrée (applications,
+ligne de commande) appellent configure_from_env(), qui lit
+GRAMMATICAL_METRICS; --metrics ou configure() choisissent aussi le puits:
+
+    jsonl:/chemin/metrics.jsonl   un instantané par ligne toutes les 10 s, fichier tournant
+    prometheus:9464               texte Prometheus sur http://127.0.0.1:9464/metrics
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from grammatical.memory import peak_rss_mb
+
+# Bornes des histogrammes, en secondes
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Borne supérieure du seau contenant le quantile q"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {"count": self.count, "sum": round(self.total, 6),
+                "mean": round(self.total / self.count, 6) if self.count else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Registry:
+    """Histogrammes de durées, compteurs et pics (high-water marks) du processus"""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.sinks = []
+        self._lock = threading.Lock()
+
+    def timer(self, name):
+        """Contexte qui mesure la durée d'une étape: with metrics.timer("correction.check"): ..."""
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def high_water(self, name, value):
+        """Garde le maximum observé de value"""
+        if not self.enabled or value is None:
+            return
+        with self._lock:
+            if value > self.gauges.get(name, float("-inf")):
+                self.gauges[name] = value
+
+    def snapshot(self):
+        self.high_water("memory.peak_rss_mb", peak_rss_mb())
+        with self._lock:
+            return {
+                "time": time.time(),
+                "histograms": {name: histogram.as_dict() for name, histogram in self.histograms.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+
+    def prometheus_text(self):
+        """Instantané au format texte de Prometheus"""
+        self.high_water("memory.peak_rss_mb", peak_rss_mb())
+        lines = []
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric = _prometheus_name(name) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum {histogram.total}")
+                lines.append(f"{metric}_count {histogram.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = _prometheus_name(name) + "_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            for name, value in sorted(self.gauges.items()):
+                metric = _prometheus_name(name)
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def configure(self, spec):
+        """Ajoute le puits décrit par spec (jsonl:chemin ou prometheus:[hôte:]port) et active les mesures
+
+        Un puits invalide ou impossible à ouvrir (port déjà pris...) n'arrête pas
+        l'application: un avertissement est émis et le puits ignoré (None).
+        """
+        kind, _, target = spec.partition(":")
+        try:
+            if kind == "jsonl" and target:
+                sink = JsonlSink(self, target)
+            elif kind == "prometheus":
+                host, _, port = target.rpartition(":")
+                sink = PrometheusSink(self, host or "127.0.0.1", int(port))
+            else:
+                raise ValueError("attendu: jsonl:chemin ou prometheus:[hôte:]port")
+            sink.start()
+        except (ValueError, OSError) as error:
+            warnings.warn(f"Puits de mesures {spec!r} ignoré: {error}")
+            return None
+        self.enabled = True
+        self.sinks.append(sink)
+        return sink
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+def _prometheus_name(name):
+    return "grammatical_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class JsonlSink:
+    """Ajoute un instantané par ligne toutes les interval secondes; au-delà de max_bytes,
+    le fichier devient <chemin>.1 (les plus anciens jusqu'à <chemin>.<backups>)"""
+
+    def __init__(self, registry, path, interval=10.0, max_bytes=10 * 1024 * 1024, backups=3):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._write_forever, name="metrics-jsonl", daemon=True).start()
+        # Dernier instantané à la sortie, pour les commandes plus courtes que interval
+        atexit.register(self.write)
+        return self
+
+    def _write_forever(self):
+        while True:
+            time.sleep(self.interval)
+            self.write()
+
+    def write(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.registry.snapshot(), ensure_ascii=False) + "\n")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+class PrometheusSink:
+    """Sert GET /metrics au format texte de Prometheus, dans un thread"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-prometheus", daemon=True).start()
+        return self
+
+
+metrics = Registry()
+
+
+def configure_from_env():
+    """Puits de GRAMMATICAL_METRICS, à appeler depuis les points d'entrée (jamais à l'import)"""
+    spec = os.environ.get("GRAMMATICAL_METRICS")
+    return metrics.configure(spec) if spec else None
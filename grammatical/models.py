@@ -0,0 +1,80 @@
+"""Chargement des modèles DialoGPT en arrière-plan, torch et transformers importés à la demande"""
+import importlib.util
+import threading
+import time
+
+from grammatical.memory import peak_rss_mb
+from grammatical.scheduler import scheduler
+
+DIALOGPT = "microsoft/DialoGPT-medium"
+
+
+def load_dialogpt(model_name=DIALOGPT, progress=None):
+    """Charge le tokenizer et le modèle en évitant une copie complète des poids en mémoire
+
+    Les poids safetensors sont lus par mmap quand le dépôt en fournit, et
+    low_cpu_mem_usage charge le modèle directement dans ses tenseurs définitifs.
+    Sous transformers 4.x, cette option exige accelerate: sans lui, le modèle
+    est chargé normalement plutôt que de ne pas l'être du tout.
+    """
+    progress = progress or (lambda message: None)
+    progress("Chargement de torch et transformers...")
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    progress("Chargement du tokenizer...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    progress("Chargement du modèle...")
+    low_memory = importlib.util.find_spec("accelerate") is not None
+    model = AutoModelForCausalLM.from_pretrained(model_name, low_cpu_mem_usage=low_memory)
+    model.eval()
+    return tokenizer, model
+
+
+class BackgroundLoader:
+    """Exécute load(progress) dans l'ordonnanceur commun et garde son état, sa durée et le pic mémoire
+
+    on_progress(message) et on_done(loader) sont appelés depuis le thread de
+    l'ordonnanceur: l'interface doit repasser par root.after.
+    """
+
+    def __init__(self, load, on_progress=None, on_done=None, jobs=None):
+        self.load = load
+        self.jobs = jobs
+        self.job = None
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.ready = False
+        self.error = None
+        self.result = None
+        self.message = ""
+        self.seconds = None
+        self.peak_rss_mb = None
+        self._done = threading.Event()
+
+    def start(self):
+        self.job = (self.jobs or scheduler).submit(self._run)
+        return self
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def progress(self, message):
+        self.message = message
+        if self.on_progress is not None:
+            self.on_progress(message)
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.result = self.load(self.progress)
+            self.ready = True
+        except Exception as e:
+            self.error = e
+        self.seconds = time.perf_counter() - started
+        self.peak_rss_mb = peak_rss_mb()
+        self._done.set()
+        if self.on_done is not None:
+            self.on_done(self)
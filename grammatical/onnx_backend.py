@@ -0,0 +1,242 @@
+"""Génération DialoGPT sous ONNX Runtime: export unique du graphe (avec cache clés/valeurs) et décodage sur CPU"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "GRAMMATICAL_ONNX_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "grammatical", "onnx"),
+)
+OPSET = 17
+# Versions pour lesquelles l'export TorchScript est vérifié, borne haute exclue: torch plus récent
+# passe par dynamo et échoue sur ce graphe; transformers >= 4.47 donne à GPT-2 un objet Cache
+TORCH_VERSIONS = ((2, 0), (2, 6))
+TRANSFORMERS_VERSIONS = ((4, 36), (4, 47))
+# Arguments de generate acceptés sans effet ici: sans objet pour un seul glouton/échantillon,
+# ou seulement à leur valeur neutre (None: toute valeur)
+NEUTRAL_OPTIONS = {"early_stopping": None, "use_cache": None, "output_scores": False,
+                   "num_beams": 1, "num_return_sequences": 1, "repetition_penalty": 1.0,
+                   "no_repeat_ngram_size": 0, "typical_p": 1.0}
+
+
+def _version(text):
+    return tuple(int(part) for part in re.findall(r"\d+", text)[:2])
+
+
+def export_unsupported():
+    """Raison pour laquelle l'export n'est pas pris en charge avec torch et transformers installés, ou None"""
+    import torch
+    import transformers
+
+    for name, version, (low, high) in (("torch", torch.__version__, TORCH_VERSIONS),
+                                       ("transformers", transformers.__version__, TRANSFORMERS_VERSIONS)):
+        if not low <= _version(version) < high:
+            return (f"export ONNX vérifié avec {name} >= {'.'.join(map(str, low))}, "
+                    f"< {'.'.join(map(str, high))} (installé: {version})")
+    return None
+
+
+def graph_path(model_name, config, cache_dir=DEFAULT_CACHE_DIR):
+    """Emplacement du graphe exporté, propre au modèle, à sa configuration et à transformers"""
+    import transformers
+
+    key = json.dumps([model_name, config.to_dict(), transformers.__version__, OPSET], sort_keys=True, default=str)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    name = os.path.basename(os.path.normpath(model_name)) or "model"
+    return os.path.join(cache_dir, f"{name}-{digest}", "model.onnx")
+
+
+def export_dialogpt(model, path):
+    """Exporte un GPT-2/DialoGPT: entrées input_ids, attention_mask et past.{i}.key/value,
+    sorties logits et present.{i}.key/value. Écrit dans un fichier temporaire puis le renomme.
+
+    RuntimeError hors des versions vérifiées (export_unsupported), plutôt qu'un graphe faux.
+    """
+    import inspect
+    import torch
+
+    from grammatical.chat import legacy_cache, model_cache
+
+    reason = export_unsupported()
+    if reason is not None:
+        raise RuntimeError(reason)
+
+    config = model.config
+    layers = config.n_layer
+    head_dim = config.n_embd // config.n_head
+
+    class DecoderWithPast(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, *past):
+            past = tuple((past[2 * i], past[2 * i + 1]) for i in range(layers))
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask,
+                                 past_key_values=model_cache(self.model, past), use_cache=True, return_dict=True)
+            present = legacy_cache(outputs.past_key_values)
+            return (outputs.logits,) + tuple(tensor for pair in present for tensor in pair)
+
+    past_names = [f"past.{i}.{kind}" for i in range(layers) for kind in ("key", "value")]
+    present_names = [f"present.{i}.{kind}" for i in range(layers) for kind in ("key", "value")]
+    dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "total"},
+                    "logits": {0: "batch", 1: "sequence"}}
+    dynamic_axes.update({name: {0: "batch", 2: "past"} for name in past_names})
+    dynamic_axes.update({name: {0: "batch", 2: "total"} for name in present_names})
+
+    # Entrées d'exemple avec un passé non vide, pour que sa longueur reste variable dans le graphe
+    input_ids = torch.zeros((1, 2), dtype=torch.long)
+    attention_mask = torch.ones((1, 3), dtype=torch.long)
+    past = tuple(torch.zeros((1, config.n_head, 1, head_dim)) for _ in past_names)
+
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    model.eval()
+    with torch.inference_mode():
+        torch.onnx.export(DecoderWithPast(model), (input_ids, attention_mask) + past, temporary,
+                          input_names=["input_ids", "attention_mask"] + past_names,
+                          output_names=["logits"] + present_names,
+                          dynamic_axes=dynamic_axes, opset_version=OPSET, do_constant_folding=True,
+                          **kwargs)
+    os.replace(temporary, path)
+    return path
+
+
+def load_onnx_dialogpt(model_name, threads=None, progress=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Tokenizer et OnnxDialoGPT; le modèle torch n'est chargé que si le graphe n'est pas encore exporté"""
+    progress = progress or (lambda message: None)
+    progress("Chargement du tokenizer...")
+    from transformers import AutoConfig, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    config = AutoConfig.from_pretrained(model_name)
+
+    path = graph_path(model_name, config, cache_dir)
+    if not os.path.exists(path):
+        from grammatical.models import load_dialogpt
+
+        _, model = load_dialogpt(model_name, progress)
+        progress("Export ONNX du modèle (une seule fois)...")
+        export_dialogpt(model, path)
+        del model
+
+    progress("Démarrage d'ONNX Runtime...")
+    return tokenizer, OnnxDialoGPT(path, config, threads)
+
+
+@dataclass
+class OnnxGenerateOutput:
+    """Comme la sortie de generate(return_dict_in_generate=True): séquences et cache clés/valeurs"""
+    sequences: object
+    past_key_values: tuple
+
+
+class OnnxDialoGPT:
+    """Remplace le modèle torch pour generate(): mêmes arguments utiles (échantillonnage,
+    streamer, stopping_criteria, past_key_values), décodage token par token sous ONNX Runtime
+
+    Un argument de generate qui changerait la réponse sans être pris en charge
+    ici (faisceaux, pénalités...) lève TypeError au lieu d'être ignoré.
+    """
+
+    def __init__(self, path, config, threads=None, seed=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.config = config
+        self.path = path
+        self.layers = config.n_layer
+        self.heads = config.n_head
+        self.head_dim = config.n_embd // config.n_head
+        self.rng = np.random.default_rng(seed)
+        self.output_names = [output.name for output in self.session.get_outputs()]
+
+    def eval(self):
+        return self
+
+    def empty_past(self, batch=1):
+        return tuple(np.zeros((batch, self.heads, 0, self.head_dim), dtype=np.float32)
+                     for _ in range(2 * self.layers))
+
+    def forward(self, input_ids, past):
+        """Un passage du graphe: logits du dernier token et nouveau cache"""
+        feed = {
+            "input_ids": input_ids,
+            "attention_mask": np.ones((input_ids.shape[0], past[0].shape[2] + input_ids.shape[1]), dtype=np.int64),
+        }
+        feed.update({f"past.{i // 2}.{'key' if i % 2 == 0 else 'value'}": tensor for i, tensor in enumerate(past)})
+        outputs = self.session.run(self.output_names, feed)
+        return outputs[0][:, -1, :], tuple(outputs[1:])
+
+    def next_token(self, logits, do_sample, temperature, top_k, top_p):
+        """Choix du token suivant, dans l'ordre de transformers: température, top_k puis top_p"""
+        if not do_sample:
+            return int(np.argmax(logits))
+        logits = logits.astype(np.float64) / max(temperature, 1e-5)
+        if top_k and top_k < logits.shape[-1]:
+            kth = np.partition(logits, -top_k)[-top_k]
+            logits = np.where(logits < kth, -np.inf, logits)
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        if top_p < 1.0:
+            order = np.argsort(-probs)
+            cumulative = np.cumsum(probs[order])
+            # Le token le plus probable est toujours gardé
+            drop = order[(cumulative - probs[order]) >= top_p]
+            probs[drop] = 0.0
+            probs /= probs.sum()
+        return int(self.rng.choice(len(probs), p=probs))
+
+    def generate(self, input_ids, attention_mask=None, past_key_values=None, max_new_tokens=20,
+                 min_new_tokens=0, do_sample=False, temperature=1.0, top_k=50, top_p=1.0,
+                 eos_token_id=None, pad_token_id=None, streamer=None, stopping_criteria=None,
+                 return_dict_in_generate=False, **options):
+        import torch
+
+        for name, value in options.items():
+            if name not in NEUTRAL_OPTIONS or NEUTRAL_OPTIONS[name] not in (None, value):
+                raise TypeError(f"Moteur ONNX: {name}={value!r} non pris en charge")
+        if eos_token_id is None:
+            eos_token_id = self.config.eos_token_id
+        sequence = input_ids[0].tolist()
+        past = past_key_values if past_key_values is not None else self.empty_past()
+        # Comme transformers: seuls les tokens absents du cache passent dans le modèle
+        pending = sequence[past[0].shape[2]:]
+        if streamer is not None:
+            streamer.put(input_ids.cpu())
+
+        for step in range(max_new_tokens):
+            logits, past = self.forward(np.array([pending], dtype=np.int64), past)
+            logits = logits[0]
+            if step < min_new_tokens and eos_token_id is not None:
+                logits[eos_token_id] = -np.inf
+            token = self.next_token(logits, do_sample, temperature, top_k, top_p)
+            sequence.append(token)
+            pending = [token]
+            if streamer is not None:
+                streamer.put(torch.tensor([token]))
+            if token == eos_token_id:
+                break
+            if stopping_criteria is not None and stopping_criteria(torch.tensor([sequence]), None).any():
+                break
+
+        if streamer is not None:
+            streamer.end()
+        sequences = torch.tensor([sequence], dtype=input_ids.dtype)
+        if return_dict_in_generate:
+            return OnnxGenerateOutput(sequences, past)
+        return sequences
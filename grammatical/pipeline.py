@@ -0,0 +1,185 @@
+"""Correction puis traduction phrase par phrase, les deux étapes tournant en parallèle"""
+import json
+import queue
+import sys
+import threading
+import time
+
+from grammatical.chunking import split_sentences
+from grammatical.correction import correct, first_suggestion
+
+_DONE = object()
+
+
+class StageStats:
+    """Nombre de phrases traitées et temps de travail d'une étape"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    @property
+    def throughput(self):
+        return self.items / self.busy if self.busy else 0.0
+
+    def as_dict(self):
+        return {"items": self.items, "busy_seconds": round(self.busy, 4),
+                "sentences_per_second": round(self.throughput, 2)}
+
+    def __str__(self):
+        return f"{self.name}: {self.items} phrases, {self.throughput:.1f} phrases/s"
+
+
+class PipelineItem:
+    def __init__(self, index, original, corrected, translated, spacing):
+        self.index = index
+        self.original = original
+        self.corrected = corrected
+        self.translated = translated
+        # Espaces et retours à la ligne qui suivaient la phrase dans le texte
+        self.spacing = spacing
+
+
+class CorrectTranslatePipeline:
+    """Chaque phrase est corrigée puis traduite dès que possible
+
+    Les étapes communiquent par des files bornées à queue_size phrases: la
+    première traduction arrive après le temps d'une seule phrase, et la
+    correction ne prend jamais beaucoup d'avance sur la traduction.
+    """
+
+    def __init__(self, checker, translator, src="fr", dest="en", choose=first_suggestion, queue_size=8):
+        self.checker = checker
+        self.translator = translator
+        self.src = src
+        self.dest = dest
+        self.choose = choose
+        self.queue_size = queue_size
+        self.correction = StageStats("correction")
+        self.translation = StageStats("traduction")
+        self.first_item_seconds = None
+        self.total_seconds = None
+
+    def report(self):
+        return {
+            "correction": self.correction.as_dict(),
+            "translation": self.translation.as_dict(),
+            "first_item_seconds": self.first_item_seconds,
+            "total_seconds": self.total_seconds,
+        }
+
+    def stream(self, text, cancelled=None):
+        """Produit les PipelineItem dans l'ordre du texte, au fur et à mesure"""
+        sentences = []
+        for start, end in split_sentences(text):
+            sentence = text[start:end].rstrip()
+            sentences.append((sentence, text[start + len(sentence):end]))
+
+        self.correction = StageStats("correction")
+        self.translation = StageStats("traduction")
+        self.first_item_seconds = None
+        corrected_queue = queue.Queue(self.queue_size)
+        output_queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        started = time.perf_counter()
+
+        def stopped():
+            return stop.is_set() or (cancelled is not None and cancelled())
+
+        def put(target, item):
+            # Ne bloque pas indéfiniment si le consommateur a abandonné
+            while not stopped():
+                try:
+                    target.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def get(source):
+            while not stopped():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _DONE
+
+        def correct_stage():
+            try:
+                for index, (sentence, spacing) in enumerate(sentences):
+                    if stopped():
+                        break
+                    begin = time.perf_counter()
+                    corrected = correct(self.checker, sentence, self.choose).corrected_text if sentence else sentence
+                    self.correction.busy += time.perf_counter() - begin
+                    self.correction.items += 1
+                    put(corrected_queue, (index, sentence, corrected, spacing))
+            except Exception as e:
+                put(corrected_queue, e)
+            put(corrected_queue, _DONE)
+
+        def translate_stage():
+            try:
+                while True:
+                    item = get(corrected_queue)
+                    if item is _DONE or isinstance(item, Exception):
+                        put(output_queue, item)
+                        if item is _DONE:
+                            return
+                        continue
+                    index, sentence, corrected, spacing = item
+                    begin = time.perf_counter()
+                    translated = self.translator.translate(corrected, self.src, self.dest) if corrected else corrected
+                    self.translation.busy += time.perf_counter() - begin
+                    self.translation.items += 1
+                    put(output_queue, PipelineItem(index, sentence, corrected, translated, spacing))
+            except Exception as e:
+                put(output_queue, e)
+                put(output_queue, _DONE)
+
+        threads = [threading.Thread(target=correct_stage, daemon=True),
+                   threading.Thread(target=translate_stage, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = get(output_queue)
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if self.first_item_seconds is None:
+                    self.first_item_seconds = time.perf_counter() - started
+                yield item
+        finally:
+            stop.set()
+            self.total_seconds = time.perf_counter() - started
+
+
+def run(args):
+    from grammatical.incremental import IncrementalChecker
+    from grammatical.languagetool import LanguageToolPool
+    from grammatical.translation import SentenceTranslator, TranslationCache
+    from grammatical.translators import BatchTranslator, get_backend
+
+    checker = IncrementalChecker(LanguageToolPool(remote_server=args.remote_server).tool(args.src), args.src)
+    cache = None if args.no_cache else TranslationCache()
+    translator = SentenceTranslator(BatchTranslator(get_backend(args.translator)), cache)
+    pipeline = CorrectTranslatePipeline(checker, translator, args.src, args.dest, queue_size=args.queue_size)
+
+    for source in args.sources:
+        if source == "-":
+            text = sys.stdin.read()
+        else:
+            with open(source, encoding="utf-8") as f:
+                text = f.read()
+        for item in pipeline.stream(text):
+            if args.jsonl:
+                sys.stdout.write(json.dumps({"source": source, "index": item.index, "original": item.original,
+                                             "corrected": item.corrected, "translated": item.translated},
+                                            ensure_ascii=False) + "\n")
+            else:
+                sys.stdout.write(item.translated + item.spacing)
+            sys.stdout.flush()
+        print(f"{source}: {pipeline.correction}, {pipeline.translation}, "
+              f"première phrase après {pipeline.first_item_seconds or 0:.2f} s", file=sys.stderr)
@@ -0,0 +1,114 @@
+"""Cache des réponses exactes du chat: les messages identiques ne relancent pas model.generate
+
+Activé à la demande (ChatEngine(response_cache=...)). Une réponse n'est
+réutilisée que si la génération est déterministe (sans do_sample), ou si
+l'application accepte de resservir une réponse échantillonnée (cacheable).
+"""
+import array
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from grammatical.metrics import metrics
+
+DEFAULT_SIZE = int(os.environ.get("GRAMMATICAL_RESPONSE_CACHE", 0))
+DEFAULT_TTL = float(os.environ.get("GRAMMATICAL_RESPONSE_CACHE_TTL", 3600))
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """Espaces multiples réduits et bords retirés: « Bonjour  ! » et « Bonjour ! » partagent leur réponse"""
+    return _SPACES.sub(" ", text).strip()
+
+
+def deterministic(generation_kwargs):
+    """Vrai si generate renvoie toujours la même réponse pour le même contexte"""
+    return not generation_kwargs.get("do_sample", False)
+
+
+def cache_key(model, prompt_ids, generation_kwargs, history_ids=()):
+    """(modèle, tokens du message, paramètres de génération, empreinte de l'historique)"""
+    config = tuple(sorted((name, repr(value)) for name, value in generation_kwargs.items()))
+    history = hashlib.blake2b(array.array("q", history_ids).tobytes(), digest_size=16).digest() if history_ids else b""
+    return model, tuple(prompt_ids), config, history
+
+
+class _Entry:
+    __slots__ = ("response_ids", "expires")
+
+    def __init__(self, response_ids, expires):
+        self.response_ids = response_ids
+        self.expires = expires
+
+
+class ResponseCache:
+    """LRU de max_entries réponses (tokens), chacune valable ttl secondes
+
+    Les demandes identiques simultanées sont regroupées: une seule génération,
+    dont le résultat est partagé par toutes (voir lookup/publish).
+    """
+
+    def __init__(self, max_entries=DEFAULT_SIZE or 1024, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """(réponse, None) si connue; (None, Future) à attendre si la même demande est en cours;
+        (None, None) sinon: l'appelant génère et doit appeler publish(key, ...) dans tous les cas"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                metrics.count("chat.response_cache.hits")
+                return entry.response_ids, None
+            if entry is not None:
+                del self._data[key]
+            waiting = self._inflight.get(key)
+            if waiting is not None:
+                self.coalesced += 1
+                metrics.count("chat.response_cache.coalesced")
+                return None, waiting
+            self._inflight[key] = Future()
+            self.misses += 1
+            metrics.count("chat.response_cache.misses")
+            return None, None
+
+    def publish(self, key, response_ids):
+        """Fin de la génération de key; response_ids None (erreur, arrêt) n'est pas mis en cache
+        et les demandes en attente génèrent alors elles-mêmes"""
+        with self._lock:
+            waiting = self._inflight.pop(key, None)
+            if response_ids is not None:
+                self._data[key] = _Entry(response_ids, time.monotonic() + self.ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        if waiting is not None:
+            waiting.set_result(response_ids)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses + self.coalesced
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "entries": len(self._data),
+                    "hit_rate": (self.hits + self.coalesced) / requests if requests else 0.0}
+
+    def __str__(self):
+        stats = self.stats()
+        return (f"Cache de réponses: {stats['hit_rate']:.0%} ({stats['hits']} retrouvées, "
+                f"{stats['coalesced']} partagées, {stats['misses']} générées)")
@@ -0,0 +1,186 @@
+"""Ordonnanceur de tâches partagé: pool de threads borné, priorités, annulation et résultats en Future"""
+import itertools
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+
+# Plus la valeur est petite, plus la tâche passe tôt
+INTERACTIVE = 0
+NORMAL = 10
+BACKGROUND = 20
+
+MAX_WORKERS = int(os.environ.get("GRAMMATICAL_WORKERS", 4))
+
+
+class CancelToken:
+    """Jeton d'annulation partagé entre le demandeur et la tâche
+
+    S'appelle comme les fonctions cancelled() attendues par correct() et
+    CorrectTranslatePipeline.stream, et s'utilise comme un Event avec stop_on().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def __call__(self):
+        return self._event.is_set()
+
+
+class Job(Future):
+    """Future d'une tâche; cancel() lève aussi son jeton pour interrompre une tâche déjà lancée"""
+
+    def __init__(self, token):
+        super().__init__()
+        self.token = token
+
+    def cancel(self):
+        self.token.cancel()
+        return super().cancel()
+
+
+class SchedulerFull(Exception):
+    """Trop de tâches en attente"""
+
+
+class JobScheduler:
+    """Un seul pool de max_workers threads pour les corrections, traductions et générations
+
+    Les tâches en attente passent par ordre de priorité puis d'arrivée; au-delà
+    de max_pending, submit refuse la tâche. Les threads sont créés à la demande.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=256):
+        self.max_workers = max_workers
+        self._queue = queue.PriorityQueue(max_pending)
+        self._order = itertools.count()
+        self._workers = []
+        # Threads en attente d'une tâche qui ne leur a pas encore été promise
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, priority=NORMAL, token=None, **kwargs):
+        """Planifie fn(*args, **kwargs) et renvoie son Job; fn reçoit le jeton par ses arguments si besoin"""
+        job = Job(token or CancelToken())
+        with self._lock:
+            try:
+                self._queue.put_nowait((priority, next(self._order), job, fn, args, kwargs))
+            except queue.Full:
+                raise SchedulerFull(f"{self._queue.maxsize} tâches en attente au plus") from None
+            # Un thread libre est réservé à cette tâche: deux submit rapprochés ne comptent pas sur le même
+            if self._idle:
+                self._idle -= 1
+            elif len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"grammatical-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        return job
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        # Un thread naît pour la tâche qui l'a fait créer, puis se déclare libre après chacune
+        while True:
+            _, _, job, fn, args, kwargs = self._queue.get()
+            self._execute(job, fn, args, kwargs)
+            with self._lock:
+                self._idle += 1
+
+    @staticmethod
+    def _execute(job, fn, args, kwargs):
+        # Annulée avant de commencer: la tâche n'est pas exécutée
+        if job.token.cancelled:
+            job.cancel()
+        if not job.set_running_or_notify_cancel():
+            return
+        try:
+            job.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            job.set_exception(error)
+
+
+class LatestOnly:
+    """Au plus une tâche en cours à la fois; parmi les demandes arrivées entre-temps, seule la
+    dernière part ensuite, les autres sont annulées
+
+    S'utilise à la place de l'ordonnanceur (même submit), par ex. une vérification
+    par document: le serveur ne reçoit jamais deux textes du même document en même temps.
+    Une demande que l'ordonnanceur refuse (SchedulerFull) n'est pas levée: son
+    Job échoue avec cette erreur et les suivantes repartent normalement.
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or scheduler
+        self._running = False
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, priority=NORMAL, token=None, **kwargs):
+        job = Job(token or CancelToken())
+        request = (job, fn, args, kwargs, priority)
+        with self._lock:
+            if self._pending is not None:
+                self._pending[0].cancel()
+                self._pending = None
+            if self._running:
+                self._pending = request
+                return job
+            self._running = True
+        self._start(request)
+        return job
+
+    def _start(self, request):
+        """Confie request à l'ordonnanceur; refusée, elle échoue et la demande arrivée entre-temps est tentée"""
+        while request is not None:
+            try:
+                # Jeton à part: la tâche de relais passe toujours, même si job est annulé entre-temps
+                self.jobs.submit(self._run, request, priority=request[4])
+                return
+            except SchedulerFull as error:
+                job = request[0]
+                if job.set_running_or_notify_cancel():
+                    job.set_exception(error)
+                request = self._next()
+
+    def _next(self):
+        """Demande en attente à lancer, ou None: plus rien ne tourne"""
+        with self._lock:
+            request, self._pending = self._pending, None
+            self._running = request is not None
+        return request
+
+    def _run(self, request):
+        job, fn, args, kwargs, _ = request
+        try:
+            JobScheduler._execute(job, fn, args, kwargs)
+        finally:
+            self._start(self._next())
+
+
+def deliver(job, after, callback):
+    """Appelle callback(job) par after(0, ...) une fois la tâche finie, pour repasser dans le thread Tk"""
+    job.add_done_callback(lambda done: after(0, callback, done))
+    return job
+
+
+def log_failure(job):
+    """Callback de fin de tâche: affiche l'exception d'une tâche sans destinataire"""
+    if not job.cancelled() and job.exception() is not None:
+        error = job.exception()
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+
+# Ordonnanceur commun aux applications et aux outils en ligne de commande
+scheduler = JobScheduler()
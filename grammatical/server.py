@@ -0,0 +1,449 @@
+"""Service de chat local: un seul modèle partagé, sessions multiples, génération par lots
+
+    python -m grammatical serve --port 8765
+
+    POST   /sessions                  -> {"session": "<id>"}
+    POST   /sessions/<id>/messages    {"text": "..."} -> {"response": "..."}
+    DELETE /sessions/<id>
+    GET    /health                    -> sessions, file d'attente, débit
+    GET    /metrics                   -> mesures par étape, format texte Prometheus
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from grammatical.chat import ChatSession, legacy_cache, model_cache
+from grammatical.metrics import metrics
+
+
+class AdmissionError(Exception):
+    """Demande refusée: trop de sessions, file pleine ou session déjà occupée"""
+
+
+class ServerSession(ChatSession):
+    """ChatSession du serveur: le cache est gardé sous forme de tuples (clé, valeur) par couche"""
+
+    def __init__(self, session_id, max_length, max_new_tokens):
+        super().__init__(max_length, max_new_tokens)
+        self.id = session_id
+        self.last_used = time.monotonic()
+        self.busy = False
+
+
+class ChatRequest:
+    def __init__(self, session, new_ids, max_new_tokens):
+        self.session = session
+        self.new_ids = new_ids
+        self.max_new_tokens = max_new_tokens
+        self.cancelled = threading.Event()
+        # Nombre de tokens générés quand la ligne a été arrêtée par per_request_stop
+        self.stopped_at = None
+        self.done = threading.Event()
+        self.response_ids = None
+        self.error = None
+
+
+class _NotRightPadding(logging.Filter):
+    """Écarte l'avertissement « right-padding was detected » de generate
+
+    Il ne regarde que la dernière colonne: chaque message se termine par eos,
+    qui sert aussi de pad, alors que le remplissage du lot est à gauche des
+    tokens et masqué par attention_mask.
+    """
+
+    def filter(self, record):
+        return "right-padding was detected" not in record.getMessage()
+
+
+def _quiet_padding_warning():
+    logger = logging.getLogger("transformers.generation.utils")
+    if not any(isinstance(existing, _NotRightPadding) for existing in logger.filters):
+        logger.addFilter(_NotRightPadding())
+
+
+def per_request_stop(requests, prompt_length):
+    """Critère d'arrêt ligne par ligne: annulation ou max_new_tokens propre à chaque demande"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    limits = [request.max_new_tokens for request in requests]
+
+    class StopPerRow(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            generated = input_ids.shape[-1] - prompt_length
+            stops = []
+            for request, limit in zip(requests, limits):
+                stop = request.cancelled.is_set() or generated >= limit
+                if stop and request.stopped_at is None:
+                    request.stopped_at = generated
+                stops.append(stop)
+            return torch.tensor(stops, device=input_ids.device)
+
+    return StoppingCriteriaList([StopPerRow()])
+
+
+class ChatScheduler:
+    """Regroupe les messages en attente de plusieurs sessions dans un même model.generate
+
+    Chaque ligne du lot garde son propre cache clés/valeurs: les caches et les
+    nouveaux tokens sont alignés par du remplissage masqué (attention_mask à 0),
+    puis les positions réelles de chaque ligne sont extraites après génération.
+    Les sessions inactives depuis idle_timeout secondes sont fermées. Avec un
+    ConversationStore, chaque tour est enregistré et une session fermée est
+    reprise depuis le disque à son message suivant, sans rien garder en mémoire
+    entre-temps.
+
+    Le cache clés/valeurs est la part lourde d'une session (jusqu'à ~200 Mo
+    pour DialoGPT-medium à 1024 tokens), les tokens de l'historique ne pèsent
+    presque rien: il est libéré après cache_timeout secondes d'inactivité, et
+    seules les max_cached sessions utilisées le plus récemment le gardent. Il
+    est recalculé depuis l'historique au message suivant.
+    """
+
+    def __init__(self, model, tokenizer, max_sessions=64, max_batch=16, max_queue=64, batch_window=0.01,
+                 idle_timeout=600, max_length=1024, max_new_tokens=200, store=None, cache_timeout=30,
+                 max_cached=None, **generation_kwargs):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_sessions = max_sessions
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.batch_window = batch_window
+        self.idle_timeout = idle_timeout
+        self.cache_timeout = cache_timeout
+        self.max_cached = max_batch if max_cached is None else max_cached
+        self.max_length = max_length
+        self.max_new_tokens = max_new_tokens
+        self.store = store
+        self.generation_kwargs = dict(generation_kwargs)
+        self.generation_kwargs.setdefault("eos_token_id", tokenizer.eos_token_id)
+        self.generation_kwargs.setdefault("pad_token_id", tokenizer.pad_token_id)
+
+        self.sessions = {}
+        self.pending = deque()
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._worker = threading.Thread(target=self._loop, name="generation", daemon=True)
+        self._worker.start()
+
+    def open_session(self):
+        with self._lock:
+            return self._admit(uuid.uuid4().hex).id
+
+    def _admit(self, session_id):
+        self._evict_idle()
+        if len(self.sessions) >= self.max_sessions:
+            raise AdmissionError(f"{self.max_sessions} sessions ouvertes au plus")
+        session = ServerSession(session_id, self.max_length, self.max_new_tokens)
+        self.sessions[session.id] = session
+        return session
+
+    def close_session(self, session_id):
+        """Ferme la session et efface sa conversation enregistrée"""
+        with self._lock:
+            found = self.sessions.pop(session_id, None) is not None
+            if self.store is not None and self.store.exists(session_id):
+                self.store.delete(session_id)
+                found = True
+            if not found:
+                raise KeyError(session_id)
+
+    def submit(self, session_id, text, max_new_tokens=None, timeout=None):
+        """Ajoute le message à la file et attend la réponse décodée"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                if self.store is None or not self.store.exists(session_id):
+                    raise KeyError(session_id)
+                session = self._admit(session_id)
+                self.store.restore(session_id, session)
+            if session.busy:
+                raise AdmissionError("une réponse est déjà en cours pour cette session")
+            if len(self.pending) >= self.max_queue:
+                raise AdmissionError(f"{self.max_queue} messages en attente au plus")
+            session.busy = True
+
+        try:
+            with metrics.timer("chat.tokenize"):
+                new_ids = self.tokenizer(text + self.tokenizer.eos_token, return_tensors="pt", truncation=True,
+                                         max_length=session.budget).input_ids
+            request = ChatRequest(session, new_ids, min(max_new_tokens or self.max_new_tokens, self.max_new_tokens))
+            with self._wakeup:
+                if self._closed:
+                    raise AdmissionError("service arrêté")
+                self.pending.append(request)
+                self._wakeup.notify()
+            if not request.done.wait(timeout):
+                request.cancelled.set()
+                request.done.wait()
+        finally:
+            with self._lock:
+                session.busy = False
+                session.last_used = time.monotonic()
+
+        if request.error is not None:
+            raise request.error
+        with metrics.timer("chat.decode"):
+            return self.tokenizer.decode(request.response_ids, skip_special_tokens=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "pending": len(self.pending),
+                "batches": self.batches,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_second": round(self.generated_tokens / self.generation_seconds, 2)
+                if self.generation_seconds else 0.0,
+            }
+
+    def close(self):
+        """Arrête la génération; les messages encore en file reçoivent une erreur au lieu d'attendre"""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        self._worker.join()
+        with self._lock:
+            abandoned = list(self.pending)
+            self.pending.clear()
+        for request in abandoned:
+            request.error = AdmissionError("service arrêté")
+            request.done.set()
+
+    def _evict_idle(self):
+        """Sous self._lock: ferme les sessions inactives et libère les caches clés/valeurs en trop"""
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if not session.busy and session.last_used < now - self.idle_timeout:
+                del self.sessions[session_id]
+
+        cached = sorted((session for session in self.sessions.values()
+                         if session.past_key_values is not None and not session.busy),
+                        key=lambda session: session.last_used, reverse=True)
+        for rank, session in enumerate(cached):
+            if rank >= self.max_cached or session.last_used < now - self.cache_timeout:
+                session.past_key_values = None
+                metrics.count("chat.kv_cache_released")
+
+    def _loop(self):
+        while True:
+            with self._wakeup:
+                while not self.pending and not self._closed:
+                    # Réveil périodique pour fermer les sessions inactives et libérer leurs caches
+                    if not self._wakeup.wait(timeout=min(self.idle_timeout, self.cache_timeout, 60)):
+                        self._evict_idle()
+                if self._closed:
+                    return
+            # Courte attente pour laisser les autres sessions rejoindre le lot
+            if self.batch_window:
+                time.sleep(self.batch_window)
+            with self._lock:
+                batch = [self.pending.popleft() for _ in range(min(self.max_batch, len(self.pending)))]
+            try:
+                self._generate_batch(batch)
+            except Exception as error:
+                for request in batch:
+                    request.session.past_key_values = None
+                    request.error = error
+            for request in batch:
+                request.done.set()
+            # Sous charge continue, l'attente ci-dessus n'expire jamais
+            with self._lock:
+                self._evict_idle()
+
+    def _generate_batch(self, requests):
+        import torch
+
+        pad_token_id = self.generation_kwargs["pad_token_id"]
+        rows = []
+        for request in requests:
+            input_ids, turn_starts, past = request.session.prepare(request.new_ids)
+            past = legacy_cache(past)
+            rows.append((input_ids[0], turn_starts, past, past[0][0].shape[2] if past else 0))
+
+        # Disposition d'une ligne: [remplissage | cache | remplissage | tokens hors cache]
+        cached = max(row[3] for row in rows)
+        uncached = max(len(row[0]) - row[3] for row in rows)
+        batch_size = len(rows)
+        input_ids = torch.full((batch_size, cached + uncached), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros_like(input_ids)
+        for i, (ids, _, _, past_length) in enumerate(rows):
+            input_ids[i, cached - past_length:cached] = ids[:past_length]
+            attention_mask[i, cached - past_length:cached] = 1
+            tail = ids[past_length:]
+            input_ids[i, cached + uncached - len(tail):] = tail
+            attention_mask[i, cached + uncached - len(tail):] = 1
+
+        past_key_values = None
+        if cached:
+            first = next(row[2] for row in rows if row[2])
+            layers = []
+            for layer in range(len(first)):
+                tensors = []
+                for kind in (0, 1):
+                    sample = first[layer][kind]
+                    padded = sample.new_zeros((batch_size, sample.shape[1], cached, sample.shape[3]))
+                    for i, (_, _, past, past_length) in enumerate(rows):
+                        if past_length:
+                            padded[i, :, cached - past_length:] = past[layer][kind][0]
+                    tensors.append(padded)
+                layers.append(tuple(tensors))
+            past_key_values = model_cache(self.model, tuple(layers))
+
+        prompt_length = cached + uncached
+        _quiet_padding_warning()
+        start = time.perf_counter()
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max(request.max_new_tokens for request in requests),
+                stopping_criteria=per_request_stop(requests, prompt_length),
+                return_dict_in_generate=True,
+                **self.generation_kwargs
+            )
+        seconds = time.perf_counter() - start
+        metrics.observe("chat.generate", seconds)
+
+        eos_token_id = self.generation_kwargs["eos_token_id"]
+        cache = legacy_cache(outputs.past_key_values)
+        cache_length = cache[0][0].shape[2]
+        generated_total = 0
+        for i, (request, (_, turn_starts, _, _)) in enumerate(zip(requests, rows)):
+            generated = outputs.sequences[i, prompt_length:].tolist()[:request.stopped_at or request.max_new_tokens]
+            if eos_token_id in generated:
+                generated = generated[:generated.index(eos_token_id) + 1]
+            generated_total += len(generated)
+            metrics.count("chat.tokens_generated", len(generated))
+
+            # Positions réelles de la ligne: historique non masqué puis réponse
+            keep = torch.cat([attention_mask[i].nonzero().flatten(),
+                              torch.arange(prompt_length, prompt_length + len(generated))])
+            cache_keep = keep[keep < cache_length]
+            row_cache = tuple((key[i:i + 1, :, cache_keep], value[i:i + 1, :, cache_keep])
+                              for key, value in cache)
+            request.response_ids = request.session.commit(
+                outputs.sequences[i:i + 1, keep], row_cache, turn_starts,
+                prompt_length - int((attention_mask[i] == 0).sum()), eos_token_id)
+            if self.store is not None:
+                self.store.record(request.session.id, request.session)
+
+        with self._lock:
+            self.generated_tokens += generated_total
+            self.generation_seconds += seconds
+            self.batches += 1
+
+
+class ChatRequestHandler(BaseHTTPRequestHandler):
+    scheduler = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, self.scheduler.stats())
+        elif self.path == "/metrics":
+            data = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._reply(404, {"error": "introuvable"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            if parts == ["sessions"]:
+                self._reply(201, {"session": self.scheduler.open_session()})
+            elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages":
+                body = self._body()
+                response = self.scheduler.submit(parts[1], body["text"], body.get("max_new_tokens"))
+                self._reply(200, {"session": parts[1], "response": response})
+            else:
+                self._reply(404, {"error": "introuvable"})
+        except AdmissionError as error:
+            self._reply(503, {"error": str(error)})
+        except KeyError:
+            self._reply(404, {"error": "session inconnue ou expirée"})
+        except (ValueError, TypeError) as error:
+            self._reply(400, {"error": str(error)})
+
+    def do_DELETE(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            if len(parts) != 2 or parts[0] != "sessions":
+                raise KeyError(self.path)
+            self.scheduler.close_session(parts[1])
+            self._reply(204, None)
+        except KeyError:
+            self._reply(404, {"error": "session inconnue ou expirée"})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict) or not isinstance(body.get("text"), str):
+            raise ValueError("corps attendu: {\"text\": \"...\"}")
+        return body
+
+    def _reply(self, status, payload):
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(scheduler, host="127.0.0.1", port=8765):
+    handler = type("Handler", (ChatRequestHandler,), {"scheduler": scheduler})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def run(args):
+    from grammatical.inference import load_chat_model
+
+    from grammatical.conversations import ConversationStore
+
+    # Mode sans interface: les mesures sont toujours servies sur /metrics
+    metrics.enabled = True
+    tokenizer, model, profile = load_chat_model(args.model, "torch", args.profile, args.threads)
+    scheduler = ChatScheduler(
+        model, tokenizer,
+        max_sessions=args.max_sessions,
+        max_batch=args.max_batch,
+        max_queue=args.max_queue,
+        batch_window=args.batch_window / 1000,
+        idle_timeout=args.idle_timeout,
+        cache_timeout=args.cache_timeout,
+        max_cached=args.max_cached,
+        max_new_tokens=args.max_new_tokens,
+        store=ConversationStore(args.conversations) if args.conversations else None,
+        do_sample=True,
+        top_k=50,
+        top_p=0.95,
+        temperature=0.7,
+    )
+    server = serve(scheduler, args.host, args.port)
+    print(f"Chat sur http://{args.host}:{server.server_port} (modèle {args.model}, profil {profile})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.close()
@@ -0,0 +1,124 @@
+"""Décodage assisté (spéculatif): un petit modèle propose des tokens, DialoGPT-medium les vérifie"""
+import os
+import time
+
+from grammatical.metrics import metrics
+
+# Modèle brouillon partageant le tokenizer de DialoGPT-medium; vide = mode désactivé
+DEFAULT_DRAFT = os.environ.get("GRAMMATICAL_DRAFT_MODEL") or None
+DRAFT_SMALL = "microsoft/DialoGPT-small"
+
+
+def load_draft(model_name, tokenizer, profile="fp32", threads=None, progress=None):
+    """Charge le modèle brouillon avec le même profil d'inférence que le modèle principal"""
+    from grammatical.inference import apply_profile
+    from grammatical.models import load_dialogpt
+
+    if progress is not None:
+        progress(f"Chargement du modèle brouillon {model_name}...")
+    draft_tokenizer, draft = load_dialogpt(model_name)
+    if draft_tokenizer.get_vocab() != tokenizer.get_vocab():
+        raise ValueError(f"{model_name} n'a pas le même tokenizer que le modèle principal")
+    draft, _ = apply_profile(draft, profile, threads)
+    return draft
+
+
+class AssistedDecoding:
+    """Décodage assisté par draft_model, avec retour au décodage normal s'il ne paie pas
+
+    Chaque tour mesure le taux d'acceptation (tokens proposés puis gardés) et le
+    nombre de tokens produits par passage du modèle principal. Sous
+    min_acceptance (moyenne lissée), le mode est suspendu pendant retry_after
+    tours puis réessayé. Les paramètres d'échantillonnage (temperature, top_p,
+    top_k) restent ceux passés à generate. Le bilan de chaque tour est gardé
+    dans reports, compté dans grammatical.metrics et passé à log s'il est donné.
+    """
+
+    def __init__(self, model, draft_model, num_assistant_tokens=5, min_acceptance=0.3, smoothing=0.5,
+                 retry_after=10, baseline_tokens_per_second=None, log=None):
+        if model.config.vocab_size != draft_model.config.vocab_size:
+            raise ValueError("le modèle brouillon doit partager le vocabulaire du modèle principal")
+        self.draft_model = draft_model
+        self.draft_model.generation_config.num_assistant_tokens = num_assistant_tokens
+        self.min_acceptance = min_acceptance
+        self.smoothing = smoothing
+        self.retry_after = retry_after
+        self.log = log
+        self.acceptance = None
+        self.suspended_turns = 0
+        self.reports = []
+        # Débit sans assistance (auto-test au démarrage, puis tours non assistés) pour estimer le gain réel
+        self.plain_tokens_per_second = baseline_tokens_per_second
+
+        self._calls = {"target": 0, "draft": 0}
+        model.register_forward_hook(lambda *args: self._count("target"))
+        draft_model.register_forward_hook(lambda *args: self._count("draft"))
+        self._turn = None
+
+    @property
+    def enabled(self):
+        return self.suspended_turns == 0
+
+    def _count(self, name):
+        self._calls[name] += 1
+
+    def begin(self):
+        """Arguments à ajouter à generate pour ce tour"""
+        self._turn = (dict(self._calls), time.perf_counter(), self.enabled)
+        return {"assistant_model": self.draft_model} if self.enabled else {}
+
+    def end(self, new_tokens):
+        """Bilan du tour (new_tokens générés) et bascule éventuelle vers le décodage normal"""
+        calls, start, assisted = self._turn
+        seconds = time.perf_counter() - start
+        tokens_per_second = new_tokens / seconds if seconds else 0.0
+        target_calls = self._calls["target"] - calls["target"]
+        draft_calls = self._calls["draft"] - calls["draft"]
+
+        report = {"assisted": assisted, "tokens": new_tokens, "tokens_per_second": round(tokens_per_second, 2)}
+        if not assisted:
+            self.suspended_turns -= 1
+            self.plain_tokens_per_second = self._smooth(self.plain_tokens_per_second, tokens_per_second)
+        elif target_calls:
+            # Chaque vérification garde les tokens acceptés plus un token du modèle principal
+            accepted = max(new_tokens - target_calls, 0)
+            acceptance = accepted / draft_calls if draft_calls else 0.0
+            self.acceptance = self._smooth(self.acceptance, acceptance)
+            report.update({
+                "acceptance": round(acceptance, 3),
+                "tokens_per_target_pass": round(new_tokens / target_calls, 2),
+            })
+            if self.plain_tokens_per_second:
+                report["speedup"] = round(tokens_per_second / self.plain_tokens_per_second, 2)
+            if self.acceptance < self.min_acceptance:
+                self.suspended_turns = self.retry_after
+                # Le prochain essai repart d'une mesure neuve
+                self.acceptance = None
+                report["fallback"] = True
+
+        self.reports.append(report)
+        metrics.count("chat.assisted.turns" if assisted else "chat.assisted.plain_turns")
+        if assisted and target_calls:
+            metrics.count("chat.assisted.draft_tokens", draft_calls)
+            metrics.count("chat.assisted.accepted_tokens", max(new_tokens - target_calls, 0))
+        if report.get("fallback"):
+            metrics.count("chat.assisted.fallbacks")
+        if self.log is not None:
+            self.log(self.describe(report))
+        return report
+
+    def _smooth(self, average, value):
+        return value if average is None else self.smoothing * average + (1 - self.smoothing) * value
+
+    @staticmethod
+    def describe(report):
+        if not report["assisted"]:
+            return f"Décodage normal: {report['tokens']} tokens, {report['tokens_per_second']:.1f} tokens/s"
+        text = (f"Décodage assisté: {report['tokens']} tokens, {report['tokens_per_second']:.1f} tokens/s, "
+                f"acceptation {report.get('acceptance', 0):.0%}, "
+                f"{report.get('tokens_per_target_pass', 0):.2f} tokens par passage")
+        if "speedup" in report:
+            text += f", gain x{report['speedup']:.2f}"
+        if report.get("fallback"):
+            text += " - retour au décodage normal"
+        return text
@@ -0,0 +1,189 @@
+"""Traduction phrase par phrase avec un cache persistant des phrases déjà traduites"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from grammatical.chunking import split_sentences
+from grammatical.metrics import metrics
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "GRAMMATICAL_TRANSLATION_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "grammatical", "traductions.sqlite3"),
+)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(sentence):
+    """Forme canonique d'une phrase: Unicode NFC, espaces réduits"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", sentence)).strip()
+
+
+class TranslationCache:
+    """Cache SQLite des traductions, précédé d'un LRU en mémoire
+
+    Les entrées plus vieilles que max_age secondes sont supprimées, et au-delà
+    de max_entries les moins récemment utilisées partent en premier.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200_000, max_age=30 * 24 * 3600,
+                 memory_size=4096):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.memory_size = memory_size
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key BLOB PRIMARY KEY, translated TEXT NOT NULL,"
+            " created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS translations_used ON translations(used)")
+        self.evict()
+
+    @staticmethod
+    def key(src, dest, sentence, backend=None):
+        """Empreinte de la phrase pour un moteur donné: la sortie d'echo n'est jamais resservie pour google"""
+        return hashlib.blake2b(f"{backend or ''}\0{src}\0{dest}\0{normalize(sentence)}".encode("utf-8"),
+                               digest_size=16).digest()
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "entries": entries}
+
+    def get_many(self, keys):
+        """Traductions connues pour ces clés (None pour les absentes)"""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                translated, created = entry
+                # Même limite d'âge qu'en base: une traduction périmée n'est plus servie depuis la mémoire
+                if created <= now - self.max_age:
+                    del self._memory[key]
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = translated
+                self.memory_hits += 1
+
+            wanted = [key for key in set(keys) if key not in found]
+            if wanted:
+                rows = []
+                for start in range(0, len(wanted), 500):
+                    part = wanted[start:start + 500]
+                    rows += self._db.execute(
+                        f"SELECT key, translated, created FROM translations WHERE created > ? "
+                        f"AND key IN ({','.join('?' * len(part))})",
+                        [now - self.max_age, *part]).fetchall()
+                self._db.executemany("UPDATE translations SET used = ? WHERE key = ?",
+                                     [(now, key) for key, _, _ in rows])
+                self._db.commit()
+                for key, translated, created in rows:
+                    found[key] = translated
+                    self._remember(key, translated, created)
+                self.disk_hits += len(rows)
+                self.misses += len(wanted) - len(rows)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, items):
+        """Enregistre des couples (clé, traduction)"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO translations (key, translated, created, used) VALUES (?, ?, ?, ?)",
+                [(key, translated, now, now) for key, translated in items])
+            self._db.commit()
+            for key, translated in items:
+                self._remember(key, translated, now)
+            self._writes += len(items)
+            should_evict = self._writes >= 1000
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            self._writes = 0
+            self._db.execute("DELETE FROM translations WHERE created <= ?", (time.time() - self.max_age,))
+            excess = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY used LIMIT ?)", (excess,))
+            self._db.commit()
+
+    def _remember(self, key, translated, created):
+        self._memory[key] = (translated, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SentenceTranslator:
+    """Traduit un texte phrase par phrase; seules les phrases absentes du cache sont envoyées
+
+    translator est un moteur de grammatical.translators (translate_batch).
+    """
+
+    def __init__(self, translator, cache=None):
+        self.translator = translator
+        self.cache = cache
+
+    def translate(self, text, src="fr", dest="en"):
+        with metrics.timer("translation.translate"):
+            return self._translate(text, src, dest)
+
+    def _translate(self, text, src, dest):
+        pieces = []
+        for start, end in split_sentences(text):
+            sentence = text[start:end]
+            stripped = sentence.rstrip()
+            pieces.append((stripped, sentence[len(stripped):]))
+
+        sentences = [sentence for sentence, _ in pieces if sentence.strip()]
+        backend = self.translator.name
+        keys = [TranslationCache.key(src, dest, sentence, backend) for sentence in sentences]
+        translations = self.cache.get_many(keys) if self.cache is not None else [None] * len(keys)
+
+        missing = {}
+        for sentence, key, translated in zip(sentences, keys, translations):
+            if translated is None:
+                missing.setdefault(key, normalize(sentence))
+        metrics.count("translation.cache_hits", len(sentences) - sum(t is None for t in translations))
+        metrics.count("translation.sentences_sent", len(missing))
+        if missing:
+            done = dict(zip(missing, self.translator.translate_batch(list(missing.values()), src, dest)))
+            if self.cache is not None:
+                self.cache.put_many(list(done.items()))
+            translations = [translated if translated is not None else done[key]
+                            for key, translated in zip(keys, translations)]
+
+        translated = iter(translations)
+        return "".join((next(translated) if sentence.strip() else sentence) + spacing
+                       for sentence, spacing in pieces)
@@ -0,0 +1,135 @@
+"""Moteurs de traduction interchangeables et envoi des phrases par lots concurrents"""
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from grammatical.metrics import metrics
+
+
+class TranslatorBackend:
+    """Interface commune: traduit une liste de phrases, dans l'ordre"""
+
+    name = None
+
+    def translate_batch(self, sentences, src, dest):
+        raise NotImplementedError
+
+
+class GoogleTransBackend(TranslatorBackend):
+    """googletrans; un seul Translator, donc un seul pool de connexions HTTP réutilisé
+
+    googletrans envoie une requête par élément d'une liste: le lot part en
+    une seule requête, phrases séparées par des retours à la ligne que Google
+    conserve. Si le découpage de la réponse ne retombe pas sur le nombre de
+    phrases, le lot est retraduit phrase par phrase.
+    """
+
+    name = "google"
+    separator = "\n"
+
+    def __init__(self):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def translate_batch(self, sentences, src, dest):
+        sentences = list(sentences)
+        if not sentences:
+            return []
+        if not any(self.separator in sentence for sentence in sentences):
+            joined = self.translator.translate(self.separator.join(sentences), src=src, dest=dest).text
+            translated = joined.split(self.separator)
+            if len(translated) == len(sentences):
+                return [text.strip() for text in translated]
+            metrics.count("translation.split_mismatch")
+        return [result.text for result in self.translator.translate(sentences, src=src, dest=dest)]
+
+
+class EchoBackend(TranslatorBackend):
+    """Renvoie les phrases telles quelles, précédées de prefix; latence simulée possible
+
+    Permet de faire tourner l'application et les benchmarks hors ligne. La
+    latence d'un appel est seconds_per_call plus seconds_per_kb par millier
+    de caractères envoyés.
+    """
+
+    name = "echo"
+
+    def __init__(self, prefix="", seconds_per_call=0.0, seconds_per_kb=0.0):
+        self.prefix = prefix
+        self.seconds_per_call = seconds_per_call
+        self.seconds_per_kb = seconds_per_kb
+        self.calls = 0
+
+    def translate_batch(self, sentences, src, dest):
+        sentences = list(sentences)
+        self.calls += 1
+        latency = self.seconds_per_call + self.seconds_per_kb * sum(map(len, sentences)) / 1000
+        if latency:
+            time.sleep(latency)
+        return [self.prefix + sentence for sentence in sentences]
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleTransBackend, EchoBackend)}
+
+
+def get_backend(name=None):
+    """Moteur choisi par nom, ou par GRAMMATICAL_TRANSLATOR (google par défaut)"""
+    return BACKENDS[name or os.environ.get("GRAMMATICAL_TRANSLATOR", "google")]()
+
+
+class BatchTranslator(TranslatorBackend):
+    """Découpe en lots envoyés en parallèle (au plus max_concurrency), avec reprise sur erreur
+
+    Les lots sont bornés en nombre de phrases et en caractères; les résultats
+    sont remis dans l'ordre d'origine.
+    """
+
+    def __init__(self, backend, batch_size=25, max_chars=4500, max_concurrency=4,
+                 retries=3, backoff=0.5):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="traduction")
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def batches(self, sentences):
+        batch = []
+        size = 0
+        for sentence in sentences:
+            if batch and (len(batch) >= self.batch_size or size + len(sentence) > self.max_chars):
+                yield batch
+                batch = []
+                size = 0
+            batch.append(sentence)
+            size += len(sentence)
+        if batch:
+            yield batch
+
+    def translate_batch(self, sentences, src, dest):
+        futures = [self._executor.submit(self._translate_with_retry, batch, src, dest)
+                   for batch in self.batches(sentences)]
+        return [translated for future in futures for translated in future.result()]
+
+    def _translate_with_retry(self, batch, src, dest):
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.timer("translation.request"):
+                    translated = self.backend.translate_batch(batch, src, dest)
+                if len(translated) != len(batch):
+                    raise ValueError(f"{len(translated)} traductions reçues pour {len(batch)} phrases")
+                return translated
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                metrics.count("translation.retries")
+                # Attente exponentielle avec un peu d'aléa pour ne pas relancer tous les lots ensemble
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(1, 1.5))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,11 +1,20 @@
 import customtkinter as ctk
-import language_tool_python
-from threading import Thread
 
-tool = language_tool_python.LanguageTool('en')
+from grammatical.chunking import CheckCancelled
+from grammatical.correction import classify, explain, first_suggestion
+from grammatical.engines import CorrectionEngine
+from grammatical.metrics import configure_from_env, metrics
+from grammatical.scheduler import CancelToken, LatestOnly, deliver
+
+# Erreurs soulignées dans le texte original, par catégorie
+HIGHLIGHT_COLORS = {"accord": "#E67E22", "confusion": "#9B59B6", None: "#E74C3C"}
+# Nombre d'explications ajoutées à chaque défilement vers le bas
+EXPLICATIONS_PAGE = 100
+# Nombre d'erreurs surlignées par tour de boucle Tk
+HIGHLIGHT_SLICE = 300
 
 class CorrecteurApp:
-    def __init__(self):
+    def __init__(self, choose=first_suggestion, live_delay_ms=400):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
         
@@ -13,8 +22,19 @@ class CorrecteurApp:
         self.root.title("Grammatical")
         self.root.geometry("1000x800")
         
-        self.tool = language_tool_python.LanguageTool('fr')
+        # Seuls les paragraphes modifiés depuis la dernière correction sont renvoyés au serveur;
+        # une seule vérification en cours, seul le texte le plus récent attend qu'elle finisse
+        self.engine = CorrectionEngine('fr', choose, jobs=LatestOnly())
+        # Vérification en cours: une nouvelle demande la rend obsolète
+        self._job = None
+        self.live_delay_ms = live_delay_ms
+        self._live_job = None
+        self._matches = []
+        self._shown = 0
+        self._render_generation = 0
         self.setup_ui()
+        # Le serveur démarre une fois la fenêtre affichée, sans la bloquer
+        self.root.after(0, self.engine.warm_up)
         
     def setup_ui(self):
         self.root.grid_columnconfigure(0, weight=1)
@@ -34,6 +54,14 @@ class CorrecteurApp:
         ctk.CTkLabel(main_frame, text="Entrez votre texte à corriger:", font=("Montserrat", 18, "bold")).grid(
             row=0, column=0, sticky="w", pady=(0, 5))
         
+        self.live_switch = ctk.CTkSwitch(
+            main_frame,
+            text="Correction en direct",
+            command=self.toggle_live_mode,
+            font=("Montserrat", 14)
+        )
+        self.live_switch.grid(row=0, column=0, sticky="e", pady=(0, 5))
+        
         self.text_original = ctk.CTkTextbox(
             main_frame, 
             wrap="word",
@@ -42,6 +70,9 @@ class CorrecteurApp:
             corner_radius=10
         )
         self.text_original.grid(row=1, column=0, sticky="nsew", pady=(0, 10))
+        self.text_original.bind("<<Modified>>", self.on_text_modified)
+        for category, color in HIGHLIGHT_COLORS.items():
+            self.text_original.tag_config(self.highlight_tag(category), underline=True, foreground=color)
         
         self.btn_correct = ctk.CTkButton(
             main_frame, 
@@ -80,51 +111,137 @@ class CorrecteurApp:
     def start_correction_thread(self):
         self.btn_correct.configure(state="disabled", text="Traitement en cours...")
         
-        Thread(target=self.corriger_texte, daemon=True).start()
-        
-    def corriger_texte(self):
-        texte = self.text_original.get("1.0", "end")
-        
         self.text_corrige.delete("1.0", "end")
         self.text_corrige.insert("1.0", "Traitement...")
         self.text_explications.delete("1.0", "end")
         self.text_explications.insert("1.0", "Analyse en cours...")
         
-        corrected_text = self.tool.correct(texte)
-        
-
-        matches = self.tool.check(texte)
-        explications = []
-        
-        for match in matches:
-            if match.ruleId == "FR_AGREEMENT":
-                error_msg = f"Erreur d'accord: {match.message}"
-            elif match.ruleId.startswith("CONFUSIONS_"):
-                error_msg = f"Confusion possible: {match.message}"
-            else:
-                error_msg = match.message
-                
-            explication = (
-                f"● {error_msg}\n"
-                f"   → Correction suggérée: {match.replacements[0] if match.replacements else 'Aucune suggestion'}\n"
-                f"   (Type: {match.ruleId})\n\n"
-            )
-            explications.append(explication)
-        
-        self.root.after(0, self.update_results, corrected_text, explications)
-        
-    def update_results(self, corrected_text, explications):
-        self.text_corrige.delete("1.0", "end")
-        self.text_corrige.insert("1.0", corrected_text)
-        
+        self.corriger_texte(self.text_original.get("1.0", "end"))
+        
+    def toggle_live_mode(self):
+        if self.live_switch.get():
+            self.schedule_live_check()
+        elif self._live_job is not None:
+            self.root.after_cancel(self._live_job)
+            self._live_job = None
+        
+    def on_text_modified(self, event=None):
+        if not self.text_original.edit_modified():
+            return
+        self.text_original.edit_modified(False)
+        if self.live_switch.get():
+            self.schedule_live_check()
+        
+    def schedule_live_check(self):
+        # Anti-rebond: on attend une pause de live_delay_ms dans la frappe
+        if self._live_job is not None:
+            self.root.after_cancel(self._live_job)
+        self._live_job = self.root.after(self.live_delay_ms, self.start_live_check)
+        
+    def start_live_check(self):
+        self._live_job = None
+        self.corriger_texte(self.text_original.get("1.0", "end"))
+        
+    def corriger_texte(self, texte):
+        """Lance la vérification dans l'ordonnanceur; seuls ses résultats passent dans le thread Tk"""
+        if self._job is not None:
+            self._job.cancel()
+        token = CancelToken()
+        
+        # Les erreurs s'affichent au fur et à mesure que les morceaux du texte sont vérifiés
+        def show_partial(matches):
+            self.root.after(0, self.deliver_results, token, None, matches)
+        
+        self._job = deliver(self.engine.check(texte, on_partial=show_partial, token=token),
+                            self.root.after, self.correction_done)
+        return self._job
+        
+    def correction_done(self, job):
+        if job.cancelled() or job.token.cancelled:
+            return
+        error = job.exception()
+        if isinstance(error, CheckCancelled):
+            return
+        if error is not None:
+            self.text_corrige.delete("1.0", "end")
+            self.text_corrige.insert("1.0", f"Erreur: {error}")
+            self.btn_correct.configure(state="normal", text="Corriger le texte")
+            return
+        result = job.result()
+        self.update_results(result.corrected_text, result.matches)
+        
+    def deliver_results(self, token, corrected_text, matches):
+        # Un texte modifié depuis rend ce résultat obsolète
+        if not token.cancelled:
+            self.update_results(corrected_text, matches)
+        
+    def update_results(self, corrected_text, matches):
+        # corrected_text vaut None tant que la vérification n'est pas terminée
+        with metrics.timer("ui.insert"):
+            if corrected_text is not None:
+                self.text_corrige.delete("1.0", "end")
+                self.text_corrige.insert("1.0", corrected_text)
+        
+        self._render_generation += 1
+        self._matches = matches
+        self._shown = 0
         self.text_explications.delete("1.0", "end")
-        if not explications:
-            self.text_explications.insert("1.0", "✅ Aucune erreur détectée!")
+        if not matches:
+            self.text_explications.insert("1.0", "✅ Aucune erreur détectée!" if corrected_text is not None else "Analyse en cours...")
         else:
-            self.text_explications.insert("1.0", "".join(explications))
-        
-        self.btn_correct.configure(state="normal", text="Corriger le texte")
+            self.show_more_explications()
+            self.watch_explications_scroll(self._render_generation)
+        self.highlight_matches(matches, self._render_generation)
+        
+        if corrected_text is not None:
+            self.btn_correct.configure(state="normal", text="Corriger le texte")
+            
+    @staticmethod
+    def highlight_tag(category):
+        return f"erreur_{category or 'autre'}"
+        
+    def highlight_matches(self, matches, generation, start=0):
+        """Souligne les erreurs par tranches pour ne jamais bloquer la boucle Tk"""
+        if generation != self._render_generation:
+            return
+        if start == 0:
+            for category in HIGHLIGHT_COLORS:
+                self.text_original.tag_remove(self.highlight_tag(category), "1.0", "end")
+        
+        for match in matches[start:start + HIGHLIGHT_SLICE]:
+            self.text_original.tag_add(
+                self.highlight_tag(classify(match.ruleId)),
+                f"1.0+{match.offset}c",
+                f"1.0+{match.offset + match.errorLength}c"
+            )
+        if start + HIGHLIGHT_SLICE < len(matches):
+            self.root.after(1, self.highlight_matches, matches, generation, start + HIGHLIGHT_SLICE)
+            
+    def show_more_explications(self):
+        """Ajoute la page suivante d'explications; seules les pages atteintes sont formatées"""
+        footer = self.text_explications.tag_ranges("suite")
+        if footer:
+            self.text_explications.delete(footer[0], footer[-1])
+        
+        page = self._matches[self._shown:self._shown + EXPLICATIONS_PAGE]
+        with metrics.timer("ui.explain"):
+            explications = "".join(explain(match) for match in page)
+        with metrics.timer("ui.insert"):
+            self.text_explications.insert("end", explications)
+        self._shown += len(page)
+        
+        remaining = len(self._matches) - self._shown
+        if remaining:
+            self.text_explications.insert("end", f"… {remaining} autres erreurs, faites défiler pour les afficher", "suite")
+            
+    def watch_explications_scroll(self, generation):
+        if generation != self._render_generation or self._shown >= len(self._matches):
+            return
+        if self.text_explications.yview()[1] > 0.9:
+            self.show_more_explications()
+        self.root.after(200, self.watch_explications_scroll, generation)
 
 if __name__ == "__main__":
+    configure_from_env()
     app = CorrecteurApp()
     app.root.mainloop()
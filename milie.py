@@ -1,10 +1,29 @@
+import os
+import time
+
 import customtkinter as ctk
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
-from threading import Thread
+
+from grammatical.chat import ChatSession, TextChunkStreamer
+from grammatical.conversations import ConversationStore
+from grammatical.engines import ChatEngine
+from grammatical.inference import DEFAULT_BACKEND, DEFAULT_PROFILE, DEFAULT_THREADS
+from grammatical.metrics import configure_from_env, metrics
+from grammatical.scheduler import deliver
+from grammatical.speculative import DEFAULT_DRAFT
+
+# Pris juste après les imports, avant toute construction: torch et transformers ne sont
+# chargés qu'en arrière-plan, le premier affichage mesuré ici ne dépend donc pas d'eux
+STARTED = time.perf_counter()
 
 class ChatbotApp:
-    def __init__(self):
+    def __init__(self, profile=DEFAULT_PROFILE, threads=DEFAULT_THREADS, backend=DEFAULT_BACKEND,
+                 draft_model=DEFAULT_DRAFT, conversation_id=os.environ.get("GRAMMATICAL_CONVERSATION", "milie")):
+        # Profil d'inférence CPU: fp32, int8 ou bf16 (GRAMMATICAL_PROFILE, GRAMMATICAL_THREADS)
+        # Moteur de génération: torch ou onnx (GRAMMATICAL_BACKEND)
+        # Modèle brouillon du décodage assisté, ex: microsoft/DialoGPT-small (GRAMMATICAL_DRAFT_MODEL)
+        # Conversation enregistrée sur disque et reprise au lancement suivant (GRAMMATICAL_CONVERSATION)
+        self.setup_model(profile, threads, backend, draft_model, conversation_id)
+        
         ctk.set_appearance_mode("System")
         ctk.set_default_color_theme("blue")
         
@@ -12,21 +31,32 @@ class ChatbotApp:
         self.root.title("Chatbot Nilie Bot")
         self.root.geometry("700x600")
         
-        self.setup_model()
-        
         self.setup_ui()
+        self.root.after(0, self.report_first_paint)
         
-    def setup_model(self):
-        """Charge le modèle et le tokenizer avec configuration correcte"""
-        self.tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
-        self.model = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
+        # Le modèle se charge en arrière-plan, la fenêtre est utilisable tout de suite
+        self.loader = self.engine.start_loading(
+            on_progress=lambda message: self.root.after(0, self.show_status, message),
+            on_done=lambda loader: self.root.after(0, self.model_loaded, loader)
+        )
         
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-        self.chat_history_ids = None
+    def setup_model(self, profile, threads, backend, draft_model, conversation_id):
+        """Prépare le moteur de chat; les poids sont chargés en arrière-plan par l'ordonnanceur"""
         self.max_new_tokens = 500  # Limite de nouveaux tokens à générer
         self.max_length = 1024     # Longueur maximale totale
+        # Historique et cache clés/valeurs conservés d'un tour à l'autre
+        self.engine = ChatEngine(
+            "microsoft/DialoGPT-medium", backend, profile, threads, draft_model,
+            session=ChatSession(self.max_length, self.max_new_tokens),
+            store=ConversationStore(),
+            conversation_id=conversation_id,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            temperature=0.7,
+            early_stopping=True
+        )
+        self.job = None
         
     def setup_ui(self):
         """Configure l'interface graphique"""
@@ -64,12 +94,59 @@ class ChatbotApp:
             text="Envoyer",
             command=self.send_message,
             width=100,
-            font=("Arial", 12, "bold")
+            font=("Arial", 12, "bold"),
+            state="disabled"
         )
         self.send_button.pack(side="right")
         
+        # Bouton d'arrêt de la génération
+        self.stop_button = ctk.CTkButton(
+            self.input_frame,
+            text="Arrêter",
+            command=self.stop_generation,
+            width=100,
+            font=("Arial", 12, "bold"),
+            state="disabled"
+        )
+        self.stop_button.pack(side="right", padx=(0, 5))
+        
+        # État du chargement du modèle
+        self.status_label = ctk.CTkLabel(
+            self.main_frame,
+            text="Chargement du modèle...",
+            font=("Arial", 10),
+            text_color="#7F8C8D"
+        )
+        self.status_label.pack(fill="x", pady=(5, 0))
+        
+    def report_first_paint(self):
+        """Durée entre le lancement et le premier affichage de la fenêtre"""
+        self.first_paint_seconds = time.perf_counter() - STARTED
+        metrics.observe("ui.first_paint", self.first_paint_seconds)
+        
+    def show_status(self, message):
+        self.status_label.configure(text=message)
+        
+    def model_loaded(self, loader):
+        """Active l'envoi de messages une fois le modèle chargé"""
+        if loader.error is not None:
+            self.show_status(f"Erreur au chargement du modèle: {loader.error}")
+            return
+        
+        report = (
+            f"Modèle {self.engine.backend} {self.engine.profile} chargé en {loader.seconds:.1f} s, "
+            f"{self.engine.self_check['tokens_per_second']:.1f} tokens/s, mémoire max {loader.peak_rss_mb or 0:.0f} Mo"
+        )
+        metrics.observe("chat.model_load", loader.seconds)
+        self.show_status(report)
+        self.send_button.configure(state="normal")
+        
         # Message de bienvenue
-        self.display_message("Bot", "Bonjour ! Je suis votre assistant DialoGPT. Posez-moi vos questions (tapez 'quit' pour quitter).")
+        self.display_message("Bot", "Bonjour ! Je suis votre assistant DialoGPT. Posez-moi vos questions (tapez 'quit' pour quitter, 'reset' pour une nouvelle conversation).")
+        # Tours repris de la conversation enregistrée
+        for message, response in self.engine.history():
+            self.display_message("User", message)
+            self.display_message("Bot", response)
         
     def display_message(self, sender, message):
         """Affiche un message dans la zone de chat"""
@@ -102,6 +179,18 @@ class ChatbotApp:
             self.root.destroy()
             return
             
+        # Nouvelle conversation: l'historique enregistré est effacé
+        if user_text.lower() == 'reset':
+            self.engine.reset()
+            self.user_input.delete(0, "end")
+            self.display_message("Bot", "Nouvelle conversation.")
+            return
+            
+        # Le message reste dans le champ tant que le modèle n'est pas prêt
+        if not self.loader.ready:
+            self.show_status(f"Patientez... {self.loader.message}")
+            return
+            
         # Afficher le message de l'utilisateur
         self.display_message("User", user_text)
         self.user_input.delete(0, "end")
@@ -116,60 +205,51 @@ class ChatbotApp:
         self.chat_display.insert("end", "Assistant est en train de réfléchir...\n")
         self.chat_display.configure(state="disabled")
         
-        # Lancer la génération de réponse dans un thread séparé
-        Thread(target=self.generate_response, args=(user_text,), daemon=True).start()
-        
-    def generate_response(self, user_input):
-        """Génère une réponse à partir de l'entrée utilisateur"""
-        try:
-            # Encodage du nouvel input
-            inputs = self.tokenizer(
-                user_input + self.tokenizer.eos_token, 
-                return_tensors='pt',
-                truncation=True,
-                max_length=self.max_length - self.max_new_tokens  # Réserve de place pour la réponse
-            )
-            
-            # Concaténation avec l'historique de chat si existant
-            if self.chat_history_ids is not None:
-                inputs['input_ids'] = torch.cat([self.chat_history_ids, inputs['input_ids']], dim=-1)
-                # Création du masque d'attention
-                inputs['attention_mask'] = torch.ones_like(inputs['input_ids'])
-            
-            # Vérification de la longueur totale
-            if inputs['input_ids'].shape[-1] > self.max_length - self.max_new_tokens:
-                inputs['input_ids'] = inputs['input_ids'][:, -self.max_length + self.max_new_tokens:]
-                inputs['attention_mask'] = inputs['attention_mask'][:, -self.max_length + self.max_new_tokens:]
-            
-            # Génération de la réponse avec paramètres optimisés
-            self.chat_history_ids = self.model.generate(
-                inputs['input_ids'],
-                attention_mask=inputs['attention_mask'],
-                max_new_tokens=self.max_new_tokens,
-                pad_token_id=self.tokenizer.pad_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.7,
-                early_stopping=True
-            )
-            
-            # Décodage de la réponse
-            response = self.tokenizer.decode(
-                self.chat_history_ids[:, inputs['input_ids'].shape[-1]:][0],
-                skip_special_tokens=True
-            )
-            
-            # Affichage de la réponse dans l'interface
-            self.root.after(0, self.finish_response, response)
-            
-        except Exception as e:
-            error_msg = f"Désolé, une erreur est survenue: {str(e)}"
-            self.root.after(0, self.finish_response, error_msg)
+        # La réponse s'affiche au fil de la génération et peut être interrompue
+        self.streaming = False
+        self.streamer = TextChunkStreamer(self.engine.tokenizer)
+        self.stop_button.configure(state="normal")
+        
+        # Génération dans l'ordonnanceur; la réponse revient par root.after
+        self.job = deliver(self.engine.reply(user_text, self.streamer), self.root.after, self.response_done)
+        self.root.after(50, self.flush_stream, self.streamer)
+        
+    def stop_generation(self):
+        """Interrompt la génération; la réponse partielle est conservée"""
+        self.job.token.cancel()
+        self.stop_button.configure(state="disabled")
+        
+    def flush_stream(self, streamer):
+        """Affiche par lots le texte généré depuis le dernier passage"""
+        if streamer is not self.streamer:
+            return
+        text = streamer.drain()
+        if text:
+            self.chat_display.configure(state="normal")
+            if not self.streaming:
+                # Remplace l'indicateur de traitement par le début de la réponse
+                self.chat_display.delete(self.typing_indicator, "end")
+                self.chat_display.insert("end", "Assistant: ", "bot")
+                self.streaming = True
+            self.chat_display.insert("end", text, "bot")
+            self.chat_display.configure(state="disabled")
+            self.chat_display.see("end")
+        self.root.after(50, self.flush_stream, streamer)
+        
+    def response_done(self, job):
+        error = job.exception()
+        if error is not None:
+            self.finish_response(f"Désolé, une erreur est survenue: {str(error)}")
+        else:
+            self.finish_response(job.result())
+        report = self.engine.turn_report()
+        if report is not None:
+            self.show_status(report)
             
     def finish_response(self, response):
         """Finalise l'affichage de la réponse"""
+        self.streamer = None
+        self.stop_button.configure(state="disabled")
         self.chat_display.configure(state="normal")
         
         # Supprimer l'indicateur de traitement
@@ -185,5 +265,6 @@ class ChatbotApp:
         self.user_input.focus()
 
 if __name__ == "__main__":
+    configure_from_env()
     app = ChatbotApp()
     app.root.mainloop()
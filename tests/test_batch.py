@@ -0,0 +1,26 @@
+"""Correction en lot: une ligne JSONL illisible devient un enregistrement d'erreur, le reste est corrigé"""
+from benchmarks.stubs import StubLanguageTool
+from grammatical.batch import InvalidRecord, correct_records, iter_records
+
+
+def write_jsonl(tmp_path, lines):
+    path = tmp_path / "entrée.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_malformed_lines_reported_with_their_number(tmp_path):
+    path = write_jsonl(tmp_path, ['{"id": "a", "text": "Bonjour."}', '{"text": "coupé', "", '[1, 2]',
+                                  '{"text": "Salut."}'])
+    records = list(iter_records([path]))
+    assert [record_id for record_id, _ in records] == ["a", f"{path}:2", f"{path}:4", f"{path}:5"]
+    assert isinstance(records[1][1], InvalidRecord) and "ligne 2" in records[1][1].error
+    assert isinstance(records[2][1], InvalidRecord) and "ligne 4" in records[2][1].error
+
+
+def test_batch_continues_after_malformed_line(tmp_path):
+    path = write_jsonl(tmp_path, ['{"id": "a", "text": "Bonjour."}', "pas du json", '{"id": "c", "text": "Salut."}'])
+    results = list(correct_records(iter_records([path]), workers=1, tool_factory=StubLanguageTool))
+    assert [result["id"] for result in results] == ["a", f"{path}:2", "c"]
+    assert "corrected" in results[0] and "corrected" in results[2]
+    assert results[1]["error"].startswith("ligne 2: JSON invalide")
@@ -0,0 +1,105 @@
+"""Service de chat: un lot de sessions répond comme chaque session générée seule, tour après tour"""
+import logging
+import threading
+
+import pytest
+
+from grammatical.server import _NotRightPadding
+
+
+def test_right_padding_warning_filtered():
+    record = logging.makeLogRecord({"msg": "A decoder-only architecture is being used, but right-padding "
+                                           "was detected! For correct generation results, ..."})
+    assert not _NotRightPadding().filter(record)
+    assert _NotRightPadding().filter(logging.makeLogRecord({"msg": "autre avertissement"}))
+
+
+DIALOGUES = [
+    ["bonjour !", "comment ça va ?", "je suis bien et toi ?", "merci , oui"],
+    ["salut", "tu as une aide pour moi ?", "non , merci", "et toi ?"],
+    ["oui", "bien", "je suis un mot1 mot2 mot3 mot4", "la les de"],
+]
+MAX_NEW_TOKENS = 8
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from benchmarks.tiny_models import tiny_model, tiny_tokenizer
+
+    return tiny_tokenizer(), tiny_model(layers=2, width=64, heads=2)
+
+
+def sequential(tokenizer, model):
+    from grammatical.chat import ChatSession
+
+    responses = []
+    for dialogue in DIALOGUES:
+        session = ChatSession(max_length=256, max_new_tokens=MAX_NEW_TOKENS)
+        responses.append([session.generate(model, tokenizer, text, do_sample=False,
+                                           eos_token_id=tokenizer.eos_token_id,
+                                           pad_token_id=tokenizer.pad_token_id)
+                          for text in dialogue])
+    return responses
+
+
+def batched(tokenizer, model):
+    from grammatical.server import ChatScheduler
+
+    scheduler = ChatScheduler(model, tokenizer, max_length=256, max_new_tokens=MAX_NEW_TOKENS,
+                              batch_window=0.05, do_sample=False)
+    try:
+        sessions = [scheduler.open_session() for _ in DIALOGUES]
+        responses = [[] for _ in DIALOGUES]
+        for turn in range(len(DIALOGUES[0])):
+            def send(i):
+                responses[i].append(scheduler.submit(sessions[i], DIALOGUES[i][turn]))
+            threads = [threading.Thread(target=send, args=(i,)) for i in range(len(DIALOGUES))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return responses, scheduler.batches
+    finally:
+        scheduler.close()
+
+
+def test_batched_matches_sequential(tiny):
+    tokenizer, model = tiny
+    responses, batches = batched(tokenizer, model)
+    # Au moins un tour a réellement regroupé plusieurs sessions
+    assert batches < len(DIALOGUES) * len(DIALOGUES[0])
+    assert responses == sequential(tokenizer, model)
+
+
+class StubTokenizer:
+    eos_token_id = pad_token_id = 0
+
+
+def test_idle_sessions_release_kv_cache():
+    from grammatical.server import ChatScheduler
+
+    scheduler = ChatScheduler(model=None, tokenizer=StubTokenizer(), max_batch=2, cache_timeout=30)
+    try:
+        with scheduler._lock:
+            ids = [scheduler._admit(f"s{i}").id for i in range(4)]
+            for age, session_id in enumerate(ids):
+                session = scheduler.sessions[session_id]
+                session.past_key_values = ("kv",)
+                session.last_used -= age * 20
+            scheduler.sessions[ids[3]].busy = True
+            scheduler._evict_idle()
+        kept = [scheduler.sessions[session_id].past_key_values is not None for session_id in ids]
+        # s2 inactive depuis 40 s perd son cache; s3 le garde tant qu'une réponse est en cours
+        assert kept == [True, True, False, True]
+
+        with scheduler._lock:
+            scheduler.max_cached = 1
+            scheduler._evict_idle()
+        assert [scheduler.sessions[session_id].past_key_values is not None for session_id in ids] == \
+            [True, False, False, True]
+        # L'historique reste: le cache sera recalculé au message suivant
+        assert set(scheduler.sessions) == set(ids)
+    finally:
+        scheduler.close()
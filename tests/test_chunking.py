@@ -0,0 +1,40 @@
+"""Vérification par morceaux: mêmes erreurs qu'une vérification d'un bloc, frontières comprises"""
+import re
+import types
+
+from grammatical.chunking import check_chunked, chunk_spans
+
+
+class PatternTool:
+    """LanguageTool simulé: une erreur par occurrence de pattern"""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+
+    def check(self, text):
+        return [types.SimpleNamespace(offset=found.start(), errorLength=found.end() - found.start(), ruleId="X")
+                for found in self.pattern.finditer(text)]
+
+
+def spans(matches):
+    return [(match.offset, match.errorLength) for match in matches]
+
+
+def test_error_across_chunk_boundary_is_kept():
+    text = "Une phrase. " * 4 + "Mot XX. " + "YY reste. " + "Une phrase. " * 6
+    tool = PatternTool(r"XX\. YY")
+    # L'erreur commence dans le contexte du deuxième morceau et déborde sur lui
+    assert any(context < text.index("XX") < start < text.index("YY") + 2
+               for context, start, _ in chunk_spans(text, 60))
+    assert spans(check_chunked(tool, text, max_chars=60)) == spans(tool.check(text)) == [(52, 6)]
+
+
+def test_each_error_reported_once():
+    text = "Une err ici. " * 400
+    tool = PatternTool("err")
+    assert spans(check_chunked(tool, text, max_chars=500)) == spans(tool.check(text))
+
+
+def test_short_text_checked_in_one_call():
+    tool = PatternTool("err")
+    assert spans(check_chunked(tool, "Une err.", max_chars=500)) == [(4, 3)]
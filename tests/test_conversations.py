@@ -0,0 +1,34 @@
+"""ConversationStore: tours enregistrés en int32, rechargés dans un budget de tokens, effacés"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from grammatical.conversations import ConversationStore  # noqa: E402
+
+
+def test_round_trip(tmp_path):
+    store = ConversationStore(str(tmp_path))
+    turns = [[1, 2, 0, 3, 4, 0], [5, 0, 6, 7, 8, 0], [9, 10, 0, 11, 0]]
+    for turn in turns:
+        store.append_turn("abc", turn)
+    assert store.exists("abc")
+
+    ids, starts = store.load("abc", budget=100)
+    assert ids.dtype == np.int64
+    assert ids.tolist() == [token for turn in turns for token in turn]
+    assert starts == [0, 6, 12]
+
+    # Seuls les derniers tours entiers qui tiennent dans le budget
+    ids, starts = store.load("abc", budget=11)
+    assert ids.tolist() == turns[1] + turns[2] and starts == [0, 6]
+    ids, starts = store.load("abc", budget=4)
+    assert ids.tolist() == [] and starts == []
+
+    store.delete("abc")
+    assert not store.exists("abc")
+    assert store.load("abc", budget=100)[1] == []
+
+
+def test_invalid_identifier_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ConversationStore(str(tmp_path)).exists("../ailleurs")
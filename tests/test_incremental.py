@@ -0,0 +1,57 @@
+"""IncrementalChecker hors ligne: seuls les paragraphes inconnus partent, positions ramenées au document"""
+import re
+import types
+
+from grammatical.incremental import SEPARATOR, IncrementalChecker, MatchCache
+
+
+class PatternTool:
+    """LanguageTool simulé: une erreur par occurrence de pattern; garde les textes reçus"""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+        self.texts = []
+
+    def check(self, text):
+        self.texts.append(text)
+        return [types.SimpleNamespace(offset=found.start(), errorLength=found.end() - found.start(), ruleId="X")
+                for found in self.pattern.finditer(text)]
+
+
+def spans(matches):
+    return [(match.offset, match.errorLength) for match in matches]
+
+
+def test_only_changed_paragraphs_are_sent():
+    tool = PatternTool("err")
+    checker = IncrementalChecker(tool, "fr", cache=MatchCache())
+    text = "Une err.\nDeux.\nTrois err."
+    assert spans(checker.check(text)) == [(4, 3), (21, 3)]
+    assert tool.texts == [SEPARATOR.join(["Une err.", "Deux.", "Trois err."])]
+
+    edited = "Une err.\nDeux err.\nTrois err."
+    assert spans(checker.check(edited)) == [(4, 3), (14, 3), (25, 3)]
+    assert tool.texts[-1] == "Deux err."
+
+
+def test_cache_is_per_language():
+    tool = PatternTool("err")
+    cache = MatchCache()
+    IncrementalChecker(tool, "fr", cache=cache).check("Une err.")
+    IncrementalChecker(tool, "en", cache=cache).check("Une err.")
+    assert len(tool.texts) == 2
+
+
+def test_match_across_separator_is_dropped():
+    # Erreur vue par le serveur à cheval sur deux paragraphes du lot: elle n'existe pas dans le document
+    tool = PatternTool(r"fin\.\n\nDébut")
+    checker = IncrementalChecker(tool, "fr", cache=MatchCache())
+    assert checker.check("La fin.\nDébut ici.") == []
+
+
+def test_lru_eviction():
+    cache = MatchCache(maxsize=2)
+    for name in ("a", "b", "c"):
+        cache.put(cache.key("fr", name), [])
+    assert cache.get(cache.key("fr", "a")) is None
+    assert cache.get(cache.key("fr", "c")) == ()
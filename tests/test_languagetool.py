@@ -0,0 +1,141 @@
+"""Pool LanguageTool hors ligne: language_tool_python et la JVM sont simulés"""
+import sys
+import threading
+import types
+
+import pytest
+
+from grammatical import languagetool
+
+
+class LanguageToolError(Exception):
+    pass
+
+
+class FakeTool:
+    def __init__(self, language, remote_server=None):
+        self.language = language
+        self.url = remote_server
+        self.calls = []
+        self.error = None
+        self.release = None
+
+    def check(self, text, **options):
+        self.calls.append((text, options))
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return []
+
+
+class FakeServer:
+    started = 0
+
+    def __init__(self, host, port):
+        # Comme LocalServer: le port suivant si le précédent est encore pris
+        FakeServer.started += 1
+        self.url = f"http://{host}:{port + FakeServer.started}"
+        self.closed = False
+        alive.add(self.url)
+
+    def close(self):
+        self.closed = True
+        alive.discard(self.url)
+
+
+alive = set()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    utils = types.ModuleType("language_tool_python.utils")
+    utils.LanguageToolError = LanguageToolError
+    module = types.ModuleType("language_tool_python")
+    module.LanguageTool = FakeTool
+    module.utils = utils
+    monkeypatch.setitem(sys.modules, "language_tool_python", module)
+    monkeypatch.setitem(sys.modules, "language_tool_python.utils", utils)
+    monkeypatch.setattr(languagetool, "LocalServer", FakeServer)
+    monkeypatch.setattr(languagetool, "server_answers", lambda url, timeout=0.3: url in alive)
+    alive.clear()
+    pool = languagetool.LanguageToolPool(idle_timeout=0, host="localhost", port=9999)
+    yield pool
+    pool.close()
+
+
+def in_background(tool, text):
+    """Lance tool.check(text) dans un thread, bloqué jusqu'à release.set()"""
+    raw = tool.pool.acquire(tool.language)
+    raw.release = threading.Event()
+    started = threading.Event()
+    original = raw.check
+
+    def check(text, **options):
+        started.set()
+        return original(text, **options)
+    raw.check = check
+    thread = threading.Thread(target=tool.check, args=(text,))
+    thread.start()
+    assert started.wait(5)
+    return raw, thread
+
+
+def test_options_are_forwarded(pool):
+    tool = pool.tool("fr")
+    tool.check("texte", level="picky")
+    assert pool.acquire("fr").calls == [("texte", {"level": "picky"})]
+
+
+def test_busy_server_is_not_reaped(pool):
+    tool = pool.tool("fr")
+    raw, thread = in_background(tool, "texte")
+    server = pool._entries["fr"].server
+    pool.idle_timeout = 1e-9
+    pool.reap()
+    assert "fr" in pool._entries and not server.closed
+    raw.release.set()
+    thread.join()
+    pool.reap()
+    assert "fr" not in pool._entries and server.closed
+
+
+def test_error_from_live_server_keeps_it(pool):
+    tool = pool.tool("fr")
+    raw = pool.acquire("fr")
+    raw.error = LanguageToolError("règle inconnue")
+    with pytest.raises(LanguageToolError):
+        tool.check("texte")
+    assert pool._entries["fr"].tool is raw and not pool._entries["fr"].server.closed
+
+
+def test_dead_server_closed_after_last_call(pool):
+    french, english = pool.tool("fr"), pool.tool("en")
+    french.check("texte")
+    raw, thread = in_background(english, "busy")
+    server = pool._entries["fr"].server
+    # Le serveur ne répond plus: fr en relance un, mais en s'en sert encore
+    alive.discard(server.url)
+    pool.acquire("fr").error = LanguageToolError("connexion refusée")
+    french.check("texte")
+    assert pool._entries["fr"].server is not server and not server.closed
+    raw.release.set()
+    thread.join()
+    pool.idle_timeout = 1e-9
+    pool.reap()
+    assert server.closed
+
+
+def test_shared_jvm_handed_over_to_other_language(pool):
+    french, english = pool.tool("fr"), pool.tool("en")
+    french.check("texte")
+    raw, thread = in_background(english, "busy")
+    server = pool._entries["fr"].server
+    pool.idle_timeout = 1e-9
+    pool.reap()
+    assert "fr" not in pool._entries and not server.closed
+    assert pool._entries["en"].server is server
+    raw.release.set()
+    thread.join()
+    pool.reap()
+    assert server.closed
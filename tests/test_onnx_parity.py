@@ -0,0 +1,45 @@
+"""Parité du moteur ONNX avec torch: mêmes réponses gloutonnes sur un petit GPT-2 aléatoire, hors ligne"""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+from benchmarks.tiny_models import save_tiny_dialogpt  # noqa: E402
+from grammatical.inference import greedy_ids  # noqa: E402
+from grammatical.models import load_dialogpt  # noqa: E402
+from grammatical.onnx_backend import export_unsupported, load_onnx_dialogpt  # noqa: E402
+
+if export_unsupported():
+    pytest.skip(export_unsupported(), allow_module_level=True)
+
+PROMPTS = ["bonjour !", "comment ça va ?", "je suis bien et toi ?", "merci , oui"]
+MAX_NEW_TOKENS = 16
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    """Tokenizer, modèle torch de référence et OnnxDialoGPT exporté depuis les mêmes poids"""
+    directory = save_tiny_dialogpt(str(tmp_path_factory.mktemp("tiny")), layers=2, width=64, heads=2)
+    tokenizer, reference = load_dialogpt(directory)
+    # Graphe exporté dans un dossier temporaire, jamais dans le cache de l'utilisateur
+    _, candidate = load_onnx_dialogpt(directory, cache_dir=str(tmp_path_factory.mktemp("onnx")))
+    return tokenizer, reference, candidate
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_greedy_matches_torch(models, prompt):
+    tokenizer, reference, candidate = models
+    expected = greedy_ids(reference, tokenizer, prompt, MAX_NEW_TOKENS)
+    assert greedy_ids(candidate, tokenizer, prompt, MAX_NEW_TOKENS) == expected
+
+
+def test_unsupported_options_rejected(models):
+    tokenizer, _, candidate = models
+    input_ids = tokenizer("bonjour !" + tokenizer.eos_token, return_tensors="pt").input_ids
+    with pytest.raises(TypeError):
+        candidate.generate(input_ids, num_beams=4)
+    with pytest.raises(TypeError):
+        candidate.generate(input_ids, repetition_penalty=1.3)
+    # Sans effet pour un seul échantillon: accepté comme par transformers
+    candidate.generate(input_ids, max_new_tokens=2, early_stopping=True, num_beams=1)
@@ -0,0 +1,79 @@
+"""Cache des réponses du chat hors ligne: durée de vie, LRU, regroupement des demandes identiques"""
+import threading
+import time
+import types
+from concurrent.futures import Future
+
+from grammatical.engines import ChatEngine
+from grammatical.response_cache import ResponseCache, cache_key
+from grammatical.scheduler import CancelToken
+
+
+def test_published_response_is_served_until_ttl(monkeypatch):
+    cache = ResponseCache(ttl=10)
+    assert cache.lookup("k") == (None, None)
+    cache.publish("k", [1, 2])
+    assert cache.lookup("k") == ([1, 2], None)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.lookup("k") == (None, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_response_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    for key in "abc":
+        cache.lookup(key)
+        cache.publish(key, [ord(key)])
+    assert cache.lookup("a") == (None, None)
+    assert cache.lookup("c") == ([ord("c")], None)
+
+
+def test_identical_requests_share_one_generation():
+    cache = ResponseCache()
+    assert cache.lookup("k") == (None, None)
+    response, waiting = cache.lookup("k")
+    assert response is None and isinstance(waiting, Future)
+    cache.publish("k", [7])
+    assert waiting.result(timeout=1) == [7]
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_failed_generation_is_not_cached():
+    cache = ResponseCache()
+    cache.lookup("k")
+    _, waiting = cache.lookup("k")
+    cache.publish("k", None)
+    # Les demandes en attente reçoivent None et génèrent elles-mêmes
+    assert waiting.result(timeout=1) is None
+    assert cache.lookup("k") == (None, None)
+
+
+def test_config_is_part_of_the_key():
+    assert cache_key("m", [1], {"num_beams": 1}) != cache_key("m", [1], {"num_beams": 2})
+    assert cache_key("m", [1], {}, [5, 6]) != cache_key("m", [1], {}, [5, 7])
+
+
+class Ids(list):
+    """Tokens d'un message sous la forme attendue par _cached (new_ids[0].tolist())"""
+
+    def tolist(self):
+        return list(self)
+
+
+def test_stop_while_waiting_for_shared_generation():
+    cache = ResponseCache()
+    engine = types.SimpleNamespace(session=None, generation_kwargs={}, model_name="m", backend="pytorch",
+                                   profile=None, response_cache=cache)
+    key = cache_key(("m", "pytorch", None), [1, 2], {})
+    cache.lookup(key)
+    token = CancelToken()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(ChatEngine._cached(engine, [Ids([1, 2])], None, token)))
+    waiter.start()
+    time.sleep(0.1)
+    token.cancel()
+    waiter.join(timeout=1)
+    assert result == [[]]
+    assert cache.coalesced == 1
@@ -0,0 +1,125 @@
+"""Ordonnanceur commun et LatestOnly: annulation, remplacement par la dernière demande, file pleine"""
+import threading
+
+import pytest
+
+from grammatical.scheduler import CancelToken, JobScheduler, LatestOnly, SchedulerFull
+
+
+class Gate:
+    """Tâche bloquée jusqu'à open(); started indique qu'elle a commencé"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self._open = threading.Event()
+
+    def __call__(self, value=None):
+        self.started.set()
+        assert self._open.wait(5)
+        return value
+
+    def open(self):
+        self._open.set()
+
+
+def test_cancelled_before_start_is_not_run():
+    jobs = JobScheduler(max_workers=1)
+    gate = Gate()
+    jobs.submit(gate)
+    assert gate.started.wait(5)
+    ran = []
+    token = CancelToken()
+    job = jobs.submit(ran.append, 1, token=token)
+    token.cancel()
+    gate.open()
+    with pytest.raises(Exception):
+        job.result(5)
+    assert job.cancelled() and ran == []
+
+
+def test_cancel_reaches_running_task():
+    jobs = JobScheduler(max_workers=1)
+    started = threading.Event()
+
+    def until_cancelled(token):
+        started.set()
+        while not token.is_set():
+            token._event.wait(0.01)
+        return "arrêtée"
+
+    token = CancelToken()
+    job = jobs.submit(until_cancelled, token, token=token)
+    assert started.wait(5)
+    job.cancel()
+    assert job.result(5) == "arrêtée"
+
+
+def test_back_to_back_submits_get_their_own_workers():
+    jobs = JobScheduler(max_workers=2)
+    first, second = Gate(), Gate()
+    jobs.submit(first)
+    jobs.submit(second)
+    # Les deux tournent en même temps: la seconde n'attend pas un thread déjà pris
+    assert first.started.wait(5) and second.started.wait(5)
+    first.open()
+    second.open()
+
+
+def test_scheduler_full_raises():
+    jobs = JobScheduler(max_workers=1, max_pending=1)
+    gate = Gate()
+    jobs.submit(gate)
+    assert gate.started.wait(5)
+    jobs.submit(gate)
+    with pytest.raises(SchedulerFull):
+        jobs.submit(gate)
+    gate.open()
+
+
+def test_latest_only_keeps_newest_pending():
+    latest = LatestOnly(JobScheduler(max_workers=4))
+    gate = Gate()
+    running = latest.submit(gate, "premier")
+    assert gate.started.wait(5)
+    replaced = latest.submit(str, "deuxième")
+    newest = latest.submit(str, "troisième")
+    gate.open()
+    assert running.result(5) == "premier"
+    assert newest.result(5) == "troisième"
+    assert replaced.cancelled()
+
+
+def test_latest_only_runs_one_at_a_time():
+    latest = LatestOnly(JobScheduler(max_workers=4))
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def task(i):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.01)
+        with lock:
+            active[0] -= 1
+        return i
+
+    jobs = [latest.submit(task, i) for i in range(20)]
+    assert jobs[-1].result(5) == 19
+    assert peak[0] == 1
+
+
+def test_latest_only_survives_full_scheduler():
+    jobs = JobScheduler(max_workers=1, max_pending=1)
+    blocker, filler = Gate(), Gate()
+    jobs.submit(blocker)
+    assert blocker.started.wait(5)
+    queued = jobs.submit(filler)
+    latest = LatestOnly(jobs)
+    refused = latest.submit(str, "refusée")
+    with pytest.raises(SchedulerFull):
+        refused.result(5)
+    blocker.open()
+    filler.open()
+    queued.result(5)
+    # Plus rien n'est bloqué: la demande suivante part normalement
+    assert latest.submit(str, "acceptée").result(5) == "acceptée"
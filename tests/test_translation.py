@@ -0,0 +1,57 @@
+"""Cache des traductions hors ligne: LRU en mémoire, limite d'âge, clés par moteur"""
+import time
+
+from grammatical.translation import SentenceTranslator, TranslationCache
+from grammatical.translators import EchoBackend
+
+
+def test_only_unknown_sentences_are_sent():
+    backend = EchoBackend(prefix="en:")
+    translator = SentenceTranslator(backend, TranslationCache(":memory:"))
+    assert translator.translate("Un. Deux.") == "en:Un. en:Deux."
+    assert translator.translate("Deux. Trois.") == "en:Deux. en:Trois."
+    assert backend.calls == 2
+    assert translator.cache.stats()["entries"] == 3
+
+
+def test_keys_are_separated_by_backend():
+    cache = TranslationCache(":memory:")
+    SentenceTranslator(EchoBackend(prefix="echo:"), cache).translate("Bonjour.")
+    other = EchoBackend(prefix="autre:")
+    other.name = "autre"
+    assert SentenceTranslator(other, cache).translate("Bonjour.") == "autre:Bonjour."
+    assert other.calls == 1
+
+
+def test_memory_is_bounded_and_falls_back_to_disk():
+    cache = TranslationCache(":memory:", memory_size=2)
+    keys = [TranslationCache.key("fr", "en", sentence) for sentence in ("a", "b", "c")]
+    cache.put_many(list(zip(keys, "ABC")))
+    assert len(cache._memory) == 2
+    assert cache.get_many(keys) == ["A", "B", "C"]
+    assert (cache.memory_hits, cache.disk_hits) == (2, 1)
+
+
+def test_expired_entries_are_not_served_from_memory(monkeypatch):
+    cache = TranslationCache(":memory:", max_age=60)
+    key = TranslationCache.key("fr", "en", "vieux")
+    cache.put_many([(key, "old")])
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get_many([key]) == [None]
+    assert key not in cache._memory
+    assert cache.misses == 1
+
+
+def test_evict_keeps_most_recently_used(monkeypatch):
+    cache = TranslationCache(":memory:", max_entries=2)
+    keys = [TranslationCache.key("fr", "en", sentence) for sentence in ("a", "b", "c")]
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for key, translated in zip(keys, "ABC"):
+        cache.put_many([(key, translated)])
+    cache._memory.clear()
+    cache.get_many(keys[:1])
+    cache.evict()
+    cache._memory.clear()
+    assert cache.get_many(keys) == ["A", None, "C"]
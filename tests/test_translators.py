@@ -0,0 +1,57 @@
+"""Moteurs de traduction hors ligne: googletrans simulé, EchoBackend, lots de BatchTranslator"""
+import sys
+import types
+
+import pytest
+
+from grammatical.translators import BatchTranslator, EchoBackend, GoogleTransBackend
+
+
+class FakeTranslator:
+    """googletrans simulé: une requête par chaîne, en majuscules; merge fusionne les lignes"""
+
+    def __init__(self):
+        self.requests = []
+        self.merge = False
+
+    def translate(self, text, src, dest):
+        if isinstance(text, list):
+            return [self.translate(item, src, dest) for item in text]
+        self.requests.append(text)
+        translated = text.upper()
+        if self.merge:
+            translated = translated.replace("\n", " ")
+        return types.SimpleNamespace(text=translated)
+
+
+@pytest.fixture
+def google(monkeypatch):
+    monkeypatch.setitem(sys.modules, "googletrans", types.SimpleNamespace(Translator=FakeTranslator))
+    return GoogleTransBackend()
+
+
+def test_google_batch_is_one_request(google):
+    assert google.translate_batch(["un.", "deux.", "trois."], "fr", "en") == ["UN.", "DEUX.", "TROIS."]
+    assert google.translator.requests == ["un.\ndeux.\ntrois."]
+
+
+def test_google_falls_back_when_lines_are_merged(google):
+    google.translator.merge = True
+    assert google.translate_batch(["un.", "deux."], "fr", "en") == ["UN.", "DEUX."]
+    assert google.translator.requests == ["un.\ndeux.", "un.", "deux."]
+
+
+def test_google_sentence_with_separator_sent_alone(google):
+    assert google.translate_batch(["un\ndeux.", "trois."], "fr", "en") == ["UN\nDEUX.", "TROIS."]
+    assert len(google.translator.requests) == 2
+
+
+def test_batches_keep_order():
+    backend = EchoBackend(prefix="> ")
+    translator = BatchTranslator(backend, batch_size=3, max_concurrency=2)
+    sentences = [f"phrase {i}." for i in range(10)]
+    try:
+        assert translator.translate_batch(sentences, "fr", "en") == ["> " + s for s in sentences]
+    finally:
+        translator.close()
+    assert backend.calls == 4
@@ -1,7 +1,13 @@
 import customtkinter as ctk
-from googletrans import Translator
-import language_tool_python
-from threading import Thread
+
+from grammatical.engines import TranslationEngine
+from grammatical.incremental import IncrementalChecker
+from grammatical.languagetool import pool
+from grammatical.metrics import configure_from_env, metrics
+from grammatical.pipeline import CorrectTranslatePipeline
+from grammatical.scheduler import deliver
+from grammatical.translation import SentenceTranslator, TranslationCache
+from grammatical.translators import BatchTranslator, get_backend
 
 class TranslationApp:
     def __init__(self):
@@ -12,8 +18,16 @@ class TranslationApp:
         self.root.title("Traducteur Français-Anglais")
         self.root.geometry("1000x800")
         
-        self.translator = Translator()
-        self.tool = language_tool_python.LanguageTool('fr')
+        # Moteur choisi par GRAMMATICAL_TRANSLATOR (google, ou echo hors ligne)
+        self.translator = BatchTranslator(get_backend())
+        # Seules les phrases jamais traduites sont envoyées au moteur
+        self.cache = TranslationCache()
+        self.sentence_translator = SentenceTranslator(self.translator, self.cache)
+        # Correction puis traduction de chaque phrase; LanguageTool ne démarre qu'à la première utilisation
+        self.pipeline = CorrectTranslatePipeline(
+            IncrementalChecker(pool.tool('fr'), 'fr'), self.sentence_translator, src='fr', dest='en')
+        # Traductions exécutées par l'ordonnanceur commun; l'interface ne reçoit que les résultats
+        self.engine = TranslationEngine(self.sentence_translator, self.pipeline, src='fr', dest='en')
         self.setup_ui()
         
     def setup_ui(self):
@@ -58,6 +72,19 @@ class TranslationApp:
         )
         self.btn_translate.pack(side="left", padx=5)
         
+        self.btn_pipeline = ctk.CTkButton(
+            btn_frame, 
+            text="Corriger puis traduire", 
+            command=self.start_pipeline_thread,
+            font=("Helvetica", 14),
+            height=40,
+            corner_radius=10
+        )
+        self.btn_pipeline.pack(side="left", padx=5)
+        
+        self.cache_label = ctk.CTkLabel(btn_frame, text="", font=("Helvetica", 12))
+        self.cache_label.pack(side="left", padx=10)
+        
         ctk.CTkLabel(main_frame, text="Traduction Anglaise:", font=("Helvetica", 14, "bold")).grid(
             row=3, column=0, sticky="w", pady=(0, 5))
         
@@ -72,26 +99,53 @@ class TranslationApp:
         
     def start_translation_thread(self):
         self.btn_translate.configure(state="disabled", text="Traduction en cours...")
-        Thread(target=self.translate_text, daemon=True).start()
-        
-    def translate_text(self):
         text = self.text_french.get("1.0", "end").strip()
         
         self.text_english.delete("1.0", "end")
         self.text_english.insert("1.0", "Traduction en cours...")
+        deliver(self.engine.translate(text), self.root.after, self.translation_done)
         
-        try:
-            translated = self.translator.translate(text, src='fr', dest='en').text
-            self.root.after(0, self.update_translation, translated)
-        except Exception as e:
-            self.root.after(0, self.update_translation, f"Erreur: {str(e)}")
+    def translation_done(self, job):
+        error = job.exception()
+        self.update_translation(f"Erreur: {str(error)}" if error is not None else job.result())
                   
-    def update_translation(self, translated_text):
+    def start_pipeline_thread(self):
+        self.btn_translate.configure(state="disabled")
+        self.btn_pipeline.configure(state="disabled", text="Correction et traduction...")
         self.text_english.delete("1.0", "end")
-        self.text_english.insert("1.0", translated_text)
+        
+        # Chaque phrase s'affiche dès qu'elle est corrigée et traduite
+        text = self.text_french.get("1.0", "end").strip()
+        job = self.engine.correct_and_translate(
+            text, lambda item: self.root.after(0, self.append_translation, item.translated + item.spacing))
+        deliver(job, self.root.after, self.pipeline_done)
+        
+    def pipeline_done(self, job):
+        error = job.exception()
+        if error is not None:
+            self.append_translation(f"\nErreur: {str(error)}")
+            self.finish_pipeline("")
+        else:
+            self.finish_pipeline(job.result())
+            
+    def append_translation(self, translated_text):
+        self.text_english.insert("end", translated_text)
+        self.text_english.see("end")
+        
+    def finish_pipeline(self, stats):
+        self.cache_label.configure(text=stats)
+        self.btn_translate.configure(state="normal")
+        self.btn_pipeline.configure(state="normal", text="Corriger puis traduire")
+        
+    def update_translation(self, translated_text):
+        with metrics.timer("ui.insert"):
+            self.text_english.delete("1.0", "end")
+            self.text_english.insert("1.0", translated_text)
+        self.cache_label.configure(text=f"Cache: {self.cache.hits} phrases retrouvées, {self.cache.misses} traduites")
         self.btn_translate.configure(state="normal", text="Traduire en Anglais")
         
 
 if __name__ == "__main__":
+    configure_from_env()
     app = TranslationApp()
     app.root.mainloop()
\ No newline at end of file